@@ -0,0 +1,324 @@
+"""
+asyncio transport: the protocol feeds StreamReader straight from data_received,
+no reader task in between.
+
+usage:
+    conn = await spawn(["attach-session", "-t", "main"])
+    reply = await conn.command("list-sessions")
+    async for noti in conn.notifications():
+        ...
+"""
+
+import asyncio
+import subprocess
+import typing as T
+from collections import deque
+
+from ..commands import Command, CommandTracker, encode
+from ..reader import EventReader, StreamReader
+from ..subscriptions import Subscriptions
+from ..types import Event, Notification, Reply, ReplyChunk
+
+
+class ConnectionClosed(Exception):
+    ...
+
+
+class _EventBuffer:
+    def __init__(self, on_get: T.Callable[[], None]):
+        self._items: T.Deque[Event] = deque()
+        # of the tasks waiting in get(), each put wakes one
+        self._waiters: T.Deque[asyncio.Future] = deque()
+        self._closed: T.Optional[BaseException] = None
+        self._on_get = on_get
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item: Event):
+        self._items.append(item)
+        self._wakeup_next()
+
+    def close(self, exc: BaseException):
+        self._closed = exc
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _wakeup_next(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def get(self) -> Event:
+        """
+        :raise: ConnectionClosed once the connection is closed and nothing is left
+        """
+        while not self._items:
+            if self._closed is not None:
+                raise self._closed
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+                # woken for an item but cancelled, another waiter takes it
+                if self._items and not waiter.cancelled():
+                    self._wakeup_next()
+                raise
+
+        item = self._items.popleft()
+        self._on_get()
+        return item
+
+    async def drain(self) -> T.List[Event]:
+        """waits for the first event, then takes all of them"""
+        items = [await self.get()]
+        items.extend(self._items)
+        self._items.clear()
+        self._on_get()
+        return items
+
+
+class Connection:
+    """
+    one tmux control connection.
+
+    events pile up in memory until the consumer takes them; beyond high_water
+    buffered events the transport stops reading, so tmux and the pipe do
+    the buffering, and reading resumes at low_water.
+    """
+
+    def __init__(
+        self,
+        high_water: int = 1024,
+        low_water: int = 256,
+        reply_chunk_lines: int = None,
+        subscriptions: Subscriptions = None,
+    ):
+        assert 0 <= low_water < high_water
+
+        self._reader = StreamReader(
+            EventReader(chunk_lines=reply_chunk_lines, subscriptions=subscriptions)
+        )
+        self._tracker = CommandTracker()
+        self._notis = _EventBuffer(self._maybe_resume)
+        self._replies = _EventBuffer(self._maybe_resume)
+        self._high_water = high_water
+        self._low_water = low_water
+
+        self._read_transport: T.Optional[asyncio.ReadTransport] = None
+        self._write: T.Optional[T.Callable[[bytes], None]] = None
+        self._close: T.Optional[T.Callable[[], None]] = None
+        self._paused = False
+        self._closed = asyncio.get_running_loop().create_future()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def _attach(
+        self,
+        read_transport: asyncio.ReadTransport,
+        write: T.Optional[T.Callable[[bytes], None]],
+        close: T.Callable[[], None],
+    ):
+        self._read_transport = read_transport
+        self._write = write
+        self._close = close
+
+    def _feed(self, data: bytes):
+        for event in self._reader.feed(data):
+            if isinstance(event, Notification):
+                self._notis.put(event)
+            elif isinstance(event, (Reply, ReplyChunk)):
+                self._route_reply(event)
+            else:
+                raise RuntimeError(f"received an unknown event: {event}")
+
+        if not self._paused and self._buffered() >= self._high_water:
+            # data only comes through an attached transport
+            assert self._read_transport is not None
+            self._paused = True
+            self._read_transport.pause_reading()
+
+    def _route_reply(self, event: T.Union[Reply, ReplyChunk]):
+        future = self._tracker.match(event)
+
+        if isinstance(event, ReplyChunk):
+            # chunks are for the consumer, the future tells when all arrived
+            self._replies.put(event)
+            if future is not None and event.last and not future.done():
+                future.set_result(event)
+            return
+
+        if future is None:
+            self._replies.put(event)
+        elif not future.done():
+            future.set_result(event)
+
+    def _buffered(self) -> int:
+        return len(self._notis) + len(self._replies)
+
+    def _maybe_resume(self):
+        if self._paused and self._buffered() <= self._low_water:
+            assert self._read_transport is not None
+            self._paused = False
+            self._read_transport.resume_reading()
+
+    def _lost(self, exc: T.Optional[BaseException]):
+        closed = ConnectionClosed("tmux control connection closed")
+        if exc is not None:
+            closed.__cause__ = exc
+
+        self._notis.close(closed)
+        self._replies.close(closed)
+        for future in self._tracker.drop():
+            if not future.done():
+                future.set_exception(closed)
+        if not self._closed.done():
+            self._closed.set_result(None)
+
+    async def next_notification(self) -> Notification:
+        return await self._notis.get()  # type: ignore
+
+    async def next_reply(self) -> T.Union[Reply, ReplyChunk]:
+        """replies which do not belong to a command sent through this connection"""
+        return await self._replies.get()  # type: ignore
+
+    async def drain_notifications(self) -> T.List[Notification]:
+        return await self._notis.drain()  # type: ignore
+
+    async def notifications(self) -> T.AsyncIterator[Notification]:
+        while True:
+            try:
+                yield await self._notis.get()  # type: ignore
+            except ConnectionClosed:
+                return
+
+    def send_many(self, commands: T.Iterable[Command]) -> T.List[asyncio.Future]:
+        """
+        pipelines the commands in a single write
+
+        :return: a future per command, resolving to its Reply
+            or to the last ReplyChunk when replies are streamed
+        """
+        if self._write is None:
+            raise RuntimeError("connection was opened read-only")
+        if self._closed.done():
+            raise ConnectionClosed("tmux control connection closed")
+
+        data = b"".join(encode(command) for command in commands)
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in range(data.count(b"\n"))]
+
+        for future in futures:
+            self._tracker.sent(future)
+        self._write(data)
+
+        return futures
+
+    async def command(self, command: Command) -> T.Union[Reply, ReplyChunk]:
+        return await self.send_many([command])[0]
+
+    def close(self):
+        if self._close:
+            self._close()
+
+    async def wait_closed(self):
+        await self._closed
+
+
+class _SubprocessProtocol(asyncio.SubprocessProtocol):
+    def __init__(self, conn: Connection):
+        self._conn = conn
+
+    def connection_made(self, transport):
+        transport = T.cast(asyncio.SubprocessTransport, transport)
+        stdin = T.cast(asyncio.WriteTransport, transport.get_pipe_transport(0))
+        stdout = T.cast(asyncio.ReadTransport, transport.get_pipe_transport(1))
+        self._conn._attach(stdout, stdin.write, transport.close)
+
+    def pipe_data_received(self, fd, data):
+        if fd == 1:
+            self._conn._feed(data)
+
+    # not process_exited, replies may still be in the pipe by then
+    def pipe_connection_lost(self, fd, exc):
+        if fd == 1:
+            self._conn._lost(exc)
+
+
+class _ReadPipeProtocol(asyncio.Protocol):
+    def __init__(self, conn: Connection, writer: T.Optional[asyncio.WriteTransport]):
+        self._conn = conn
+        self._writer = writer
+
+    def connection_made(self, transport):
+        transport = T.cast(asyncio.ReadTransport, transport)
+        writer = self._writer
+
+        if writer is None:
+            self._conn._attach(transport, None, transport.close)
+            return
+
+        def close():
+            writer.close()
+            transport.close()
+
+        self._conn._attach(transport, writer.write, close)
+
+    def data_received(self, data):
+        self._conn._feed(data)
+
+    def eof_received(self):
+        return False
+
+    def connection_lost(self, exc):
+        self._conn._lost(exc)
+
+
+async def spawn(tmux_args: T.List[str], tmux: str = "tmux", **kwargs) -> Connection:
+    """
+    starts `tmux -C <tmux_args>`, kwargs go to Connection
+    """
+    loop = asyncio.get_running_loop()
+    conn = Connection(**kwargs)
+
+    await loop.subprocess_exec(
+        lambda: _SubprocessProtocol(conn),
+        tmux,
+        "-C",
+        *tmux_args,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=None,
+    )
+
+    return conn
+
+
+async def connect_pipes(read_pipe, write_pipe=None, **kwargs) -> Connection:
+    """
+    a connection over already opened pipes, eg. of a tmux process spawned elsewhere
+
+    :param read_pipe, write_pipe: file objects, write_pipe is optional for listening only
+    """
+    loop = asyncio.get_running_loop()
+    conn = Connection(**kwargs)
+
+    writer = None
+    if write_pipe is not None:
+        writer, _ = await loop.connect_write_pipe(asyncio.Protocol, write_pipe)
+
+    await loop.connect_read_pipe(lambda: _ReadPipeProtocol(conn, writer), read_pipe)
+
+    return conn
@@ -0,0 +1,94 @@
+import time
+import typing as T
+
+from . import types
+
+
+class OutputCoalescer:
+    """
+    merges %output events of the same pane, between StreamReader and the queues.
+
+    pending outputs are flushed when
+    * a pane has buffered max_bytes
+    * the oldest pending output has waited max_delay seconds
+    * any other event arrives, so outputs never overtake it
+
+    ordering is kept per pane, outputs of different panes may be reordered
+    among themselves.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 << 10,
+        max_delay: float = 0.01,
+        clock: T.Callable[[], float] = time.monotonic,
+    ):
+        self._max_bytes = max_bytes
+        self._max_delay = max_delay
+        self._clock = clock
+
+        # pane -> values, in the order panes first produced output
+        self._pending: T.Dict[int, T.List[bytes]] = {}
+        self._sizes: T.Dict[int, int] = {}
+        # when the oldest pending output arrived
+        self._since: T.Optional[float] = None
+
+    @property
+    def clean(self):
+        return not self._pending
+
+    @property
+    def deadline(self) -> T.Optional[float]:
+        """when the pending outputs are due, in the clock's time"""
+        if self._since is None:
+            return None
+        return self._since + self._max_delay
+
+    def feed(self, events: T.Iterable[types.Event]) -> T.Iterator[types.Event]:
+        pending = self._pending
+        sizes = self._sizes
+
+        for event in events:
+            if not isinstance(event, types.Output):
+                yield from self.flush()
+                yield event
+                continue
+
+            pane = event.pane
+            value = event.value
+
+            try:
+                pending[pane].append(value)
+            except KeyError:
+                pending[pane] = [value]
+                sizes[pane] = len(value)
+                if self._since is None:
+                    self._since = self._clock()
+            else:
+                sizes[pane] += len(value)
+
+            if sizes[pane] >= self._max_bytes:
+                yield self._merge(pane)
+
+        yield from self.expire()
+
+    def expire(self) -> T.Iterator[types.Output]:
+        """flushes when the pending outputs are due"""
+        deadline = self.deadline
+        if deadline is not None and self._clock() >= deadline:
+            yield from self.flush()
+
+    def flush(self) -> T.Iterator[types.Output]:
+        while self._pending:
+            yield self._merge(next(iter(self._pending)))
+
+    def _merge(self, pane: int) -> types.Output:
+        values = self._pending.pop(pane)
+        del self._sizes[pane]
+
+        if not self._pending:
+            self._since = None
+
+        if len(values) == 1:
+            return types.Output(pane, values[0])
+        return types.Output(pane, b"".join(values))
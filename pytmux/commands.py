@@ -0,0 +1,87 @@
+"""
+see: https://github.com/tmux/tmux/wiki/Control-Mode#commands
+"""
+
+import typing as T
+from collections import deque
+
+from . import types
+
+Command = T.Union[str, bytes]
+
+
+def encode(command: Command) -> bytes:
+    """
+    :raise: ValueError when the command is not a single line, or is blank
+    """
+    if isinstance(command, str):
+        command = command.encode()
+
+    if b"\n" in command:
+        raise ValueError("a command must be a single line")
+    # an empty line detaches the control client, no reply would ever come
+    if not command.strip():
+        raise ValueError("a command must not be blank")
+
+    return command + b"\n"
+
+
+class CommandTracker:
+    """
+    matches replies to the commands sent over one control connection.
+
+    tmux runs the commands of a control client in order, and wraps their output
+    in %begin/%end with flags 1; replies of other commands, eg. the attach-session
+    on the command line, come with flags 0.
+
+    the handle of a command is whatever the caller wants back, eg. a future.
+    """
+
+    def __init__(self):
+        self._pending: T.Deque[T.Any] = deque()
+        # command number -> handle, for the replies being streamed
+        self._streaming: T.Dict[int, T.Any] = {}
+
+    def __len__(self):
+        return len(self._pending) + len(self._streaming)
+
+    def sent(self, handle):
+        """registers the handle of a command, in the order of sending"""
+        self._pending.append(handle)
+
+    def unsent(self, count: int) -> list:
+        """takes back the latest handles, of commands which could not be sent"""
+        return [self._pending.pop() for _ in range(count)]
+
+    def match(self, event: T.Union[types.Reply, types.ReplyChunk]) -> T.Optional[T.Any]:
+        """
+        :return: the handle of the command the reply belongs to, None for replies
+            of commands not sent through this tracker
+        """
+        if event.head_wrap.flags != 1:
+            return None
+
+        if isinstance(event, types.ReplyChunk):
+            number = event.number
+            try:
+                handle = self._streaming[number]
+            except KeyError:
+                if not self._pending:
+                    return None
+                handle = self._streaming[number] = self._pending.popleft()
+            if event.last:
+                del self._streaming[number]
+            return handle
+
+        if not self._pending:
+            return None
+        return self._pending.popleft()
+
+    def drop(self) -> list:
+        """
+        :return: the handles of all commands waiting for replies
+        """
+        handles = [*self._streaming.values(), *self._pending]
+        self._streaming.clear()
+        self._pending.clear()
+        return handles
@@ -0,0 +1,87 @@
+"""
+see: https://github.com/tmux/tmux/wiki/Control-Mode#flow-control
+"""
+
+import typing as T
+
+from . import types
+
+
+class FlowControl:
+    """
+    stops reading the control connection while the consumer is behind, so tmux
+    buffers the output instead of us, and reads on once it caught up.
+
+    nothing here does I/O: feed it the events and the depth of the consumer's
+    queue, stop polling the connection while backpressure is set and send the
+    commands it returns over the control connection.
+
+    * the queue reaching high_water sets backpressure
+    * the queue falling to low_water clears it, and continues the panes tmux
+      paused meanwhile
+
+    tmux bounds its buffering with pause-after: a pane whose output is older than
+    pause_after seconds (the age of ExtendedOutput) gets paused and its output
+    dropped until continued, a consumer wanting the whole screen should
+    capture-pane on %continue.
+    """
+
+    def __init__(self, high_water: int, low_water: int, pause_after: int = 1):
+        assert 0 <= low_water < high_water
+        assert pause_after > 0
+
+        self.pause_after = pause_after
+        self._high_water = high_water
+        self._low_water = low_water
+
+        # panes tmux paused, continued at low_water
+        self._paused: T.Set[int] = set()
+        self._backpressure = False
+
+    @property
+    def paused(self) -> T.FrozenSet[int]:
+        return frozenset(self._paused)
+
+    @property
+    def backpressure(self) -> bool:
+        """whether to stop reading the connection"""
+        return self._backpressure
+
+    @property
+    def throttled(self) -> bool:
+        """whether something waits for the consumer to catch up"""
+        return self._backpressure or bool(self._paused)
+
+    def setup(self) -> str:
+        """the command enabling flow control on the connection"""
+        return f"refresh-client -f pause-after={self.pause_after}"
+
+    def feed(self, events: T.Iterable[types.Event]):
+        for event in events:
+            if isinstance(event, types.Pause):
+                self._paused.add(event.pane)
+            elif isinstance(event, types.Continue):
+                self._paused.discard(event.pane)
+
+    def update(self, depth: int) -> T.List[str]:
+        """
+        :param depth: events the consumer has not taken yet
+        :return: the commands to send
+        """
+        if depth <= self._low_water:
+            self._backpressure = False
+            return self._continue_all()
+
+        if depth >= self._high_water:
+            self._backpressure = True
+
+        return []
+
+    def _continue_all(self) -> T.List[str]:
+        if not self._paused:
+            return []
+
+        panes = sorted(self._paused)
+        self._paused.clear()
+
+        return [f"refresh-client -A '%{pane}:continue'" for pane in panes]
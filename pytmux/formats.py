@@ -0,0 +1,148 @@
+"""
+format subscriptions, tmux pushes a format whenever its value changes instead
+of us polling display-message.
+
+see: refresh-client -B in tmux(1)
+"""
+
+import typing as T
+
+import attr
+
+from . import types
+
+
+@attr.s(slots=True, frozen=True)
+class Update:
+    name: str = attr.ib()
+    session: int = attr.ib()
+    window: T.Optional[int] = attr.ib()
+    window_idx: T.Optional[int] = attr.ib()
+    pane: T.Optional[int] = attr.ib()
+    # the converted value
+    value: T.Any = attr.ib()
+
+
+@attr.s(slots=True)
+class FormatSubscription:
+    name: str = attr.ib()
+    format: str = attr.ib()
+    # "" for the attached session, "%N", "%*" for every pane, "@N" or "@*"
+    target: str = attr.ib(default="")
+    convert: T.Callable[[str], T.Any] = attr.ib(default=str)
+    callback: T.Optional[T.Callable[[Update], T.Any]] = attr.ib(default=None)
+
+    def command(self) -> str:
+        return f"refresh-client -B '{self.name}:{self.target}:{self.format}'"
+
+
+# session, window, pane
+_Scope = T.Tuple[int, T.Optional[int], T.Optional[int]]
+
+
+class Formats:
+    """
+    named format subscriptions of one control connection.
+
+    nothing here does I/O: send the commands subscribe() and unsubscribe()
+    return, feed() the notifications. an update is passed on only when the
+    value of its pane, window or session differs from the last one.
+
+    usage:
+        formats = Formats()
+        client.send(formats.subscribe("cwd", "#{pane_current_path}", "%*"))
+        ...
+        for update in formats.feed(notis):
+            print(update.pane, update.value)
+    """
+
+    def __init__(self):
+        self._subs: T.Dict[str, FormatSubscription] = {}
+        # name -> (session, window, pane) -> the last raw value
+        self._last: T.Dict[str, T.Dict[_Scope, bytes]] = {}
+
+    def __contains__(self, name: str):
+        return name in self._subs
+
+    def __len__(self):
+        return len(self._subs)
+
+    def subscribe(
+        self,
+        name: str,
+        format: str,  # pylint: disable=redefined-builtin
+        target: str = "",
+        convert: T.Callable[[str], T.Any] = str,
+        callback: T.Callable[[Update], T.Any] = None,
+    ) -> str:
+        """
+        a subscription of the same name is replaced
+
+        :param convert: turns the value into the type of Update.value
+        :return: the command to send
+        :raise: ValueError when tmux could not take the name, target or format
+        """
+        if not name or ":" in name:
+            raise ValueError("a subscription name must be non-empty without ':'")
+        if target and not (
+            target[0] in "%@" and (target[1:] == "*" or target[1:].isdigit())
+        ):
+            raise ValueError(f"unknown subscription target: {target!r}")
+        if "'" in format or "\n" in format:
+            raise ValueError("a subscription format can not have ' or a newline")
+
+        self._last.pop(name, None)
+        sub = self._subs[name] = FormatSubscription(
+            name, format, target, convert, callback
+        )
+
+        return sub.command()
+
+    def unsubscribe(self, name: str) -> str:
+        """
+        :return: the command to send
+        """
+        self._subs.pop(name, None)
+        self._last.pop(name, None)
+
+        return f"refresh-client -B '{name}'"
+
+    def commands(self) -> T.List[str]:
+        """subscribes everything again, eg. on a new connection"""
+        self._last.clear()
+        return [sub.command() for sub in self._subs.values()]
+
+    def feed(self, events: T.Iterable[types.Event]) -> T.List[Update]:
+        """
+        :return: the changed values, after their callbacks ran
+        """
+        updates = []
+
+        for event in events:
+            if not isinstance(event, types.SubscriptionChanged):
+                continue
+
+            sub = self._subs.get(event.name)
+            # unsubscribed, tmux may still have sent some
+            if sub is None:
+                continue
+
+            last = self._last.setdefault(event.name, {})
+            scope = (event.session, event.window, event.pane)
+            if last.get(scope) == event.value:
+                continue
+            last[scope] = event.value
+
+            update = Update(
+                event.name,
+                event.session,
+                event.window,
+                event.window_idx,
+                event.pane,
+                sub.convert(event.value.decode()),
+            )
+            if sub.callback is not None:
+                sub.callback(update)
+            updates.append(update)
+
+        return updates
@@ -0,0 +1,193 @@
+"""
+tmux window layouts, eg. b"820e,80x24,0,0{40x24,0,0,2,39x24,41,0,3}"
+
+    layout := checksum "," cell
+    cell   := W "x" H "," X "," Y ( "," pane | "{" cells "}" | "[" cells "]" )
+
+{} splits left to right, [] top to bottom.
+"""
+
+import typing as T
+from collections import OrderedDict
+from enum import Enum
+
+import attr
+
+
+class Split(Enum):
+    NONE = 0
+    LEFT_RIGHT = 1
+    TOP_BOTTOM = 2
+
+
+@attr.s(slots=True, frozen=True)
+class Cell:
+    width: int = attr.ib()
+    height: int = attr.ib()
+    x: int = attr.ib()
+    y: int = attr.ib()
+    # None for a cell split into children
+    pane: T.Optional[int] = attr.ib(default=None)
+    split: Split = attr.ib(default=Split.NONE)
+    children: T.Tuple["Cell", ...] = attr.ib(default=())
+
+    def leaves(self) -> T.Iterator["Cell"]:
+        if self.pane is not None:
+            yield self
+            return
+        for child in self.children:
+            yield from child.leaves()
+
+
+@attr.s(slots=True, frozen=True)
+class Layout:
+    checksum: int = attr.ib()
+    root: Cell = attr.ib()
+    # pane -> its cell, follows from root
+    panes: T.Dict[int, Cell] = attr.ib(eq=False, repr=False)
+
+
+def checksum(cells: bytes) -> int:
+    """layout_checksum of tmux, over the part after the checksum"""
+    csum = 0
+    for char in cells:
+        csum = (csum >> 1) + ((csum & 1) << 15)
+        csum = (csum + char) & 0xFFFF
+    return csum
+
+
+_CLOSERS = {
+    ord("{"): (ord("}"), Split.LEFT_RIGHT),
+    ord("["): (ord("]"), Split.TOP_BOTTOM),
+}
+
+
+class _Parser:
+    def __init__(self, data: bytes):
+        self._data = data
+        self._pos = 0
+
+    def error(self, reason: str) -> ValueError:
+        return ValueError(f"{reason} at {self._pos} of layout {self._data!r}")
+
+    def number(self) -> int:
+        data = self._data
+        start = pos = self._pos
+        while pos < len(data) and 0x30 <= data[pos] <= 0x39:
+            pos += 1
+        if pos == start:
+            raise self.error("expects a number")
+        self._pos = pos
+        return int(data[start:pos])
+
+    def expect(self, char: int):
+        if self.peek() != char:
+            raise self.error(f"expects {chr(char)!r}")
+        self._pos += 1
+
+    def peek(self) -> T.Optional[int]:
+        if self._pos < len(self._data):
+            return self._data[self._pos]
+        return None
+
+    def cell(self) -> Cell:
+        width = self.number()
+        self.expect(ord("x"))
+        height = self.number()
+        self.expect(ord(","))
+        x = self.number()
+        self.expect(ord(","))
+        y = self.number()
+
+        char = self.peek()
+
+        if char == ord(","):
+            self._pos += 1
+            return Cell(width, height, x, y, self.number())
+
+        if char in _CLOSERS:
+            closer, split = _CLOSERS[char]
+            self._pos += 1
+            children = [self.cell()]
+            while self.peek() == ord(","):
+                self._pos += 1
+                children.append(self.cell())
+            self.expect(closer)
+            return Cell(width, height, x, y, None, split, tuple(children))
+
+        raise self.error("expects a pane or a split")
+
+    def done(self):
+        if self._pos != len(self._data):
+            raise self.error("trailing data")
+
+
+def parse_uncached(layout: bytes) -> Layout:
+    """
+    :raise: ValueError for a malformed layout or a checksum mismatch
+    """
+    head, sep, cells = layout.partition(b",")
+    if not sep or len(head) != 4:
+        raise ValueError(f"layout without a checksum: {layout!r}")
+
+    csum = int(head, 16)
+    if checksum(cells) != csum:
+        raise ValueError(f"layout checksum mismatch: {layout!r}")
+
+    parser = _Parser(cells)
+    root = parser.cell()
+    parser.done()
+
+    return Layout(csum, root, {cell.pane: cell for cell in root.leaves()})  # type: ignore
+
+
+class LayoutCache:
+    """
+    layouts by their string, which starts with the checksum, least recently
+    used ones go first; a repeated layout costs a single dict hit
+    """
+
+    def __init__(self, maxsize: int = 256):
+        assert maxsize > 0
+
+        self._maxsize = maxsize
+        self._layouts: T.OrderedDict[bytes, Layout] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._layouts)
+
+    def parse(self, layout: bytes) -> Layout:
+        """
+        :raise: ValueError, see parse_uncached
+        """
+        layouts = self._layouts
+
+        try:
+            found = layouts[layout]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            try:
+                layouts.move_to_end(layout)
+            except KeyError:
+                # another thread evicted it meanwhile
+                pass
+            return found
+
+        self.misses += 1
+        parsed = layouts[layout] = parse_uncached(layout)
+        if len(layouts) > self._maxsize:
+            layouts.popitem(last=False)
+
+        return parsed
+
+
+_CACHE = LayoutCache()
+
+
+def parse(layout: bytes) -> Layout:
+    """parse_uncached, memoized in a process wide LayoutCache"""
+    return _CACHE.parse(layout)
@@ -3,16 +3,25 @@ import logging
 import typing as T
 
 from . import types
+from .subscriptions import Subscriptions
 
 _log = logging.getLogger(__name__)
 
 
+# a line handed to EventReader, memoryview when it comes from BufferedStreamReader
+Line = T.Union[bytes, bytearray, memoryview]
+
+
 class ProtocolError(Exception):
     ...
 
 
-def header_in_line(line: bytes) -> bytes:
-    assert line.endswith(b"\n")
+def header_in_line(line: Line) -> bytes:
+    assert line[-1:] == b"\n"
+
+    if isinstance(line, memoryview):
+        # headers are short, never copy the whole line
+        line = line[: types.DISPATCH.span].tobytes()
 
     if not line.startswith(b"%"):
         raise ProtocolError("head wrap not started with %")
@@ -20,20 +29,17 @@ def header_in_line(line: bytes) -> bytes:
     sep = line.find(b" ")
     if sep >= 0:
         header = bytes(line[:sep])
-    else:
+    elif line.endswith(b"\n"):
         header = bytes(line[:-1])
+    else:
+        header = bytes(line)
 
     return header
 
 
-_ONELINE_EVENTS = {noti.header: noti for noti in types.ALL_NOTI}
-_MULTILINE_EVENTS = {types.Reply.header: types.Reply}
-_BLOCK_END_HEADERS = {e.value for e in types.BlockEnd}
-
-
 class EventReaderABC(abc.ABC):
     @abc.abstractmethod
-    def feed(self, line: bytes) -> T.Iterable[types.Event]:
+    def feed(self, line: Line) -> T.Iterable[types.Event]:
         pass
 
     @abc.abstractproperty
@@ -42,72 +48,156 @@ class EventReaderABC(abc.ABC):
 
 
 class EventReader(EventReaderABC):
-    def __init__(self):
+    def __init__(
+        self,
+        lazy: bool = False,
+        chunk_lines: int = None,
+        compact: bool = False,
+        subscriptions: Subscriptions = None,
+    ):
+        """
+        :param lazy: yields notifications as types.LazyNotification
+        :param chunk_lines: streams replies as types.ReplyChunk of at most so many
+            body lines, instead of holding the whole body until the end wrap
+        :param compact: reply bodies are types.CompactLines
+        :param subscriptions: notifications nobody subscribed to are skipped
+            undecoded, replies are never skipped
+        """
         self._lines: T.List[bytes] = []
-        self._event_cls: T.Optional[types.Event] = None
+        self._event_cls: T.Optional[T.Type[types.Event]] = None
+        self._lazy_new = types.LAZY_NEW if lazy else None
+        self._chunk_lines = chunk_lines
+        self._compact = types.CompactLinesBuilder() if compact else None
+        # head wrap of the reply being streamed or compacted
+        self._head: T.Optional[types._BlockWrap] = None
+        self._debug = _log.isEnabledFor(logging.DEBUG)
+        self._classify = types.DISPATCH.classify
+        self._subscriptions = subscriptions
 
         self._current = self._head_wrap
 
     @property
     def clean(self):
-        return not self._lines
+        return not self._lines and self._head is None
 
-    def feed(self, line: bytes):
+    def feed(self, line: Line):
         yield from self._current(line)
 
-    def _head_wrap(self, line: bytes):
+    def _head_wrap(self, line: Line):
         assert not self._lines
         assert not self._event_cls
         # pylint: disable=comparison-with-callable
         assert self._current == self._head_wrap
 
-        header = header_in_line(line)
+        found = self._classify(line)
+        if found is None:
+            if line[0] != 0x25:
+                raise ProtocolError("head wrap not started with %")
+            raise ProtocolError("unknown head wrap")
+
+        kind, cls = found
+
+        if kind is types.LineKind.NOTIFICATION:
+            assert cls is not None
+            if self._subscriptions is not None and not self._subscriptions.wants(
+                cls, line
+            ):
+                return
+
+            if self._debug:
+                _log.debug("head wrap indicates oneline event, FULFILED")
+
+            # copy only what the event keeps, the line may be a view of a reused buffer
+            if self._lazy_new is not None:
+                yield self._lazy_new[cls](bytes(line))
+            else:
+                yield cls.from_bytes(bytes(line))
+            return
 
-        try:
-            cls = _ONELINE_EVENTS[header]
-        except KeyError:
-            pass
-        else:
-            self._event_cls = cls
-            self._lines.append(line)
+        if kind is types.LineKind.BEGIN:
+            assert cls is not None
+            if self._debug:
+                _log.debug("head wrap indicates multiline event, waiting for body")
 
-            _log.debug("head wrap indicates oneline event, FULFILED")
-            yield self._flush()
-            return
+            if self._chunk_lines:
+                self._head = types._BlockWrap.from_bytes(bytes(line))
+                self._current = self._stream_body
+                return
+
+            if self._compact:
+                self._head = types._BlockWrap.from_bytes(bytes(line))
+                self._current = self._compact_body
+                return
 
-        try:
-            cls = _MULTILINE_EVENTS[header]  # type: ignore
-        except KeyError:
-            pass
-        else:
             self._event_cls = cls
-            self._lines.append(line)
-            _log.debug("head wrap indicates multiline event, waiting for body")
+            self._lines.append(bytes(line))
             self._current = self._body
             return
 
-        raise ProtocolError("unknown head wrap")
+        raise ProtocolError("end wrap without head wrap")
 
-    def _body(self, line: bytes):
+    def _body(self, line: Line):
         assert self._event_cls
 
-        self._lines.append(line)
+        self._lines.append(bytes(line))
+
+        # 0x25: %
+        if line[0] != 0x25:
+            return
 
-        if self._is_end_wrap(line):
-            _log.debug("reached end wrap, FULFILED")
+        found = self._classify(line)
+        if found is not None and found[0] is types.LineKind.END:
+            if self._debug:
+                _log.debug("reached end wrap, FULFILED")
             yield self._flush()
 
-    @classmethod
-    def _is_end_wrap(cls, line: bytes):
-        if not line.startswith(b"%"):
-            return False
+    def _stream_body(self, line: Line):
+        assert self._head
 
-        header = header_in_line(line)
+        if line[0] == 0x25:
+            found = self._classify(line)
+            if found is not None and found[0] is types.LineKind.END:
+                if self._debug:
+                    _log.debug("reached end wrap of a streamed reply, FULFILED")
 
-        if header not in _BLOCK_END_HEADERS:
-            return False
+                end_wrap = types._BlockWrap.from_bytes(bytes(line))
+                chunk = types.ReplyChunk(self._head, self._lines, end_wrap)
 
-        return True
+                self._lines = []
+                self._head = None
+                self._current = self._head_wrap
+
+                yield chunk
+                return
+
+        self._lines.append(bytes(line))
+
+        if len(self._lines) >= self._chunk_lines:
+            chunk = types.ReplyChunk(self._head, self._lines)
+            self._lines = []
+            yield chunk
+
+    def _compact_body(self, line: Line):
+        assert self._head
+        assert self._compact
+
+        if line[0] == 0x25:
+            found = self._classify(line)
+            if found is not None and found[0] is types.LineKind.END:
+                if self._debug:
+                    _log.debug("reached end wrap, FULFILED")
+
+                end_wrap = types._BlockWrap.from_bytes(bytes(line))
+                reply = types.Reply(self._head, self._compact.build(), end_wrap)
+
+                self._head = None
+                self._current = self._head_wrap
+
+                yield reply
+                return
+
+        # the only copy of the line
+        self._compact.append(line)
 
     def _flush(self) -> types.Event:
         lines = self._lines
@@ -121,6 +211,54 @@ class EventReader(EventReaderABC):
         return event
 
 
+class ReplyRouter:
+    """
+    hands streamed reply chunks to the callback registered for their command number
+    """
+
+    def __init__(self, default: T.Callable[[types.ReplyChunk], None] = None):
+        """
+        :param default: receives the chunks of unregistered command numbers
+        """
+        self._callbacks: T.Dict[int, T.Callable[[types.ReplyChunk], None]] = {}
+        self._default = default
+
+    def register(self, number: int, callback: T.Callable[[types.ReplyChunk], None]):
+        self._callbacks[number] = callback
+
+    def feed(self, chunk: types.ReplyChunk) -> bool:
+        """
+        :return: False when nobody took the chunk
+        """
+        number = chunk.number
+
+        if chunk.last:
+            callback = self._callbacks.pop(number, self._default)
+        else:
+            callback = self._callbacks.get(number, self._default)
+
+        if callback is None:
+            return False
+
+        callback(chunk)
+        return True
+
+
+def split_lines(chunk: bytes) -> T.List[bytes]:
+    """
+    splits a chunk of complete lines in one pass, every line keeps its b"\\n"
+    """
+    assert chunk.endswith(b"\n")
+
+    # bytes.splitlines also breaks on a bare b"\r", which reply bodies may contain
+    if b"\r" not in chunk:
+        return chunk.splitlines(keepends=True)
+
+    lines = chunk.split(b"\n")
+    lines.pop()
+    return [line + b"\n" for line in lines]
+
+
 class StreamReader:
     def __init__(self, er: EventReaderABC = None):
         # TODO@haoliang maybe using io.BytesIO
@@ -134,29 +272,109 @@ class StreamReader:
         return self._er.clean and not self._short
 
     def feed(self, data: bytes) -> T.Iterable[types.Event]:
-        _log.debug("feed %s bytes", len(data))
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug("feed %s bytes", len(data))
 
-        start = 0
-        end = len(data) - 1
+        eol_last = data.rfind(b"\n")
+        if eol_last < 0:
+            self._short.extend(data)
+            return
 
-        while True:
+        if self._short:
             short = self._short
-            assert b"\n" not in short
+            short.extend(memoryview(data)[: eol_last + 1])
+            chunk = bytes(short)
+        elif eol_last + 1 == len(data) and isinstance(data, bytes):
+            chunk = data
+        else:
+            chunk = bytes(memoryview(data)[: eol_last + 1])
 
-            eol = data.find(b"\n", start)
-            if eol < 0:
-                short.extend(data[start:])
-                assert b"\n" not in short
-                break
+        # only the trailing partial line is carried over
+        self._short = bytearray(memoryview(data)[eol_last + 1 :])
 
-            short.extend(data[start : eol + 1])
-            assert short.endswith(b"\n")
-            start = eol + 1
+        feed = self._er.feed
+        for line in split_lines(chunk):
+            yield from feed(line)
 
-            line = short
-            self._short = bytearray()
 
-            yield from self._er.feed(line)
+class BufferedStreamReader:
+    """
+    reads into a preallocated buffer which is reused across reads, so no bytes
+    object is allocated per read. the complete lines of a read are copied out of
+    it in one piece and framed like StreamReader does, the partial last line
+    stays in the buffer; lines would be copied by the event reader anyway, the
+    events keep them.
+
+    the interface follows asyncio.BufferedProtocol:
+    * get_buffer(n) returns a writable view to read into, eg. by os.readv
+    * buffer_updated(n) takes the newly written bytes
+    * events() frames what buffer_updated took so far
+    """
+
+    def __init__(self, er: EventReaderABC = None, bufsize: int = 64 << 10):
+        self._buf = bytearray(bufsize)
+        self._view = memoryview(self._buf)
+        # [_start, _end) holds the pending bytes
+        self._start = 0
+        self._end = 0
+
+        self._er = er if er else EventReader()
+
+    @property
+    def clean(self):
+        return self._er.clean and self._start == self._end
+
+    def get_buffer(self, sizehint: int = -1) -> memoryview:
+        """
+        :return: writable view of `sizehint` bytes, all the free space when sizehint < 1
+        """
+        size = max(sizehint, 1)
+        pending = self._end - self._start
+        capacity = len(self._buf)
+
+        if capacity - self._end < size:
+            if pending + size <= capacity:
+                # move the pending bytes to the front, a memmove
+                self._view[:pending] = self._view[self._start : self._end]
+            else:
+                buf = bytearray(max(capacity * 2, pending + size))
+                buf[:pending] = self._view[self._start : self._end]
+                self._buf = buf
+                self._view = memoryview(buf)
+            self._start = 0
+            self._end = pending
+
+        if sizehint < 1:
+            return self._view[self._end :]
+        return self._view[self._end : self._end + sizehint]
+
+    def buffer_updated(self, nbytes: int):
+        """nbytes were written into the view of the last get_buffer()"""
+        assert self._end + nbytes <= len(self._buf)
+
+        self._end += nbytes
+
+    def events(self) -> T.Iterable[types.Event]:
+        eol_last = self._buf.rfind(b"\n", self._start, self._end)
+        if eol_last < 0:
+            return
+
+        chunk = bytes(self._view[self._start : eol_last + 1])
+        self._start = eol_last + 1
+        if self._start == self._end:
+            self._start = self._end = 0
+
+        feed = self._er.feed
+        for line in split_lines(chunk):
+            yield from feed(line)
+
+    def feed(self, data: bytes) -> T.Iterable[types.Event]:
+        """copies data into the buffer, for callers which do not read by themselves"""
+        size = len(data)
+        if size == 0:
+            return
+
+        self.get_buffer(size)[:] = data
+        self.buffer_updated(size)
 
-            if start > end:
-                break
+        yield from self.events()
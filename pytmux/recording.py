@@ -0,0 +1,223 @@
+"""
+raw control mode output, recorded as it was read and replayed into a reader.
+
+a recording is append-only, little endian:
+
+    recording := MAGIC started:u64 record*
+    record    := size:u32 timestamp:u64 chunk
+
+started is the wall clock in nanoseconds, timestamp the nanoseconds since
+started by a monotonic clock. a record cut off by a crash ends the recording.
+
+the sparse index, at path + ".idx", holds (timestamp:u64 offset:u64) of the
+first record after every index_every bytes, so a replay can start anywhere
+without scanning from the beginning.
+
+usage:
+    with Recorder("incident.rec") as recorder:
+        Listener(..., recorder=recorder)
+    ...
+    with Replayer("incident.rec") as replayer:
+        for event in replayer.replay(speed=1):
+            ...
+"""
+
+import logging
+import mmap
+import os
+import struct
+import time
+import typing as T
+from bisect import bisect_right
+
+from . import reader, types
+
+_log = logging.getLogger(__name__)
+
+MAGIC = b"PYTMUXR\x01"
+_HEAD = struct.Struct("<8sQ")
+_RECORD = struct.Struct("<IQ")
+_INDEX = struct.Struct("<QQ")
+
+
+def index_path(path: str) -> str:
+    return path + ".idx"
+
+
+class Recorder:
+    """
+    it is not thread-safe, record from one thread, eg. the listener thread
+    """
+
+    def __init__(self, path: str, index_every: int = 1 << 20):
+        assert index_every > 0
+
+        self._file = open(path, "wb")  # pylint: disable=consider-using-with
+        index = index_path(path)
+        self._index = open(index, "wb")  # pylint: disable=consider-using-with
+        self._index_every = index_every
+
+        self._started = time.monotonic_ns()
+        self._file.write(_HEAD.pack(MAGIC, time.time_ns()))
+        self._offset = _HEAD.size
+        # where the last indexed record starts, there is none yet
+        self._indexed = -index_every
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def record(self, chunk: bytes):
+        """
+        :param chunk: the bytes of one read, any bytes-like
+        """
+        size = len(chunk)
+        if size == 0:
+            return
+
+        timestamp = time.monotonic_ns() - self._started
+
+        if self._offset - self._indexed >= self._index_every:
+            self._index.write(_INDEX.pack(timestamp, self._offset))
+            self._indexed = self._offset
+
+        self._file.write(_RECORD.pack(size, timestamp))
+        self._file.write(chunk)
+        self._offset += _RECORD.size + size
+
+    def flush(self):
+        self._file.flush()
+        self._index.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self._file.close()
+        self._index.close()
+
+
+class Replayer:
+    """
+    maps a recording into memory, chunks are sliced out of the mapping without
+    reading the file.
+    """
+
+    def __init__(self, path: str):
+        """
+        :raise: ValueError when it is not a recording
+        """
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size < _HEAD.size:
+                raise ValueError(f"not a recording: {path}")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.started = _HEAD.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"not a recording: {path}")
+
+        self._timestamps, self._offsets = self._load_index(index_path(path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _load_index(self, path: str) -> T.Tuple[T.List[int], T.List[int]]:
+        timestamps = [0]
+        offsets = [_HEAD.size]
+
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            _log.debug("no index of the recording, replays scan from the start")
+            return timestamps, offsets
+
+        # the last entry may be cut off, and may be ahead of the recording
+        usable = len(data) - len(data) % _INDEX.size
+        for timestamp, offset in _INDEX.iter_unpack(data[:usable]):
+            if offset + _RECORD.size > len(self._map):
+                break
+            timestamps.append(timestamp)
+            offsets.append(offset)
+
+        return timestamps, offsets
+
+    def close(self):
+        self._map.close()
+
+    @property
+    def duration(self) -> int:
+        """nanoseconds from the start to the last record"""
+        last = 0
+        for last, _, _ in self._records(self._offsets[-1]):
+            pass
+        return last
+
+    def _records(self, offset: int) -> T.Iterator[T.Tuple[int, int, int]]:
+        """
+        :return: (timestamp, start, stop) of the chunks from offset on
+        """
+        data = self._map
+        end = len(data)
+        header = _RECORD.size
+        unpack = _RECORD.unpack_from
+
+        while offset + header <= end:
+            size, timestamp = unpack(data, offset)
+            start = offset + header
+            offset = start + size
+            if offset > end:
+                _log.debug("the last record is cut off")
+                return
+            yield timestamp, start, offset
+
+    def chunks(self, start: int = 0) -> T.Iterator[T.Tuple[int, bytes]]:
+        """
+        :param start: nanoseconds since the recording started
+        :return: (timestamp, chunk) of the records from start on
+        """
+        i = max(bisect_right(self._timestamps, start) - 1, 0)
+        data = self._map
+
+        for timestamp, begin, end in self._records(self._offsets[i]):
+            if timestamp >= start:
+                yield timestamp, data[begin:end]
+
+    def replay(
+        self, stream: reader.StreamReader = None, speed: float = None, start: int = 0
+    ) -> T.Iterator[types.Event]:
+        """
+        :param stream: takes the chunks, a new StreamReader by default
+        :param speed: 1 is the pace they were recorded at, 2 twice as fast;
+            None feeds them as fast as possible
+        :param start: see chunks(); a reader should start at the beginning of
+            a line, a record in the middle of a reply would break it
+        """
+        assert speed is None or speed > 0
+
+        if stream is None:
+            stream = reader.StreamReader()
+
+        if speed is None:
+            for _, chunk in self.chunks(start):
+                yield from stream.feed(chunk)
+            return
+
+        first: T.Optional[int] = None
+        began = time.monotonic()
+        for timestamp, chunk in self.chunks(start):
+            if first is None:
+                first, began = timestamp, time.monotonic()
+            delay = began + (timestamp - first) / 1e9 / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield from stream.feed(chunk)
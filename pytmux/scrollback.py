@@ -0,0 +1,273 @@
+"""
+recent output of every pane, without capture-pane.
+
+the newest bytes of a pane stay in a fixed size ring in memory, older ones
+spill into a ring in a memory mapped file of the pane, the oldest of which are
+dropped. offsets count the bytes a pane produced since it was first seen.
+
+usage:
+    with Scrollback() as scrollback:
+        for events in ...:
+            scrollback.feed(events)
+        scrollback.tail(12, 4096)  # the last 4KiB of %12
+"""
+
+import mmap
+import os
+import tempfile
+import typing as T
+from collections import OrderedDict
+
+from . import types
+
+
+class _Ring:
+    """the newest bytes written to it, as many as its buffer takes"""
+
+    __slots__ = ("_buf", "size")
+
+    def __init__(self, buf: T.Union[bytearray, mmap.mmap]):
+        self._buf = buf
+        self.size = 0
+
+    def write(self, end: int, data: bytes):
+        """
+        :param end: the offset data starts at, where the ring currently ends
+        """
+        buf = self._buf
+        cap = len(buf)
+
+        if len(data) > cap:
+            end += len(data) - cap
+            data = data[-cap:]
+
+        pos = end % cap
+        head = min(len(data), cap - pos)
+        buf[pos : pos + head] = data[:head]
+        buf[: len(data) - head] = data[head:]
+
+        self.size = min(self.size + len(data), cap)
+
+    def read(self, start: int, stop: int) -> bytes:
+        """[start, stop) by offsets, which the caller ensures are in the ring"""
+        buf = self._buf
+        cap = len(buf)
+        pos = start % cap
+        size = stop - start
+        if pos + size <= cap:
+            return bytes(buf[pos : pos + size])
+        return bytes(buf[pos:]) + bytes(buf[: pos + size - cap])
+
+
+class _Spill(_Ring):
+    """a ring in a file, which takes a single fd however large it is"""
+
+    __slots__ = ()
+
+    def __init__(self, capacity: int, directory: T.Optional[str]):
+        # unlinked already; the mapping keeps its own fd, this one is closed
+        with tempfile.TemporaryFile(dir=directory) as file:
+            # sparse, disk space is taken as it is written
+            os.ftruncate(file.fileno(), capacity)
+            super().__init__(mmap.mmap(file.fileno(), capacity))
+
+    def close(self):
+        self._buf.close()
+
+
+class _Pane:
+    __slots__ = ("ring", "spill", "spilled", "end")
+
+    def __init__(self):
+        # None once it gave its memory up
+        self.ring: T.Optional[_Ring] = None
+        self.spill: T.Optional[_Spill] = None
+        # the offset the ring starts at, the spill ends at
+        self.spilled = 0
+        self.end = 0
+
+    @property
+    def start(self) -> int:
+        if self.spill is not None:
+            return self.spilled - self.spill.size
+        return self.spilled
+
+
+class Scrollback:
+    """
+    nothing here does I/O on the control connection, feed() it the events.
+    it is not thread-safe, feed and read it from one thread.
+
+    * ring_size: bytes kept in memory per pane
+    * max_memory: bytes kept in memory over all panes, the rings of the panes
+      which wrote the longest time ago spill first; it is ring_size per pane at
+      least, so 0 keeps nothing of an idle pane in memory
+    * max_spill: bytes kept on disk per pane, in one spill file, 0 disables
+      spilling; a pane takes an fd once it spilled
+    * spill_dir: where the spill files go, see tempfile.gettempdir
+    """
+
+    def __init__(
+        self,
+        ring_size: int = 64 << 10,
+        max_memory: int = 64 << 20,
+        max_spill: int = 64 << 20,
+        spill_dir: str = None,
+    ):
+        assert ring_size > 0 and max_memory >= 0 and max_spill >= 0
+
+        self._ring_size = ring_size
+        self._max_rings = max(max_memory // ring_size, 1)
+        self._max_spill = max_spill
+        self._spill_dir = spill_dir
+
+        self._panes: T.Dict[int, _Pane] = {}
+        # panes holding a ring, the least recently written first
+        self._resident: T.OrderedDict[int, _Pane] = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, pane: int):
+        return pane in self._panes
+
+    @property
+    def panes(self) -> T.List[int]:
+        return list(self._panes)
+
+    @property
+    def resident(self) -> int:
+        """bytes of memory the rings take"""
+        return len(self._resident) * self._ring_size
+
+    def feed(self, events: T.Iterable[types.Event]):
+        for event in events:
+            # a lazy notification is an instance of its eager class too
+            if isinstance(event, (types.Output, types.ExtendedOutput)):
+                self.write(event.pane, types.unescape(event.value))
+
+    def write(self, pane: int, data: bytes):
+        """stores the raw output of a pane"""
+        if not data:
+            return
+
+        try:
+            state = self._panes[pane]
+        except KeyError:
+            state = self._panes[pane] = _Pane()
+
+        ring = state.ring
+        if ring is None:
+            ring = self._take_ring(pane, state)
+        else:
+            self._resident.move_to_end(pane)
+
+        cap = self._ring_size
+        if len(data) > cap:
+            ring_start = state.end - ring.size
+            head = data[:-cap]
+            self._spill(state, ring_start, ring.read(ring_start, state.end) + head)
+            ring.size = 0
+            state.end += len(head)
+            data = data[-cap:]
+
+        # the oldest bytes of the ring make room for data
+        overflow = ring.size + len(data) - cap
+        if overflow > 0:
+            ring_start = state.end - ring.size
+            self._spill(state, ring_start, ring.read(ring_start, ring_start + overflow))
+
+        ring.write(state.end, data)
+        state.end += len(data)
+        state.spilled = state.end - ring.size
+
+    def bounds(self, pane: int) -> T.Tuple[int, int]:
+        """
+        :return: the offsets [start, end) still kept of the pane
+        :raise: KeyError for an unknown pane
+        """
+        state = self._panes[pane]
+        return state.start, state.end
+
+    def read(self, pane: int, offset: int, size: int) -> bytes:
+        """
+        :return: the bytes in [offset, offset + size) still kept, less than size
+            when some are dropped already or not yet written
+        :raise: KeyError for an unknown pane
+        """
+        assert offset >= 0 and size >= 0
+
+        state = self._panes[pane]
+        start = max(offset, state.start)
+        stop = min(offset + size, state.end)
+        if start >= stop:
+            return b""
+
+        chunks = []
+
+        if start < state.spilled:
+            assert state.spill is not None
+            upto = min(stop, state.spilled)
+            chunks.append(state.spill.read(start, upto))
+            start = upto
+
+        if start < stop:
+            assert state.ring is not None
+            chunks.append(state.ring.read(start, stop))
+
+        return b"".join(chunks)
+
+    def tail(self, pane: int, size: int) -> bytes:
+        """
+        :return: the last size bytes of the pane, or all that is kept of it
+        :raise: KeyError for an unknown pane
+        """
+        end = self._panes[pane].end
+        return self.read(pane, max(end - size, 0), size)
+
+    def drop(self, pane: int):
+        """forgets a pane, eg. once it is closed"""
+        state = self._panes.pop(pane, None)
+        if state is None:
+            return
+        self._resident.pop(pane, None)
+        if state.spill is not None:
+            state.spill.close()
+
+    def close(self):
+        for pane in list(self._panes):
+            self.drop(pane)
+
+    def _take_ring(self, pane: int, state: _Pane) -> _Ring:
+        resident = self._resident
+
+        if len(resident) < self._max_rings:
+            ring = _Ring(bytearray(self._ring_size))
+        else:
+            _, idle = resident.popitem(last=False)
+            assert idle.ring is not None
+            ring = idle.ring
+            idle_start = idle.end - ring.size
+            self._spill(idle, idle_start, ring.read(idle_start, idle.end))
+            idle.spilled = idle.end
+            idle.ring = None
+            ring.size = 0
+
+        state.ring = ring
+        resident[pane] = state
+        return ring
+
+    def _spill(self, state: _Pane, offset: int, data: bytes):
+        """
+        :param offset: where data starts, the end of the spill
+        """
+        if not self._max_spill:
+            return
+
+        spill = state.spill
+        if spill is None:
+            spill = state.spill = _Spill(self._max_spill, self._spill_dir)
+        spill.write(offset, data)
@@ -0,0 +1,296 @@
+"""
+a mirror of the sessions, windows and panes of a tmux server, seeded by one
+list-panes and kept current by the notifications.
+
+usage:
+    state = State()
+    for command in state.seed():
+        client.send(command)  # replies go to state.load, in order
+    ...
+    for noti in notis:
+        for command in state.apply(noti):
+            ...
+"""
+
+import typing as T
+from collections import deque
+
+import attr
+
+from . import layout, types
+
+# names come last: a session name never has a ':', a window name may have anything
+_FORMAT = (
+    "#{session_id} #{window_id} #{pane_id} #{window_active} #{pane_active}"
+    " #{window_layout} #{session_name}:#{window_name}"
+)
+
+
+@attr.s(slots=True)
+class Session:
+    id: int = attr.ib()
+    name: str = attr.ib()
+    windows: T.Set[int] = attr.ib(factory=set)
+    active_window: T.Optional[int] = attr.ib(default=None)
+
+
+@attr.s(slots=True)
+class Window:
+    id: int = attr.ib()
+    name: T.Optional[str] = attr.ib(default=None)
+    # a window can be linked into several sessions
+    sessions: T.Set[int] = attr.ib(factory=set)
+    panes: T.Set[int] = attr.ib(factory=set)
+    active_pane: T.Optional[int] = attr.ib(default=None)
+    layout: T.Optional[bytes] = attr.ib(default=None)
+
+
+@attr.s(slots=True)
+class Pane:
+    id: int = attr.ib()
+    window: int = attr.ib()
+
+
+@attr.s(slots=True, frozen=True)
+class _Row:
+    session: int = attr.ib()
+    window: int = attr.ib()
+    pane: int = attr.ib()
+    window_active: bool = attr.ib()
+    pane_active: bool = attr.ib()
+    layout: bytes = attr.ib()
+    session_name: str = attr.ib()
+    window_name: str = attr.ib()
+
+    @classmethod
+    def from_bytes(cls, line: bytes) -> "_Row":
+        fields = line.rstrip(b"\n").split(b" ", 6)
+        session, window, pane, window_active, pane_active, window_layout, names = fields
+        session_name, _, window_name = names.decode().partition(":")
+
+        return cls(
+            types.dollar_int(session),
+            types.at_int(window),
+            types.percent_int(pane),
+            window_active == b"1",
+            pane_active == b"1",
+            window_layout,
+            session_name,
+            window_name,
+        )
+
+
+# what a query lists: everything, ("session", id) or ("window", id)
+_Query = T.Optional[T.Tuple[str, int]]
+
+
+class State:
+    """
+    nothing here does I/O: apply() the notifications of the control connection,
+    send the commands seed() and apply() return, and load() their replies in
+    the order of sending.
+
+    %sessions-changed does not tell which session came or went, it is the only
+    notification which lists everything again; an unknown session or window
+    lists just that one.
+    """
+
+    def __init__(self):
+        self.sessions: T.Dict[int, Session] = {}
+        self.windows: T.Dict[int, Window] = {}
+        self.panes: T.Dict[int, Pane] = {}
+        # the session of this client
+        self.attached: T.Optional[int] = None
+
+        self._queries: T.Deque[_Query] = deque()
+
+    @property
+    def syncing(self) -> bool:
+        """whether some replies are still to be loaded"""
+        return bool(self._queries)
+
+    def seed(self) -> T.List[str]:
+        return [self._query(None)]
+
+    def load(self, reply: types.Reply):
+        """
+        :raise: RuntimeError when no reply is expected
+        """
+        try:
+            query = self._queries.popleft()
+        except IndexError as e:
+            raise RuntimeError("no query is waiting for a reply") from e
+
+        if not reply.success:
+            # it was gone before the query ran
+            if query is not None:
+                kind, ident = query
+                if kind == "session":
+                    self._drop_session(ident)
+                else:
+                    self._drop_window(ident)
+            return
+
+        rows = [_Row.from_bytes(bytes(line)) for line in reply.body]
+
+        if query is None:
+            self.sessions.clear()
+            self.windows.clear()
+            self.panes.clear()
+        elif query[0] == "session":
+            session = self.sessions.get(query[1])
+            if session is not None:
+                for linked in list(session.windows):
+                    self._unlink(session.id, linked)
+        else:
+            # its links to other sessions stay, the rows tell only one of them
+            window = self.windows.get(query[1])
+            if window is not None:
+                self._set_panes(window, set())
+
+        for row in rows:
+            self._add_row(row)
+
+    def apply(self, noti: types.Notification) -> T.List[str]:
+        """
+        :return: the commands to send, when the notification is not enough
+        """
+        # pylint: disable=too-many-return-statements,too-many-branches
+        # a lazy notification is an instance of its eager class too
+        if isinstance(noti, types.LayoutChange):
+            window = self.windows.get(noti.window)
+            if window is None:
+                return [self._query(("window", noti.window))]
+            window.layout = noti.window_layout
+            self._set_panes(window, set(layout.parse(noti.window_layout).panes))
+            return []
+
+        if isinstance(noti, types.WindowPaneChanged):
+            window = self.windows.get(noti.window)
+            if window is None:
+                return [self._query(("window", noti.window))]
+            window.active_pane = noti.pane
+            return []
+
+        if isinstance(noti, (types.WindowRenamed, types.UnlinkedWindowRenamed)):
+            window = self.windows.get(noti.window)
+            if window is None:
+                return [self._query(("window", noti.window))]
+            window.name = noti.new_name
+            return []
+
+        if isinstance(noti, types.WindowAdd):
+            if self.attached is not None and self.attached in self.sessions:
+                self._link(self.attached, noti.window)
+            return [self._query(("window", noti.window))]
+
+        if isinstance(noti, types.UnlinkedWindowAdd):
+            return [self._query(("window", noti.window))]
+
+        if isinstance(noti, (types.WindowClose, types.UnlinkedWindowClose)):
+            self._drop_window(noti.window)
+            return []
+
+        if isinstance(noti, types.SessionWindowChanged):
+            session = self.sessions.get(noti.session)
+            if session is None:
+                return [self._query(("session", noti.session))]
+            session.active_window = noti.window
+            return []
+
+        if isinstance(noti, types.SessionRenamed):
+            session = self.sessions.get(noti.session)
+            if session is None:
+                return [self._query(("session", noti.session))]
+            session.name = noti.new_name
+            return []
+
+        if isinstance(noti, types.SessionChanged):
+            self.attached = noti.session
+            if noti.session not in self.sessions:
+                return [self._query(("session", noti.session))]
+            self.sessions[noti.session].name = noti.session_name
+            return []
+
+        if isinstance(noti, types.SessionsChanged):
+            return [self._query(None)]
+
+        return []
+
+    def _query(self, query: _Query) -> str:
+        self._queries.append(query)
+
+        if query is None:
+            return f"list-panes -a -F '{_FORMAT}'"
+        kind, ident = query
+        if kind == "session":
+            return f"list-panes -s -t '${ident}' -F '{_FORMAT}'"
+        return f"list-panes -t '@{ident}' -F '{_FORMAT}'"
+
+    def _add_row(self, row: _Row):
+        session = self.sessions.get(row.session)
+        if session is None:
+            session = self.sessions[row.session] = Session(
+                row.session, row.session_name
+            )
+        else:
+            session.name = row.session_name
+
+        window = self.windows.get(row.window)
+        if window is None:
+            window = self.windows[row.window] = Window(row.window)
+        window.name = row.window_name
+        window.layout = row.layout
+        window.sessions.add(row.session)
+        window.panes.add(row.pane)
+
+        session.windows.add(row.window)
+        if row.window_active:
+            session.active_window = row.window
+        if row.pane_active:
+            window.active_pane = row.pane
+
+        self.panes[row.pane] = Pane(row.pane, row.window)
+
+    def _link(self, session: int, window: int):
+        self.sessions[session].windows.add(window)
+        if window not in self.windows:
+            self.windows[window] = Window(window)
+        self.windows[window].sessions.add(session)
+
+    def _unlink(self, session: int, window: int):
+        self.sessions[session].windows.discard(window)
+        linked = self.windows.get(window)
+        if linked is None:
+            return
+        linked.sessions.discard(session)
+        if not linked.sessions:
+            self._drop_window(window)
+
+    def _set_panes(self, window: Window, panes: T.Set[int]):
+        for pane in window.panes - panes:
+            self.panes.pop(pane, None)
+        for pane in panes - window.panes:
+            self.panes[pane] = Pane(pane, window.id)
+        window.panes = panes
+
+    def _drop_window(self, ident: int):
+        window = self.windows.pop(ident, None)
+        if window is None:
+            return
+        for pane in window.panes:
+            self.panes.pop(pane, None)
+        for linked in window.sessions:
+            session = self.sessions.get(linked)
+            if session is not None:
+                session.windows.discard(ident)
+                if session.active_window == ident:
+                    session.active_window = None
+
+    def _drop_session(self, ident: int):
+        session = self.sessions.get(ident)
+        if session is None:
+            return
+        for window in list(session.windows):
+            self._unlink(ident, window)
+        del self.sessions[ident]
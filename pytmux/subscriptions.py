@@ -0,0 +1,263 @@
+import threading
+import typing as T
+from collections import Counter
+
+import attr
+
+from . import types
+
+# the id fields a subscription can narrow down to
+SCOPES = ("pane", "window", "session")
+
+# let through whatever is subscribed, flow control and the end of a connection
+# depend on them
+ALWAYS = (types.Pause, types.Continue, types.Exit)
+
+
+@attr.s(slots=True, frozen=True)
+class Subscription:
+    cls: type = attr.ib()
+    # one of SCOPES, None for every event of cls
+    scope: T.Optional[str] = attr.ib(default=None)
+    id: T.Optional[int] = attr.ib(default=None)
+
+
+# digits of the id in a line, field name, ids
+_Scoped = T.Tuple[T.Callable[[bytes], T.Optional[bytes]], str, T.Set[int]]
+# cls -> None for every event of it
+_Index = T.Dict[type, T.Optional[T.List[_Scoped]]]
+
+
+def _has_field(cls, name: str) -> bool:
+    """cls is an attrs class, which mypy cannot tell from a Notification subclass"""
+    return hasattr(attr.fields(cls), name)
+
+
+class Subscriptions:
+    """
+    the notifications anybody asked for, by class and optionally by pane,
+    window or session id.
+
+    EventReader asks wants() with the raw line before decoding it, the lookup
+    is a dict hit plus a set hit per id field no matter how many subscriptions.
+
+    subscribing to a base class, eg. types.Notification, covers its subclasses.
+    ALWAYS are wanted and matched without a subscription.
+
+    an internal stage, eg. FlowControl, can hold() classes: wants() lets them
+    through the reader, matches() still tells what was subscribed, for the
+    listener to filter them out after the stage saw them.
+
+    changes are safe along with a reader in another thread: an id joins or
+    leaves the set the index holds, which is atomic; a new class or scope
+    builds a new index which replaces the old one at once.
+    """
+
+    def __init__(self):
+        self._counts: T.Counter[Subscription] = Counter()
+        # classes subscribed without an id
+        self._everything: T.Set[type] = set()
+        self._ids: T.Dict[T.Tuple[type, str], T.Set[int]] = {}
+        self._held: T.Counter[type] = Counter()
+        # of wants(), and of matches() which leaves _held out
+        self._index: _Index = dict.fromkeys(ALWAYS)
+        self._matching: _Index = dict.fromkeys(ALWAYS)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, sub: Subscription):
+        return sub in self._counts
+
+    def subscribe(
+        self,
+        cls: type,
+        pane: int = None,
+        window: int = None,
+        session: int = None,
+    ) -> T.List[Subscription]:
+        """
+        :return: the subscriptions to pass to unsubscribe, one per notification class
+        :raise: ValueError for more than one id, or an id cls does not have
+        """
+        given = [
+            (scope, ident)
+            for scope, ident in zip(SCOPES, (pane, window, session))
+            if ident is not None
+        ]
+        if len(given) > 1:
+            raise ValueError("subscribe to one of pane, window or session at a time")
+
+        classes = [noti for noti in types.ALL_NOTI if issubclass(noti, cls)]
+        if not classes:
+            raise ValueError(f"{cls} is not a notification class")
+
+        if given:
+            scope, ident = given[0]
+            classes = [noti for noti in classes if _has_field(noti, scope)]
+            if not classes:
+                raise ValueError(f"{cls} has no {scope} field")
+            subs = [Subscription(noti, scope, ident) for noti in classes]
+        else:
+            subs = [Subscription(noti) for noti in classes]
+
+        with self._lock:
+            rebuild = [self._add(sub) for sub in subs]
+            if any(rebuild):
+                self._rebuild()
+
+        return subs
+
+    def unsubscribe(self, subs: T.Iterable[Subscription]):
+        with self._lock:
+            rebuild = [self._remove(sub) for sub in subs]
+            if any(rebuild):
+                self._rebuild()
+
+    def hold(self, *classes: type):
+        """lets every event of classes through wants(), but not matches()"""
+        with self._lock:
+            self._held.update(classes)
+            self._rebuild()
+
+    def release(self, *classes: type):
+        with self._lock:
+            self._held.subtract(classes)
+            self._held = +self._held
+            self._rebuild()
+
+    def wants(self, cls: type, line) -> bool:
+        """
+        :param line: the raw line of a cls notification
+        """
+        index = self._index
+
+        try:
+            fields = index[cls]
+        except KeyError:
+            return False
+
+        if fields is None:
+            return True
+
+        if not isinstance(line, bytes):
+            line = bytes(line)
+
+        for digits, _, ids in fields:
+            data = digits(line)
+            if data and int(data) in ids:
+                return True
+
+        return False
+
+    def matches(self, noti: types.Notification) -> bool:
+        """wants() of a decoded notification, without the held classes"""
+        try:
+            fields = self._matching[noti.event_class]
+        except KeyError:
+            return False
+
+        if fields is None:
+            return True
+
+        return any(getattr(noti, name) in ids for _, name, ids in fields)
+
+    def _add(self, sub: Subscription) -> bool:
+        """
+        must hold _lock
+
+        :return: whether the index needs to be built again
+        """
+        self._counts[sub] += 1
+        if self._counts[sub] > 1:
+            return False
+
+        if sub.scope is None:
+            self._everything.add(sub.cls)
+            return True
+
+        # subscribe gives a scope only along with an id
+        assert sub.id is not None
+        ids = self._ids.get((sub.cls, sub.scope))
+        if ids is None:
+            self._ids[(sub.cls, sub.scope)] = {sub.id}
+            return True
+
+        ids.add(sub.id)
+        return False
+
+    def _remove(self, sub: Subscription) -> bool:
+        """
+        must hold _lock
+
+        :return: whether the index needs to be built again
+        """
+        if sub not in self._counts:
+            return False
+
+        self._counts[sub] -= 1
+        if self._counts[sub] > 0:
+            return False
+        del self._counts[sub]
+
+        if sub.scope is None:
+            self._everything.discard(sub.cls)
+            return True
+
+        ids = self._ids[(sub.cls, sub.scope)]
+        ids.discard(sub.id)
+        if ids:
+            return False
+
+        del self._ids[(sub.cls, sub.scope)]
+        return True
+
+    def _rebuild(self):
+        """must hold _lock"""
+        matching = self._build()
+        index = {**matching, **dict.fromkeys(self._held)}
+        self._index = index
+        self._matching = matching
+
+    def _build(self) -> _Index:
+        """must hold _lock"""
+        index: _Index = dict.fromkeys(ALWAYS)
+        index.update(dict.fromkeys(self._everything))
+
+        for (cls, scope), ids in self._ids.items():
+            # everything of it already, by ALWAYS or by _everything
+            if index.get(cls, ()) is None:
+                continue
+            i, last = types.field_position(cls, scope)
+            # the very set, later ids go into it without building again
+            index.setdefault(cls, []).append(  # type: ignore
+                (_id_digits(cls, i, last), scope, ids)
+            )
+
+        return index
+
+
+def _id_digits(cls, index: int, last: bool) -> T.Callable[[bytes], T.Optional[bytes]]:
+    """
+    cuts the digits of an id field out of a line, without its sigil %, @ or $
+    """
+    if index > 0:
+
+        def nth(line: bytes):
+            data = types.nth_field(line, index, last)
+            return data[1:] if data is not None else None
+
+        return nth
+
+    # the first field is right after the header, no need to look for it
+    start = len(cls.header) + 2
+
+    if last:
+        return lambda line: line[start:-1]
+
+    def first(line: bytes):
+        stop = line.find(b" ", start)
+        return line[start:stop] if stop >= 0 else line[start:-1]
+
+    return first
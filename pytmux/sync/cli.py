@@ -2,7 +2,7 @@ import logging
 import subprocess
 from distutils.version import StrictVersion
 
-from pytmux.listener import Listener
+from pytmux.sync.listener import Listener
 
 
 def listen_all_events(tmux_args: list):
@@ -33,11 +33,11 @@ def listen_all_events(tmux_args: list):
             with listener:
                 try:
                     while True:
-                        with listener.dingdong():
-                            while listener.notiq:
-                                print(listener.notiq.get_nowait())
-                            while listener.replyq:
-                                print(listener.replyq.get_nowait())
+                        notis, replies = listener.drain()
+                        for event in notis:
+                            print(event)
+                        for event in replies:
+                            print(event)
                 except ValueError:
                     pass
         finally:
@@ -0,0 +1,96 @@
+import os
+import threading
+import typing as T
+from concurrent.futures import Future
+
+from .. import types
+from ..commands import Command, CommandTracker, encode
+from ..flow import FlowControl
+from .hub import Connection
+from .listener import Listener
+
+
+class Client:
+    """
+    sends commands over the stdin of a tmux control client, without waiting
+    for the replies of earlier ones.
+
+    the listener thread matches every reply to its command and resolves the
+    future returned by send; replies of other commands still go to the replyq.
+
+    usage:
+        proc = subprocess.Popen(["tmux", "-C", ...], stdin=PIPE, stdout=PIPE)
+        listener = Listener.from_args(proc.stdout.fileno(), 10, 10)
+        client = Client(proc.stdin.fileno(), listener)
+        listener.listen_in_background()
+
+        futures = client.send_many(f"display -p -t %{pane} '#{{pane_pid}}'" for ...)
+        replies = [future.result() for future in futures]
+    """
+
+    def __init__(self, fd: int, listener: T.Union[Listener, Connection]):
+        if listener.tracker is None:
+            listener.tracker = CommandTracker()
+
+        self._fd = fd
+        self._listener = listener
+        self._tracker = listener.tracker
+        # keeps the order of writes and of registered futures the same
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """commands in flight"""
+        return len(self._tracker)
+
+    def send(self, command: Command) -> Future:
+        return self.send_many([command])[0]
+
+    def send_many(self, commands: T.Iterable[Command]) -> T.List[Future]:
+        """
+        pipelines the commands in a single write
+
+        :return: a future per command, resolving to its Reply
+            or to the last ReplyChunk when the listener streams replies
+        """
+        data = b"".join(encode(command) for command in commands)
+        futures: T.List[Future] = [Future() for _ in range(data.count(b"\n"))]
+
+        with self._lock:
+            for future in futures:
+                # registered before writing, the reply may come back at once
+                self._tracker.sent(future)
+
+            try:
+                self._write(data)
+            except OSError:
+                self._tracker.unsent(len(futures))
+                raise
+
+        return futures
+
+    def enable_flow_control(self, flow: FlowControl) -> Future:
+        """
+        lets the listener stop reading while its notiq fills up, replies included,
+        and read on and continue the panes tmux paused once the consumer caught up
+
+        :return: the future of the command enabling pause-after
+        :raise: TypeError for a hub connection, it has no notiq to watch
+        """
+        if not isinstance(self._listener, Listener):
+            raise TypeError("flow control needs a Listener")
+
+        self._listener.flow_send = self.send_many
+        self._listener.flow = flow
+
+        # after flow is set, so the listener filters what was held for it
+        subscriptions = self._listener.subscriptions
+        if subscriptions is not None:
+            # flow control sees every output, the consumer what it subscribed
+            subscriptions.hold(types.Output, types.ExtendedOutput)
+        return self.send(flow.setup())
+
+    def _write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
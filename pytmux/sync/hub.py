@@ -0,0 +1,363 @@
+import os
+import select
+import threading
+import typing as T
+from collections import deque
+from queue import Full
+
+from ..commands import CommandTracker
+from ..reader import EventReader, StreamReader
+from ..subscriptions import Subscriptions
+from ..types import Notification, Reply, ReplyChunk
+from .listener import (
+    AdaptiveBufsize,
+    NotiQ,
+    Overflow,
+    ReadStats,
+    ReplyQ,
+    Waker,
+    _resolve,
+    drain_all,
+    route,
+)
+
+
+class Connection:
+    """
+    one control connection of a Hub; the consumer side is the same as Listener's.
+
+    the hub thread never blocks on a consumer: replies not fitting in the replyq
+    are held back and the fd is not polled anymore, until drain() makes room.
+    """
+
+    def __init__(
+        self,
+        hub: "Hub",
+        fd: int,
+        reply_cap: int,
+        noti_cap: int,
+        reply_chunk_lines: int = None,
+        tracker: CommandTracker = None,
+        noti_overflow: T.Dict[type, Overflow] = None,
+        subscriptions: Subscriptions = None,
+    ):
+        self.fd = fd
+        self.term = threading.Event()
+        self.replyq = ReplyQ(reply_cap)
+        self.notiq = NotiQ(noti_cap, noti_overflow)
+        # resolves the futures of commands sent by a Client, instead of queueing replies
+        self.tracker = tracker
+        self.stats = ReadStats()
+        # the exception which broke this connection, BrokenPipeError on eof
+        self.exc: T.Optional[BaseException] = None
+
+        self._hub = hub
+        self._dingdong = threading.Condition()
+        self._reader = StreamReader(
+            EventReader(chunk_lines=reply_chunk_lines, subscriptions=subscriptions)
+        )
+        self._bufsize = AdaptiveBufsize()
+        # replies the replyq could not take, the fd is paused while not empty
+        self._backlog: T.Deque[T.Union[Reply, ReplyChunk]] = deque()
+
+    def drain(
+        self, timeout: float = None
+    ) -> T.Tuple[T.List[Notification], T.List[T.Union[Reply, ReplyChunk]]]:
+        """
+        waits until events are available, then takes all of them at once
+
+        :return: (notifications, replies), both empty on timeout
+        :raise: ValueError when term.is_set() and nothing is left
+        """
+        with self._dingdong:
+            if not (self.notiq or self.replyq or self._backlog or self.term.is_set()):
+                self._dingdong.wait(timeout)
+
+            notis = self.notiq.drain()
+            replies = self.replyq.drain()
+            if self._backlog:
+                replies.extend(self._backlog)
+                self._backlog.clear()
+                self._hub._resume(self)
+
+        if not (notis or replies) and self.term.is_set():
+            raise ValueError("term has been set")
+
+        return notis, replies
+
+    def close(self):
+        """stops polling the fd, which is left open for the caller to close"""
+        self._hub.remove(self)
+
+    def _publish(self, events):
+        notis, replies = route(events, self.tracker)
+        if not (notis or replies):
+            return
+
+        with self._dingdong:
+            for noti in notis:
+                self.notiq.put(noti)
+
+            for i, reply in enumerate(replies):
+                if self._backlog:
+                    self._backlog.extend(replies[i:])
+                    break
+                try:
+                    self.replyq.put_nowait(reply)
+                except Full:
+                    self._backlog.extend(replies[i:])
+                    break
+
+            self._dingdong.notify()
+
+    def _refill(self) -> bool:
+        """
+        moves held back replies into the replyq
+
+        :return: whether the backlog is gone
+        """
+        with self._dingdong:
+            while self._backlog:
+                try:
+                    self.replyq.put_nowait(self._backlog[0])
+                except Full:
+                    return False
+                self._backlog.popleft()
+            return True
+
+    def _stop(self, exc: T.Optional[BaseException]):
+        self.exc = exc
+        self.term.set()
+        with self._dingdong:
+            # nothing reads the fd anymore, so no drain() has to resume it
+            self._backlog.clear()
+            self._dingdong.notify_all()
+
+        if self.tracker:
+            for future in self.tracker.drop():
+                _resolve(future, exception=BrokenPipeError("connection stopped"))
+
+
+class Hub:
+    """
+    serves many control connections with a single thread and epoll instance,
+    so threads and context switches do not grow with the connections.
+
+    a connection breaking, eg. tmux exited, stops only that connection.
+
+    usage:
+        hub = Hub()
+        hub.start()
+        conn = hub.add(proc.stdout.fileno(), 10, 100)
+        notis, replies = conn.drain()
+        ...
+        hub.close()
+    """
+
+    def __init__(self):
+        self._conns: T.Dict[int, Connection] = {}
+        # connections the hub thread is going to work on
+        self._removing: T.List[Connection] = []
+        self._resuming: T.List[Connection] = []
+        self._paused: T.Set[Connection] = set()
+        self._lock = threading.Lock()
+
+        self._poller = select.epoll()
+        self._waker = Waker()
+        self._poller.register(self._waker.fileno(), select.EPOLLIN)
+        self._term = threading.Event()
+        self._thread: T.Optional[HubThread] = None
+        self._dead = False
+
+    def __len__(self):
+        return len(self._conns)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, etype, exc, traceback):
+        self.close()
+
+    def start(self):
+        if self._dead:
+            raise RuntimeError("hub was dead, can not start anymore")
+
+        if self._thread:
+            return
+
+        self._thread = HubThread(self)
+        self._thread.start()
+
+    def add(
+        self,
+        fd: int,
+        reply_cap: int,
+        noti_cap: int,
+        reply_chunk_lines: int = None,
+        tracker: CommandTracker = None,
+        noti_overflow: T.Dict[type, Overflow] = None,
+        subscriptions: Subscriptions = None,
+    ) -> Connection:
+        if self._dead:
+            raise RuntimeError("hub was dead, can not add connections anymore")
+
+        conn = Connection(
+            self,
+            fd,
+            reply_cap,
+            noti_cap,
+            reply_chunk_lines,
+            tracker,
+            noti_overflow,
+            subscriptions,
+        )
+        os.set_blocking(fd, False)
+
+        with self._lock:
+            if fd in self._conns:
+                raise ValueError(f"fd {fd} was added already")
+            self._conns[fd] = conn
+            # epoll_ctl is fine along with a running epoll_wait
+            self._poller.register(fd, select.EPOLLIN)
+
+        return conn
+
+    def remove(self, conn: Connection):
+        """stops the connection, the fd is not used by the hub after returning"""
+        with self._lock:
+            if self._conns.get(conn.fd) is not conn:
+                return
+            stopped = self._thread is None or self._dead
+            if stopped:
+                self._forget(conn)
+            else:
+                self._removing.append(conn)
+                self._waker.wake()
+
+        # not under _lock, drain() takes _dingdong before it
+        if stopped:
+            conn._stop(None)
+        else:
+            conn.term.wait()
+
+    def close(self):
+        if self._dead:
+            return
+
+        self._term.set()
+        self._waker.wake()
+        if self._thread:
+            self._thread.join()
+
+        with self._lock:
+            self._dead = True
+            conns = list(self._conns.values())
+            for conn in conns:
+                self._forget(conn)
+
+        for conn in conns:
+            conn._stop(None)
+
+        self._poller.close()
+        self._waker.close()
+
+        if self._thread:
+            self._thread.raise_if_any()
+
+    def _resume(self, conn: Connection):
+        # under _lock, so close() can not close the waker in between
+        with self._lock:
+            if self._dead or self._term.is_set():
+                return
+            self._resuming.append(conn)
+            self._waker.wake()
+
+    def _forget(self, conn: Connection):
+        """must hold _lock"""
+        del self._conns[conn.fd]
+        self._paused.discard(conn)
+        self._poller.unregister(conn.fd)
+
+
+class HubThread(threading.Thread):
+    def __init__(self, hub: Hub):
+        self._hub = hub
+        self._exc = None
+
+        super().__init__(daemon=True)
+
+    def raise_if_any(self):
+        if self._exc:
+            raise self._exc
+
+    def run(self):
+        try:
+            self._mainloop()
+        # pylint: disable=broad-except
+        except Exception as e:
+            self._exc = e
+
+    def _mainloop(self):
+        hub = self._hub
+        conns = hub._conns
+        waker = hub._waker
+        waker_fd = waker.fileno()
+
+        while not hub._term.is_set():
+            for fd, _ in hub._poller.poll():
+                if fd == waker_fd:
+                    waker.drain()
+                    self._housekeep()
+                    continue
+
+                # removed while this batch of events was pending
+                conn = conns.get(fd)
+                if conn is None:
+                    continue
+
+                self._read(conn)
+
+    def _read(self, conn: Connection):
+        try:
+            events, closed = drain_all(conn.fd, conn._reader, conn._bufsize, conn.stats)
+            # what was read before EOF goes out first, eg. the final %exit
+            conn._publish(events)
+            if closed:
+                raise BrokenPipeError("remote closed pipe")
+        # pylint: disable=broad-except
+        except Exception as e:
+            # eg. BrokenPipeError or ProtocolError, only this connection is done
+            with self._hub._lock:
+                self._hub._forget(conn)
+            conn._stop(e)
+            return
+
+        # under dingdong, or a drain() in between would not know to resume it
+        with conn._dingdong:
+            if conn._backlog:
+                with self._hub._lock:
+                    self._hub._poller.modify(conn.fd, 0)
+                    self._hub._paused.add(conn)
+
+    def _housekeep(self):
+        hub = self._hub
+
+        with hub._lock:
+            removing, hub._removing = hub._removing, []
+            resuming, hub._resuming = hub._resuming, []
+
+            for conn in removing:
+                if hub._conns.get(conn.fd) is conn:
+                    hub._forget(conn)
+
+        for conn in removing:
+            conn._stop(None)
+
+        for conn in resuming:
+            if conn not in hub._paused or not conn._refill():
+                continue
+            with hub._lock:
+                if conn in hub._paused:
+                    hub._paused.discard(conn)
+                    hub._poller.modify(conn.fd, select.EPOLLIN)
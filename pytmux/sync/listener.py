@@ -2,21 +2,41 @@ import contextlib
 import os
 import select
 import threading
-from collections import deque
-from queue import Empty, Queue
+import time
+import typing as T
+from collections import Counter, deque
+from concurrent.futures import Future, InvalidStateError
+from enum import Enum
+from queue import Empty, Full, Queue
 
 import attr
 
-from .reader import StreamReader
-from .types import Notification, Reply
+from .. import types
+from ..coalesce import OutputCoalescer
+from ..commands import Command, CommandTracker
+from ..flow import FlowControl
+from ..reader import EventReader, StreamReader
+from ..recording import Recorder
+from ..subscriptions import Subscriptions
+from ..types import Notification, Reply, ReplyChunk
+from .ring import RingQueue
 
 
 class ReplyQ:
-    def __init__(self, capacity: int):
-        self._queue: Queue = Queue(capacity)
+    def __init__(self, capacity: int, single_consumer: bool = False):
+        """
+        :param single_consumer: lock free, for exactly one thread taking replies
+        """
+        self._queue: T.Union[Queue, RingQueue]
+        if single_consumer:
+            self._queue = RingQueue(capacity)
+            self._size = self._queue.__len__
+        else:
+            self._queue = Queue(capacity)
+            self._size = self._queue.qsize
 
     def __len__(self):
-        return self._queue.qsize()
+        return self._size()
 
     def get(self):
         """
@@ -27,47 +47,479 @@ class ReplyQ:
     def get_nowait(self):
         return self._queue.get_nowait()
 
-    def put(self, item):
+    def put(self, item, timeout: float = None):
         """
         when queue is full, put will block until space available
+
+        :raise: Full on timeout
         """
-        return self._queue.put(item)
+        return self._queue.put(item, timeout=timeout)
+
+    def put_nowait(self, item):
+        """
+        :raise: Full
+        """
+        return self._queue.put_nowait(item)
+
+    def drain(self) -> list:
+        if isinstance(self._queue, RingQueue):
+            return self._queue.drain()
+
+        items = []
+        try:
+            while True:
+                items.append(self._queue.get_nowait())
+        except Empty:
+            return items
+
+
+class Overflow(Enum):
+    """what a full NotiQ does with an event of some class"""
+
+    # never dropped, the queue grows past its capacity if nothing else can go
+    KEEP = 1
+    # the oldest droppable event makes room for it, or it is dropped
+    DROP_OLDEST = 2
+    # dropped on arrival
+    DROP_NEWEST = 3
+    # merged into a recent queued event of the same pane or window, DROP_OLDEST
+    # otherwise or once the merged output reached _COALESCE_LIMIT
+    COALESCE = 4
+
+
+DEFAULT_OVERFLOW: T.Dict[type, Overflow] = {
+    types.Output: Overflow.COALESCE,
+    types.ExtendedOutput: Overflow.COALESCE,
+    types.LayoutChange: Overflow.COALESCE,
+}
+
+# cls -> the key of the queued events an event of it merges into
+_MERGE_KEYS: T.Dict[type, T.Callable] = {
+    types.Output: lambda e: e.pane,
+    types.ExtendedOutput: lambda e: e.pane,
+    types.LayoutChange: lambda e: e.window,
+}
+
+# cls -> an event of the first one with the joined values; others replace the queued one
+_JOINS: T.Dict[type, T.Callable] = {
+    types.Output: lambda head, value: types.Output(head.pane, value),
+    types.ExtendedOutput: lambda head, value: types.ExtendedOutput(
+        head.pane, head.age, value
+    ),
+}
+
+# queued events looked at for a merge, from the newest, so a flood costs no O(n) puts
+_COALESCE_WINDOW = 64
+# bytes a merged output grows to at most, then it is DROP_OLDEST
+_COALESCE_LIMIT = 64 << 10
+
+# what a dropped event leaves in the queue, until it is consumed or compacted
+_GONE = object()
+
+
+class _Merged:
+    """outputs merged in a queue, their values are joined once it is taken"""
+
+    __slots__ = ("head", "values", "size")
+
+    def __init__(self, head):
+        self.head = head
+        self.values = [head.value]
+        self.size = len(head.value)
+
+    def join(self):
+        return _JOINS[self.head.event_class](self.head, b"".join(self.values))
+
+
+def _head(queued):
+    return queued.head if type(queued) is _Merged else queued
+
+
+@attr.s
+class DropStats:
+    by_type: T.Counter[type] = attr.ib(factory=Counter)
+    # events having a pane field
+    by_pane: T.Counter[int] = attr.ib(factory=Counter)
+    coalesced: int = attr.ib(default=0)
+
+    @property
+    def total(self) -> int:
+        return sum(self.by_type.values())
 
 
 class NotiQ:
-    def __init__(self, capacity: int):
-        self._queue = deque("", capacity)
+    """
+    once capacity is reached, each event class is handled by its Overflow policy;
+    classes not in overflow are kept, so control events are never lost.
+    """
+
+    def __init__(self, capacity: int, overflow: T.Dict[type, Overflow] = None):
+        """
+        :param overflow: policies on top of DEFAULT_OVERFLOW
+        """
+        assert capacity > 0
+
+        self._queue: T.Deque = deque()
+        self._capacity = capacity
+        self._overflow = {**DEFAULT_OVERFLOW, **(overflow or {})}
+        self.drops = DropStats()
+
+        # _GONE and _Merged in the queue
+        self._gone = 0
+        self._merged = 0
+        # events before the queue index _scan are kept ones, _evict starts there
+        self._scan = 0
 
     def __len__(self):
-        return len(self._queue)
+        return len(self._queue) - self._gone
 
     def get(self):
-        try:
-            return self._queue.popleft()
-        except IndexError as e:
-            raise Empty from e
+        queue = self._queue
+
+        while True:
+            try:
+                item = queue.popleft()
+            except IndexError as e:
+                raise Empty from e
+            self._scan = max(self._scan - 1, 0)
+            if item is not _GONE:
+                break
+            self._gone -= 1
+
+        if type(item) is _Merged:
+            self._merged -= 1
+            return item.join()
+        return item
 
     get_nowait = get
 
     def put(self, item):
-        return self._queue.append(item)
+        queue = self._queue
+
+        if len(queue) - self._gone < self._capacity:
+            queue.append(item)
+            return
+
+        # not type(item), see types.Event.event_class
+        policy = self._overflow.get(item.event_class, Overflow.KEEP)
+
+        if policy is Overflow.COALESCE and self._coalesce(item):
+            return
+
+        if policy is Overflow.DROP_NEWEST:
+            self._dropped(item)
+            return
+
+        if self._evict() or policy is Overflow.KEEP:
+            queue.append(item)
+        else:
+            self._dropped(item)
+
+    def drain(self) -> list:
+        queue = self._queue
+
+        if self._gone or self._merged:
+            items = [
+                item.join() if type(item) is _Merged else item
+                for item in queue
+                if item is not _GONE
+            ]
+        else:
+            items = list(queue)
+
+        queue.clear()
+        self._gone = self._merged = self._scan = 0
+        return items
+
+    def _coalesce(self, item) -> bool:
+        cls = item.event_class
+        try:
+            key = _MERGE_KEYS[cls]
+        except KeyError:
+            return False
+
+        queue = self._queue
+        overflow = self._overflow
+        target = key(item)
+
+        for i in range(len(queue) - 1, max(len(queue) - 1 - _COALESCE_WINDOW, -1), -1):
+            queued = queue[i]
+            if queued is _GONE:
+                continue
+
+            head = _head(queued)
+            if head.event_class is cls and key(head) == target:
+                if cls not in _JOINS:
+                    queue[i] = item
+                else:
+                    size = queued.size if queued is not head else len(head.value)
+                    if size + len(item.value) > _COALESCE_LIMIT:
+                        return False
+                    if queued is head:
+                        queued = queue[i] = _Merged(head)
+                        self._merged += 1
+                    queued.values.append(item.value)
+                    queued.size += len(item.value)
+                self.drops.coalesced += 1
+                return True
+
+            # merging past it would make the new event overtake it
+            if overflow.get(head.event_class, Overflow.KEEP) is Overflow.KEEP:
+                return False
+
+        return False
+
+    def _evict(self) -> bool:
+        """drops the oldest event not to be kept"""
+        queue = self._queue
+        overflow = self._overflow
+
+        i = self._scan
+        while i < len(queue):
+            queued = queue[i]
+            if queued is not _GONE:
+                head = _head(queued)
+                if overflow.get(head.event_class, Overflow.KEEP) is not Overflow.KEEP:
+                    queue[i] = _GONE
+                    self._gone += 1
+                    if queued is not head:
+                        self._merged -= 1
+                    self._dropped(queued)
+                    self._scan = i + 1
+                    self._compact()
+                    return True
+            i += 1
+
+        self._scan = i
+        return False
+
+    def _compact(self):
+        """removes the _GONE once they are most of the queue"""
+        if self._gone <= max(len(self._queue) // 2, self._capacity):
+            return
+        queue = self._queue
+        kept = [item for item in queue if item is not _GONE]
+        queue.clear()
+        queue.extend(kept)
+        self._gone = self._scan = 0
+
+    def _dropped(self, queued):
+        head = _head(queued)
+        count = len(queued.values) if queued is not head else 1
+        self.drops.by_type[head.event_class] += count
+        pane = getattr(head, "pane", None)
+        if pane is not None:
+            self.drops.by_pane[pane] += count
+
+
+@attr.s
+class ReadStats:
+    # read syscalls, including those hitting EAGAIN
+    reads: int = attr.ib(default=0)
+    nbytes: int = attr.ib(default=0)
+
+    @property
+    def reads_per_mb(self) -> float:
+        if not self.nbytes:
+            return 0.0
+        return self.reads / (self.nbytes / (1 << 20))
+
+
+class AdaptiveBufsize:
+    """
+    doubles the read size while reads fill it up, halves it when reads leave
+    most of it unused
+    """
+
+    def __init__(self, minimum: int = select.PIPE_BUF, maximum: int = 1 << 20):
+        assert 0 < minimum <= maximum
+
+        self._minimum = minimum
+        self._maximum = maximum
+        self.size = minimum
+
+    def update(self, nread: int):
+        if nread >= self.size:
+            self.size = min(self.size * 2, self._maximum)
+        elif nread < self.size // 4:
+            self.size = max(self.size // 2, self._minimum)
+
+
+def drain(
+    fd: int,
+    reader: StreamReader,
+    bufsize: AdaptiveBufsize,
+    stats: ReadStats,
+    recorder: Recorder = None,
+):
+    """
+    reads a non-blocking fd until it runs dry, yields the events of every read.
+
+    :param recorder: records every read before it is framed
+    :raise: BrokenPipeError when the remote closed the pipe
+    """
+    while True:
+        size = bufsize.size
+
+        try:
+            data = os.read(fd, size)
+        except BlockingIOError:
+            stats.reads += 1
+            return
+
+        stats.reads += 1
+        stats.nbytes += len(data)
+
+        if not data:
+            raise BrokenPipeError("remote closed pipe")
+
+        bufsize.update(len(data))
+
+        if recorder is not None:
+            recorder.record(data)
+
+        # framed in bulk; a reused buffer would not spare the copy the events keep
+        yield from reader.feed(data)
+
+        # a short read emptied the pipe, the next read would only hit EAGAIN
+        if len(data) < size:
+            return
+
+
+def drain_all(
+    fd: int,
+    reader: StreamReader,
+    bufsize: AdaptiveBufsize,
+    stats: ReadStats,
+    recorder: Recorder = None,
+) -> T.Tuple[list, bool]:
+    """
+    drain() into a list, keeping the events read before the remote closed the
+    pipe, eg. the final %exit; they are to be published before the EOF is.
+
+    :return: (events, whether the remote closed the pipe)
+    """
+    events: list = []
+    try:
+        for event in drain(fd, reader, bufsize, stats, recorder):
+            events.append(event)
+    except BrokenPipeError:
+        return events, True
+    return events, False
+
+
+class Waker:
+    """
+    a fd which polls readable once wake() was called, so a poller blocking
+    without timeout can still be told to look at its state
+    """
+
+    def __init__(self):
+        if hasattr(os, "eventfd"):
+            self._rfd = self._wfd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        else:
+            self._rfd, self._wfd = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+
+    def fileno(self) -> int:
+        return self._rfd
+
+    def wake(self):
+        try:
+            if self._wfd == self._rfd:
+                # adds 1 to the counter, in the byte order of the host
+                os.eventfd_write(self._wfd, 1)
+            else:
+                os.write(self._wfd, b"\x01")
+        except BlockingIOError:
+            # a pending wakeup is there already
+            pass
+
+    def drain(self):
+        try:
+            while os.read(self._rfd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        os.close(self._rfd)
+        if self._wfd != self._rfd:
+            os.close(self._wfd)
+
+
+class Term(threading.Event):
+    """
+    the term of a Listener; setting it wakes the listener thread, which blocks
+    without a timeout otherwise
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.waker: T.Optional[Waker] = None
+
+    def set(self):
+        super().set()
+        waker = self.waker
+        if waker is not None:
+            waker.wake()
+
+
+# how often the listener thread looks at a term which is not a Term
+_TERM_POLL = 0.5
 
 
 @attr.s
 class Listener:
     # pylint: disable=invalid-name
     fd: int = attr.ib()
+    # a plain threading.Event works too, it is looked at every _TERM_POLL seconds
     term: threading.Event = attr.ib()
     replyq: ReplyQ = attr.ib()
     notiq: NotiQ = attr.ib()
 
+    coalescer: T.Optional[OutputCoalescer] = attr.ib(default=None)
+    # streams replies as ReplyChunk, see EventReader
+    reply_chunk_lines: T.Optional[int] = attr.ib(default=None)
+    # resolves the futures of commands sent by a Client, instead of queueing replies
+    tracker: T.Optional[CommandTracker] = attr.ib(default=None)
+    # stops reading by the depth of notiq, see Client.enable_flow_control
+    flow: T.Optional[FlowControl] = attr.ib(default=None)
+    # sends the commands of flow, called in the listener thread
+    flow_send: T.Optional[T.Callable[[T.Iterable[Command]], T.Any]] = attr.ib(
+        default=None
+    )
+    # notifications nobody subscribed to are skipped undecoded
+    subscriptions: T.Optional[Subscriptions] = attr.ib(default=None)
+    # records the raw output, written in the listener thread
+    recorder: T.Optional[Recorder] = attr.ib(default=None)
+
+    stats: ReadStats = attr.ib(init=False, factory=ReadStats)
+
     _dingdong: threading.Condition = attr.ib(init=False)
+    _waker: Waker = attr.ib(init=False, default=None)
     _thread: threading.Thread = attr.ib(init=False, default=None)
     _dead: bool = attr.ib(init=False, default=False)
 
     @classmethod
-    def from_args(cls, fd: int, reply_cap: int, noti_cap: int):
-        return cls(fd, threading.Event(), ReplyQ(reply_cap), NotiQ(noti_cap))
+    def from_args(
+        cls,
+        fd: int,
+        reply_cap: int,
+        noti_cap: int,
+        coalesce_output: bool = False,
+        reply_chunk_lines: int = None,
+        noti_overflow: T.Dict[type, Overflow] = None,
+        single_consumer: bool = False,
+    ):
+        coalescer = OutputCoalescer() if coalesce_output else None
+        return cls(
+            fd,
+            Term(),
+            ReplyQ(reply_cap, single_consumer),
+            NotiQ(noti_cap, noti_overflow),
+            coalescer,
+            reply_chunk_lines,
+        )
 
     def listen_in_background(self):
         if self._dead:
@@ -77,6 +529,9 @@ class Listener:
             return
 
         self._dingdong = threading.Condition()
+        self._waker = Waker()
+        if isinstance(self.term, Term):
+            self.term.waker = self._waker
         self._thread = Thread(self)
         self._thread.start()
 
@@ -93,12 +548,46 @@ class Listener:
 
             yield
 
+    def drain(
+        self, timeout: float = None
+    ) -> T.Tuple[T.List[Notification], T.List[T.Union[Reply, ReplyChunk]]]:
+        """
+        waits until events are available, then takes all of them at once
+
+        :return: (notifications, replies), both empty on timeout
+        :raise: ValueError when term.is_set() and nothing is left
+        """
+        with self._dingdong:
+            if not (self.notiq or self.replyq or self.term.is_set()):
+                self._dingdong.wait(timeout)
+
+            notis = self.notiq.drain()
+            replies = self.replyq.drain()
+
+        if self.flow and self.flow.throttled:
+            # the listener thread reads on and continues the paused panes
+            self.wake()
+
+        if not (notis or replies) and self.term.is_set():
+            raise ValueError("term has been set")
+
+        return notis, replies
+
     def __enter__(self):
         return
 
     def __exit__(self, etype, exc, traceback):
         self.close()
 
+    def wake(self):
+        """makes the listener thread look at term and its other state"""
+        if self._waker is None:
+            return
+        # under dingdong, so close() can not close the waker in between
+        with self._dingdong:
+            if self._waker is not None:
+                self._waker.wake()
+
     def close(self):
         if self._dead:
             return
@@ -107,11 +596,60 @@ class Listener:
             return
 
         self.term.set()
+        self.wake()
         self._thread.join()
+        if isinstance(self.term, Term):
+            self.term.waker = None
+        with self._dingdong:
+            self._waker.close()
+            self._waker = None
         self._dead = True
         self._thread.raise_if_any()
 
 
+def _resolve(future: Future, result=None, exception: BaseException = None):
+    # the caller may have cancelled it
+    try:
+        if exception is None:
+            future.set_result(result)
+        else:
+            future.set_exception(exception)
+    except InvalidStateError:
+        pass
+
+
+def route(
+    events: T.Iterable, tracker: T.Optional[CommandTracker]
+) -> T.Tuple[T.List[Notification], T.List[T.Union[Reply, ReplyChunk]]]:
+    """
+    resolves the futures of replies to tracked commands
+
+    :return: (notifications, replies) to be queued
+    """
+    notis: T.List[Notification] = []
+    replies: T.List[T.Union[Reply, ReplyChunk]] = []
+
+    for event in events:
+        if isinstance(event, Notification):
+            notis.append(event)
+        elif isinstance(event, Reply):
+            future = tracker.match(event) if tracker else None
+            if future is None:
+                replies.append(event)
+            else:
+                _resolve(future, event)
+        elif isinstance(event, ReplyChunk):
+            # chunks are for the consumer, the future tells when all arrived
+            replies.append(event)
+            future = tracker.match(event) if tracker else None
+            if future is not None and event.last:
+                _resolve(future, event)
+        else:
+            raise RuntimeError(f"received an unknown event: {event}")
+
+    return notis, replies
+
+
 class Thread(threading.Thread):
     # pylint: disable=too-many-arguments
     def __init__(self, listener: Listener):
@@ -130,44 +668,149 @@ class Thread(threading.Thread):
         # pylint: disable=broad-except
         except Exception as e:
             self._exc = e
+        finally:
+            tracker = self._listener.tracker
+            if tracker:
+                for future in tracker.drop():
+                    _resolve(future, exception=BrokenPipeError("listener stopped"))
 
     def _mainloop(self):
         term = self._listener.term
         fd = self._listener.fd
-        reader = StreamReader()
-        bufsize = select.PIPE_BUF
-        replyq = self._listener.replyq
-        notiq = self._listener.notiq
+        reader = StreamReader(
+            EventReader(
+                chunk_lines=self._listener.reply_chunk_lines,
+                subscriptions=self._listener.subscriptions,
+            )
+        )
+        coalescer = self._listener.coalescer
+        bufsize = AdaptiveBufsize()
+        stats = self._listener.stats
+        recorder = self._listener.recorder
         dingdong = self._listener._dingdong
 
+        waker = self._listener._waker
+
+        os.set_blocking(fd, False)
+
         with select.epoll() as poller:
             poller.register(fd, select.EPOLLIN)
+            poller.register(waker.fileno(), select.EPOLLIN)
+            reading = True
 
             while True:
                 if term.is_set():
+                    if coalescer:
+                        self._dispatch(coalescer.flush())
                     with dingdong:
                         dingdong.notify_all()
                     break
 
-                events = poller.poll(0.05)
-                for _ in events:
-
-                    data = os.read(fd, bufsize)
-                    if data == b"":
+                events = poller.poll(self._timeout(coalescer))
+                for ready, _ in events:
+                    if ready != fd:
+                        waker.drain()
+                        continue
+
+                    batch, closed = drain_all(fd, reader, bufsize, stats, recorder)
+                    if coalescer:
+                        self._dispatch(coalescer.feed(batch))
+                    else:
+                        self._dispatch(batch)
+
+                    if closed:
+                        if coalescer:
+                            self._dispatch(coalescer.flush())
                         term.set()
                         with dingdong:
                             dingdong.notify_all()
                         raise BrokenPipeError("remote closed pipe")
 
-                    for event in reader.feed(data):
-                        with dingdong:
-                            if isinstance(event, Notification):
-                                notiq.put(event)
-                            elif isinstance(event, Reply):
-                                replyq.put(event)
-                            else:
-                                raise RuntimeError(
-                                    f"received an unknown event: {event}"
-                                )
-
-                            dingdong.notify()
+                if coalescer:
+                    self._dispatch(coalescer.expire())
+
+                flow = self._listener.flow
+                if flow:
+                    reading = self._regulate(flow, poller, fd, reading)
+
+    def _regulate(
+        self, flow: FlowControl, poller: select.epoll, fd: int, reading: bool
+    ) -> bool:
+        """
+        stops polling fd under backpressure, so tmux buffers until pause-after
+
+        :return: whether fd is polled now
+        """
+        commands = flow.update(len(self._listener.notiq))
+        if commands and self._listener.flow_send:
+            self._listener.flow_send(commands)
+
+        if reading == flow.backpressure:
+            reading = not reading
+            poller.modify(fd, select.EPOLLIN if reading else 0)
+        return reading
+
+    def _timeout(self, coalescer: T.Optional[OutputCoalescer]) -> T.Optional[float]:
+        """
+        blocks until something happens, or until pending outputs are due
+        """
+        timeout = None
+        if coalescer:
+            deadline = coalescer.deadline
+            if deadline is not None:
+                timeout = max(deadline - time.monotonic(), 0)
+
+        # setting a plain Event wakes nobody
+        if not isinstance(self._listener.term, Term):
+            timeout = _TERM_POLL if timeout is None else min(timeout, _TERM_POLL)
+
+        return timeout
+
+    def _dispatch(self, events):
+        """
+        publishes the events of a read with a single lock and a single notify
+        """
+        replyq = self._listener.replyq
+        notiq = self._listener.notiq
+        dingdong = self._listener._dingdong
+
+        notis, replies = route(events, self._listener.tracker)
+
+        if self._listener.flow:
+            self._listener.flow.feed(notis)
+            # held for flow control, see Client.enable_flow_control
+            subscriptions = self._listener.subscriptions
+            if subscriptions is not None:
+                notis = [noti for noti in notis if subscriptions.matches(noti)]
+
+        if not (notis or replies):
+            return
+
+        blocked = len(replies)
+
+        with dingdong:
+            for noti in notis:
+                notiq.put(noti)
+
+            for i, reply in enumerate(replies):
+                try:
+                    replyq.put_nowait(reply)
+                except Full:
+                    blocked = i
+                    break
+
+            dingdong.notify()
+
+        # the consumer is behind on replies, wait for it without holding dingdong;
+        # the waker can not interrupt the wait, term is looked at in between
+        term = self._listener.term
+        for reply in replies[blocked:]:
+            while True:
+                try:
+                    replyq.put(reply, timeout=_TERM_POLL)
+                    break
+                except Full:
+                    if term.is_set():
+                        return
+            with dingdong:
+                dingdong.notify()
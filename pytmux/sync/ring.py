@@ -0,0 +1,179 @@
+import threading
+import time
+import typing as T
+from queue import Empty, Full
+
+
+class RingQueue:
+    """
+    bounded queue for exactly one producer thread and one consumer thread.
+
+    put and get take no lock: the producer alone moves the tail, the consumer
+    alone moves the head, and each of those is a single atomic store under the
+    GIL. a side only touches an Event when the other one is waiting on it.
+    """
+
+    def __init__(self, capacity: int):
+        assert capacity > 0
+
+        self._buf: T.List[T.Any] = [None] * capacity
+        self._capacity = capacity
+        # monotonic counts of items put and taken
+        self._head = 0
+        self._tail = 0
+
+        self._consumer_waiting = False
+        self._readable = threading.Event()
+        self._producer_waiting = False
+        self._writable = threading.Event()
+
+    def __len__(self):
+        return self._tail - self._head
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def put_nowait(self, item):
+        """
+        :raise: Full
+        """
+        tail = self._tail
+        if tail - self._head >= self._capacity:
+            raise Full
+
+        self._buf[tail % self._capacity] = item
+        self._tail = tail + 1
+
+        if self._consumer_waiting:
+            # once per wait, not once per item
+            self._consumer_waiting = False
+            self._readable.set()
+
+    def put(self, item, timeout: float = None):
+        """
+        blocks while the queue is full
+
+        :raise: Full on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            try:
+                return self.put_nowait(item)
+            except Full:
+                pass
+
+            if not self._wait(True, deadline):
+                raise Full
+
+    def get_nowait(self):
+        """
+        :raise: Empty
+        """
+        head = self._head
+        if head == self._tail:
+            raise Empty
+
+        slot = head % self._capacity
+        item = self._buf[slot]
+        self._buf[slot] = None
+        self._head = head + 1
+
+        if self._producer_waiting:
+            self._producer_waiting = False
+            self._writable.set()
+
+        return item
+
+    def get(self, timeout: float = None):
+        """
+        blocks while the queue is empty
+
+        :raise: Empty on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            try:
+                return self.get_nowait()
+            except Empty:
+                pass
+
+            if not self._wait(False, deadline):
+                raise Empty
+
+    def get_many(self, limit: int = None, timeout: float = None) -> list:
+        """
+        waits for the first item, then takes up to limit items at once
+
+        :return: empty on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while self._head == self._tail:
+            if not self._wait(False, deadline):
+                return []
+
+        return self.drain(limit)
+
+    def drain(self, limit: int = None) -> list:
+        head = self._head
+        count = self._tail - head
+        if limit is not None:
+            count = min(count, limit)
+        if not count:
+            return []
+
+        buf = self._buf
+        capacity = self._capacity
+        start = head % capacity
+        stop = start + count
+
+        if stop <= capacity:
+            items = buf[start:stop]
+            buf[start:stop] = [None] * count
+        else:
+            stop -= capacity
+            items = buf[start:] + buf[:stop]
+            buf[start:] = [None] * (capacity - start)
+            buf[:stop] = [None] * stop
+
+        self._head = head + count
+
+        if self._producer_waiting:
+            self._producer_waiting = False
+            self._writable.set()
+
+        return items
+
+    def _wait(self, producer: bool, deadline: T.Optional[float]) -> bool:
+        """
+        waits for the other side to make room or to put an item
+
+        :return: False on timeout
+        """
+        if producer:
+            event = self._writable
+            self._producer_waiting = True
+            ready = lambda: self._tail - self._head < self._capacity
+        else:
+            event = self._readable
+            self._consumer_waiting = True
+            ready = lambda: self._head != self._tail
+
+        try:
+            # the other side may have moved before seeing the flag
+            if ready():
+                return True
+
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            event.wait(timeout)
+            # a set left from an earlier wait wakes for nothing, the caller looks again
+            event.clear()
+            return ready() or deadline is None or time.monotonic() < deadline
+        finally:
+            if producer:
+                self._producer_waiting = False
+            else:
+                self._consumer_waiting = False
@@ -1,38 +1,118 @@
 """
 see: https://github.com/tmux/tmux/wiki/Control-Mode
 """
+# pylint: disable=too-many-lines
 
-import abc
+import codecs
 import typing as T
+from array import array
+from collections.abc import Sequence
 from enum import Enum
 from io import BytesIO
 
 import attr
 
+from . import layout as _layout
+
+# converters let already converted values through, for events built from values
+
 
 def _to_str(data: bytes):
+    if isinstance(data, str):
+        return data
     return data.decode()
 
 
 def _to_int(data: bytes):
+    if isinstance(data, int):
+        return data
     return int(data, 10)
 
 
-def _percent_int(data: bytes):
+def percent_int(data: T.Union[bytes, int]) -> int:
+    """%3 as 3, the id of a pane"""
+    if isinstance(data, int):
+        return data
     assert data.startswith(b"%")
     return int(data[1:], 10)
 
 
-def _at_int(data: bytes):
+def at_int(data: T.Union[bytes, int]) -> int:
+    """@3 as 3, the id of a window"""
+    if isinstance(data, int):
+        return data
     assert data.startswith(b"@")
     return int(data[1:], 10)
 
 
-def _dollar_int(data: bytes):
+def dollar_int(data: T.Union[bytes, int]) -> int:
+    """$3 as 3, the id of a session"""
+    if isinstance(data, int):
+        return data
     assert data.startswith(b"$")
     return int(data[1:], 10)
 
 
+def _unless_dash(data, converter):
+    """for the fields tmux leaves out as -"""
+    if data is None or data == b"-":
+        return None
+    return converter(data)
+
+
+# converters for them, mypy's attrs plugin takes only named functions
+def _at_int_or_dash(data) -> T.Optional[int]:
+    return _unless_dash(data, at_int)
+
+
+def _int_or_dash(data) -> T.Optional[int]:
+    return _unless_dash(data, _to_int)
+
+
+def _percent_int_or_dash(data) -> T.Optional[int]:
+    return _unless_dash(data, percent_int)
+
+
+def unescape(value: bytes) -> bytes:
+    """
+    decodes a %output value.
+
+    tmux escapes every byte below b" " and the backslash itself as \\ooo octal,
+    so every backslash in a value starts such an escape, which is the subset
+    of escapes the escape_decode codec handles in bulk.
+    """
+    if b"\\" not in value:
+        return value
+
+    return codecs.escape_decode(value)[0]  # type: ignore
+
+
+class OutputDecoder:
+    """
+    unescape for a stream of values, an escape may be split across them
+    """
+
+    def __init__(self):
+        self._pending = b""
+
+    @property
+    def clean(self):
+        return not self._pending
+
+    def feed(self, value: bytes) -> bytes:
+        if self._pending:
+            value = self._pending + value
+            self._pending = b""
+
+        # an escape is 4 bytes, a backslash in the last 3 starts an incomplete one
+        cut = value.rfind(b"\\", max(len(value) - 3, 0))
+        if cut >= 0:
+            self._pending = bytes(value[cut:])
+            value = value[:cut]
+
+        return unescape(value)
+
+
 class BlockEnd(Enum):
     END = b"%end"
     ERROR = b"%error"
@@ -41,19 +121,196 @@ class BlockEnd(Enum):
 Lines = T.List[bytes]
 
 
-class Event(abc.ABC):
-    @abc.abstractclassmethod
+class CompactLines(Sequence):
+    """
+    lines in one contiguous buffer plus an index of where each line starts,
+    a line is only materialized as bytes when it is accessed.
+    """
+
+    __slots__ = ("_buf", "_offsets", "_start", "_stop")
+
+    def __init__(self, buf: bytes, offsets: array, start: int = 0, stop: int = None):
+        """
+        :param offsets: offsets[i] is where line i starts, the last one is len(buf)
+        :param start, stop: the lines this view covers
+        """
+        self._buf = buf
+        self._offsets = offsets
+        self._start = start
+        self._stop = len(offsets) - 1 if stop is None else stop
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CompactLines":
+        """
+        :param data: complete lines, each ends with b"\\n"
+        """
+        assert not data or data.endswith(b"\n")
+
+        offsets = array(_offset_typecode(len(data)), [0])
+
+        # no line is made on the way
+        find = data.find
+        eol = find(b"\n")
+        while eol >= 0:
+            offsets.append(eol + 1)
+            eol = find(b"\n", eol + 1)
+
+        return cls(data, offsets)
+
+    @property
+    def nbytes(self) -> int:
+        return self._offsets[self._stop] - self._offsets[self._start]
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return CompactLines(
+                self._buf,
+                self._offsets,
+                self._start + start,
+                self._start + max(start, stop),
+            )
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+
+        offsets = self._offsets
+        index += self._start
+        return self._buf[offsets[index] : offsets[index + 1]]
+
+    def __iter__(self):
+        buf = self._buf
+        offsets = self._offsets
+        for i in range(self._start, self._stop):
+            yield buf[offsets[i] : offsets[i + 1]]
+
+    def tobytes(self) -> bytes:
+        offsets = self._offsets
+        return bytes(self._buf[offsets[self._start] : offsets[self._stop]])
+
+    def __eq__(self, other):
+        if isinstance(other, CompactLines):
+            return self.tobytes() == other.tobytes() and len(self) == len(other)
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{CompactLines.__name__}({len(self)} lines, {self.nbytes} bytes)"
+
+
+def _offset_typecode(size: int) -> str:
+    return "I" if size < 1 << 32 else "Q"
+
+
+class CompactLinesBuilder:
+    def __init__(self):
+        self._buf = bytearray()
+        self._offsets = array("Q", [0])
+
+    def append(self, line):
+        self._buf.extend(line)
+        self._offsets.append(len(self._buf))
+
+    def build(self) -> CompactLines:
+        buf = bytes(self._buf)
+        offsets = array(_offset_typecode(len(buf)), self._offsets)
+
+        self._buf = bytearray()
+        self._offsets = array("Q", [0])
+
+        return CompactLines(buf, offsets)
+
+
+class LineKind(Enum):
+    NOTIFICATION = 1
+    BEGIN = 2
+    END = 3
+
+
+class _Dispatch:
+    """
+    header -> (LineKind, event class), filled in as the event classes get defined
+    """
+
+    def __init__(self):
+        self.table: T.Dict[bytes, T.Tuple[LineKind, T.Optional[T.Type["Event"]]]] = {}
+        # the longest header plus its separator
+        self.span = 0
+
+    def register(self, header: bytes, kind: LineKind, cls: T.Type["Event"] = None):
+        self.table[header] = (kind, cls)
+        self.span = max(self.span, len(header) + 1)
+
+    def classify(
+        self, line
+    ) -> T.Optional[T.Tuple[LineKind, T.Optional[T.Type["Event"]]]]:
+        """
+        :param line: bytes-like, ends with b"\\n"
+        :return: None for a body line or an unknown header
+        """
+        span = self.span
+
+        if not isinstance(line, bytes):
+            # headers are short, never copy the whole line
+            line = bytes(line[:span])
+
+        end = line.find(b" ", 0, span)
+        if end < 0:
+            end = line.find(b"\n", 0, span)
+            if end < 0:
+                return None
+
+        return self.table.get(line[:end])
+
+
+DISPATCH = _Dispatch()
+DISPATCH.register(BlockEnd.END.value, LineKind.END)
+DISPATCH.register(BlockEnd.ERROR.value, LineKind.END)
+
+
+class Event:
+    # not an abc.ABC, ABCMeta.__instancecheck__ would make every isinstance()
+    # against a class with subclasses slower, see LazyNotification
+    __slots__ = ()
+
+    # the class decoding it, the eager one for a LazyNotification; classes are
+    # looked up by it, not by type(event)
+    event_class: T.ClassVar[type]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.event_class = cls
+
+    @classmethod
     def from_bytes(cls, data: bytes):
-        pass
+        raise NotImplementedError
 
-    @abc.abstractclassmethod
+    @classmethod
     def from_lined_bytes(cls, lines: Lines):
-        pass
+        raise NotImplementedError
 
 
-@attr.s
+# one bytes object per header, shared by all block wraps
+_BLOCK_HEADERS = {
+    header: header for header in (b"%begin", BlockEnd.END.value, BlockEnd.ERROR.value)
+}
+
+
+def _intern_header(data: bytes):
+    return _BLOCK_HEADERS.get(data, data)
+
+
+@attr.s(slots=True, frozen=True)
 class _BlockWrap(Event):
-    header: bytes = attr.ib()
+    header: bytes = attr.ib(converter=_intern_header)
     timestamp: int = attr.ib(converter=_to_int)
     number: int = attr.ib(converter=_to_int)  # unique command number
     flags: int = attr.ib(converter=_to_int)
@@ -70,7 +327,7 @@ class _BlockWrap(Event):
         return cls.from_bytes(lines[0])
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class Reply(Event):
     """Every %begin, %end or %error has three arguments:
     * the time as seconds from epoch;
@@ -81,7 +338,7 @@ class Reply(Event):
     header = b"%begin"
 
     head_wrap: _BlockWrap = attr.ib()
-    body: Lines = attr.ib()  # could be multi-line
+    body: T.Union[Lines, CompactLines] = attr.ib()  # could be multi-line
     end_wrap: _BlockWrap = attr.ib()
 
     @property
@@ -89,12 +346,17 @@ class Reply(Event):
         return self.end_wrap.header == BlockEnd.END.value
 
     @classmethod
-    def from_bytes(cls, data: bytes):
+    def from_bytes(cls, data: bytes, compact: bool = False):
+        """
+        :param compact: the body is CompactLines, a list of lines otherwise
+            like EventReader gives
+        """
         eol_first = data.find(b"\n")
         hdata = data[: eol_first + 1]
         eol_last = data.rfind(b"\n", 0, -2)
         edata = data[eol_last + 1 :]
-        body = list(BytesIO(data[eol_first + 1 : eol_last + 1]))
+        bdata = data[eol_first + 1 : eol_last + 1]
+        body = CompactLines.from_bytes(bdata) if compact else list(BytesIO(bdata))
 
         head_wrap = _BlockWrap.from_bytes(hdata)
         end_wrap = _BlockWrap.from_bytes(edata)
@@ -112,21 +374,89 @@ class Reply(Event):
         return cls(head_wrap, body, end_wrap)
 
 
-ALL_NOTI: T.List["Notification"] = []
+DISPATCH.register(Reply.header, LineKind.BEGIN, Reply)
+
+
+@attr.s(slots=True, frozen=True)
+class ReplyChunk(Event):
+    """
+    a part of a reply which is delivered while its body is still arriving,
+    see reader.EventReader(chunk_lines=...).
+
+    every chunk of a reply carries its head wrap, only the last one has the end wrap.
+    """
+
+    head_wrap: _BlockWrap = attr.ib()
+    # compact when made from a compacted Reply
+    body: T.Union[Lines, CompactLines] = attr.ib()
+    end_wrap: T.Optional[_BlockWrap] = attr.ib(default=None)
+
+    @property
+    def number(self) -> int:
+        return self.head_wrap.number
+
+    @property
+    def last(self) -> bool:
+        return self.end_wrap is not None
+
+    @property
+    def success(self):
+        """only known by the last chunk"""
+        return self.last and self.end_wrap.header == BlockEnd.END.value
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        return cls.from_reply(Reply.from_bytes(data))
+
+    @classmethod
+    def from_lined_bytes(cls, lines: Lines):
+        return cls.from_reply(Reply.from_lined_bytes(lines))
+
+    @classmethod
+    def from_reply(cls, reply: Reply):
+        return cls(reply.head_wrap, reply.body, reply.end_wrap)
+
+
+ALL_NOTI: T.List[T.Type["Notification"]] = []
 
 
 class Notification(Event):
+    __slots__ = ()
+
     header = b""
+    # whether the fields are the space separated parts of the line in order,
+    # False for a class with its own from_bytes
+    _positional = True
 
     def __init_subclass__(cls, **kwargs):
         global ALL_NOTI
 
         super().__init_subclass__(**kwargs)
 
+        # stands for a registered class, see lazy()
+        if issubclass(cls, LazyNotification):
+            return
+
         if cls.header == Notification.header:
             raise NotImplementedError(f"{cls}.header is missing")
 
-        ALL_NOTI.append(cls)
+        # attr.s(slots=True) creates the class once more, the later one replaces
+        for i, noti in enumerate(ALL_NOTI):
+            if noti.header == cls.header:
+                ALL_NOTI[i] = cls
+                break
+        else:
+            ALL_NOTI.append(cls)
+        DISPATCH.register(cls.header, LineKind.NOTIFICATION, cls)
+
+        # fields are known once attrs has decorated the class
+        if (
+            "__attrs_attrs__" in cls.__dict__
+            and "__slots__" in cls.__dict__
+            and "from_bytes" not in cls.__dict__
+            and not any(isinstance(f.default, attr.Factory) for f in attr.fields(cls))
+        ):
+            cls.from_bytes = _specialized_from_bytes(cls)
 
     @classmethod
     def from_bytes(cls, data: bytes):
@@ -148,101 +478,375 @@ class Notification(Event):
         return cls.from_bytes(lines[0])
 
 
-@attr.s
+# converter -> the inline expression doing the same
+# {0} is the value, {1} the converter; a value without its sigil goes to the
+# converter, which refuses it as the generic path does
+_INLINE_CONVERTERS = {
+    _to_str: "{0}.decode()",
+    _to_int: "int({0})",
+    percent_int: "(int({0}[1:]) if {0}[:1] == b'%' else {1}({0}))",
+    at_int: "(int({0}[1:]) if {0}[:1] == b'@' else {1}({0}))",
+    dollar_int: "(int({0}[1:]) if {0}[:1] == b'$' else {1}({0}))",
+}
+
+
+def _converted(namespace: dict, i: int, field, value: str) -> str:
+    """
+    :return: the expression converting value for field i, names it uses are
+        put into namespace
+    """
+    converter = field.converter
+    if converter is None:
+        return value
+    namespace[f"_convert{i}"] = converter
+    if converter in _INLINE_CONVERTERS:
+        return _INLINE_CONVERTERS[converter].format(value, f"_convert{i}")
+    return f"_convert{i}({value})"
+
+
+def _specialized_from_bytes(cls):
+    """
+    generates the from_bytes of a notification class, with the split and the
+    conversions of its fields spelled out.
+
+    the instance is filled through its slots instead of the attrs __init__,
+    lines with missing optional fields take the generic path.
+    """
+    fields = attr.fields(cls)
+    names = [f"f{i}" for i in range(len(fields))]
+    namespace = {
+        "_new": object.__new__,
+        "_generic": Notification.from_bytes.__func__,  # type: ignore
+    }
+
+    src = ["def from_bytes(cls, data):"]
+
+    def converted(i: int, field, value: str) -> str:
+        return _converted(namespace, i, field, value)
+
+    if not fields:
+        src.append("    return _new(cls)")
+    elif all(field.default is attr.NOTHING for field in fields):
+        src.append("    try:")
+        src.append(
+            f"        _, {', '.join(names)}, = data[:-1].split(b' ', {len(fields)})"
+        )
+        src.append("    except ValueError:")
+        src.append("        return _generic(cls, data)")
+        src.append("    self = _new(cls)")
+        for i, (field, name) in enumerate(zip(fields, names)):
+            # the slot descriptor, frozen classes refuse setattr
+            namespace[f"_set{i}"] = cls.__dict__[field.name].__set__
+            src.append(f"    _set{i}(self, {converted(i, field, name)})")
+        src.append("    return self")
+    else:
+        required = sum(field.default is attr.NOTHING for field in fields)
+        src.append(f"    parts = data[:-1].split(b' ', {len(fields)})")
+        src.append("    given = len(parts) - 1")
+        src.append(f"    if given < {required}:")
+        src.append("        return _generic(cls, data)")
+        src.append("    self = _new(cls)")
+        for i, field in enumerate(fields):
+            namespace[f"_set{i}"] = cls.__dict__[field.name].__set__
+            value = converted(i, field, f"parts[{i + 1}]")
+            if field.default is attr.NOTHING:
+                src.append(f"    _set{i}(self, {value})")
+                continue
+            # attrs converts defaults as well
+            namespace[f"_default{i}"] = field.default
+            default = converted(i, field, f"_default{i}")
+            src.append(f"    _set{i}(self, {value} if given > {i} else {default})")
+        src.append("    return self")
+
+    # pylint: disable=exec-used
+    exec(
+        compile("\n".join(src), f"<from_bytes of {cls.__qualname__}>", "exec"),
+        namespace,
+    )
+    from_bytes = namespace["from_bytes"]
+    from_bytes.__qualname__ = f"{cls.__qualname__}.from_bytes"
+
+    return classmethod(from_bytes)
+
+
+def nth_field(line: bytes, index: int, last: bool) -> T.Optional[bytes]:
+    """
+    :param line: b"%header f0 f1 ... fn\\n"
+    :param last: the last field takes the rest of the line
+    :return: None when the line has no such field
+    """
+    end = len(line) - 1
+    sep = line.find(b" ", 0, end)
+
+    for _ in range(index):
+        if sep < 0:
+            return None
+        sep = line.find(b" ", sep + 1, end)
+
+    if sep < 0:
+        return None
+
+    if last:
+        return line[sep + 1 : end]
+
+    stop = line.find(b" ", sep + 1, end)
+    return line[sep + 1 : stop if stop >= 0 else end]
+
+
+def field_position(cls, name: str) -> T.Tuple[int, bool]:
+    """
+    where a field of a positional notification class is in its line, see nth_field
+
+    :return: (index, whether it takes the rest of the line)
+    :raise: KeyError when cls has no such field
+    """
+    fields = attr.fields(cls)
+    for i, field in enumerate(fields):
+        if field.name == name:
+            return i, i == len(fields) - 1
+    raise KeyError(name)
+
+
+class LazyNotification:
+    """
+    a notification keeping its raw line, which decodes a field on its first access.
+
+    made by lazy() or LAZY_NEW, it is an instance of a subclass of the notification
+    class it stands for, so isinstance() and type() agree and are as fast as for
+    an eager one; event_class is the eager class.
+    """
+
+    __slots__ = ()
+
+    raw: bytes
+    event_class: T.ClassVar[type]
+
+    def decode(self) -> "Notification":
+        """decodes all fields into the eager notification"""
+        return self.event_class.from_bytes(self.raw)  # type: ignore
+
+    def __repr__(self):
+        return f"{LazyNotification.__name__}({self.event_class.__name__}, {self.raw!r})"
+
+
+def _lazy_new(cls) -> T.Callable[[bytes], "Notification"]:
+    """
+    generates the lazy subclass of a notification class: a property per field
+    decodes it into the slot of the eager class, the bits of _decoded tell
+    which are decoded already.
+
+    a class with its own from_bytes decodes all fields on the first access.
+    """
+    # pylint: disable=protected-access
+    fields = attr.fields(cls)
+    namespace: T.Dict[str, T.Any] = {"_alloc": object.__new__}
+
+    src = [
+        "def new(raw):",
+        "    self = _alloc(_cls)",
+        "    _set_raw(self, raw)",
+        "    _set_decoded(self, 0)",
+        "    return self",
+        "def _decode_all(self):",
+        "    noti = _from_bytes(self.raw)",
+    ]
+    namespace["_from_bytes"] = cls.from_bytes
+    for i, field in enumerate(fields):
+        slot = getattr(cls, field.name)
+        namespace[f"_get{i}"] = slot.__get__
+        namespace[f"_set{i}"] = slot.__set__
+        src.append(f"    _set{i}(self, noti.{field.name})")
+    src.append(f"    _set_decoded(self, {(1 << len(fields)) - 1})")
+
+    for i, field in enumerate(fields):
+        src.append(f"def get{i}(self):")
+        src.append(f"    if self._decoded & {1 << i}:")
+        src.append(f"        return _get{i}(self)")
+
+        if not cls._positional:
+            src.append("    _decode_all(self)")
+            src.append(f"    return _get{i}(self)")
+            continue
+
+        # the header ends at the first space, the first field starts after it
+        start = str(len(cls.header) + 1)
+        src.append("    raw = self.raw")
+        src.append("    end = len(raw) - 1")
+        if i:
+            src.append(f"    start = {start}")
+            start = "start"
+        for _ in range(i):
+            src.append("    if start <= end:")
+            src.append("        sep = raw.find(b' ', start, end)")
+            src.append("        start = sep + 1 if sep >= 0 else end + 1")
+
+        src.append(f"    if {start} > end:")
+        if field.default is attr.NOTHING:
+            missing = f"{cls.__name__}.{field.name} is missing in "
+            src.append(f"        raise ValueError({missing!r} + repr(raw))")
+        else:
+            # attrs converts defaults as well
+            namespace[f"_default{i}"] = field.default
+            default = _converted(namespace, i, field, f"_default{i}")
+            src.append(f"        value = {default}")
+        src.append("    else:")
+        if i == len(fields) - 1:
+            src.append(f"        data = raw[{start} : end]")
+        else:
+            src.append(f"        stop = raw.find(b' ', {start}, end)")
+            src.append(f"        data = raw[{start} : stop if stop >= 0 else end]")
+        src.append(f"        value = {_converted(namespace, i, field, 'data')}")
+        src.append(f"    _set{i}(self, value)")
+        src.append(f"    _set_decoded(self, self._decoded | {1 << i})")
+        src.append("    return value")
+
+    # pylint: disable=exec-used
+    exec(
+        compile("\n".join(src), f"<lazy {cls.__qualname__}>", "exec"),
+        namespace,
+    )
+
+    lazy_cls: T.Any = type(
+        f"Lazy{cls.__name__}",
+        (LazyNotification, cls),
+        {
+            "__slots__": ("raw", "_decoded"),
+            "__module__": cls.__module__,
+            "__qualname__": f"Lazy{cls.__qualname__}",
+            **{
+                field.name: property(namespace[f"get{i}"])
+                for i, field in enumerate(fields)
+            },
+        },
+    )
+    lazy_cls.event_class = cls
+
+    namespace["_cls"] = lazy_cls
+    namespace["_set_raw"] = lazy_cls.raw.__set__
+    namespace["_set_decoded"] = lazy_cls._decoded.__set__
+
+    return namespace["new"]
+
+
+class _LazyNew(dict):
+    def __missing__(self, cls):
+        assert issubclass(cls, Notification), cls
+        new = self[cls] = _lazy_new(cls)
+        return new
+
+
+# notification class -> makes its LazyNotification of a raw line, a lookup
+# spares a call on the way, eg. LAZY_NEW[Output](b"%output %1 abc\n")
+LAZY_NEW: T.Dict[type, T.Callable[[bytes], "Notification"]] = _LazyNew()
+
+
+def lazy(cls, raw: bytes) -> "Notification":
+    """
+    :param cls: a Notification subclass
+    :param raw: the whole line, header and newline included
+    :return: the LazyNotification of the line
+    """
+    assert raw.startswith(cls.header)
+    assert raw.endswith(b"\n")
+
+    return LAZY_NEW[cls](raw)
+
+
+@attr.s(slots=True, frozen=True)
 class PaneModeChanged(Notification):
     """%pane-mode-changed %pane
     A pane's mode was changed.
     """
 
     header = b"%pane-mode-changed"
-    pane: int = attr.ib(converter=_percent_int)  # %\d+
+    pane: int = attr.ib(converter=percent_int)  # %\d+
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class WindowPaneChanged(Notification):
     """%window-pane-changed @window %pane
     A window's active pane changed.
     """
 
     header = b"%window-pane-changed"
-    window: int = attr.ib(converter=_at_int)
-    pane: int = attr.ib(converter=_percent_int)
+    window: int = attr.ib(converter=at_int)
+    pane: int = attr.ib(converter=percent_int)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class WindowClose(Notification):
     """%window-close @window
     A window was closed in the attached session.
     """
 
     header = b"%window-close"
-    window: int = attr.ib(converter=_at_int)
+    window: int = attr.ib(converter=at_int)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class UnlinkedWindowClose(Notification):
     """%unlinked-window-close @window
     A window was closed in another session.
     """
 
     header = b"%unlinked-window-close"
-    window: int = attr.ib(converter=_at_int)
+    window: int = attr.ib(converter=at_int)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class WindowAdd(Notification):
     """%window-add @window
     A window was added to the attached session.
     """
 
     header = b"%window-add"
-    window: int = attr.ib(converter=_at_int)
+    window: int = attr.ib(converter=at_int)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class UnlinkedWindowAdd(Notification):
     """%unlinked-window-add @window
     A window was added to another session.
     """
 
     header = b"%unlinked-window-add"
-    window: int = attr.ib(converter=_at_int)
+    window: int = attr.ib(converter=at_int)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class WindowRenamed(Notification):
     """%window-renamed @window new-name
     A window was renamed in the attached session.
     """
 
     header = b"%window-renamed"
-    window: int = attr.ib(converter=_at_int)
+    window: int = attr.ib(converter=at_int)
     new_name: str = attr.ib(converter=_to_str)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class UnlinkedWindowRenamed(Notification):
     """%unlinked-window-renamed @window new-name
     A window was renamed in another session.
     """
 
     header = b"%unlinked-window-renamed"
-    window: int = attr.ib(converter=_at_int)
+    window: int = attr.ib(converter=at_int)
     new_name: str = attr.ib(converter=_to_str)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class SessionChanged(Notification):
     """%session-changed $session session-name
     The attached session was changed.
     """
 
     header = b"%session-changed"
-    session: int = attr.ib(converter=_dollar_int)
+    session: int = attr.ib(converter=dollar_int)
     session_name: str = attr.ib(converter=_to_str)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class ClientSessionChanged(Notification):
     """%client-session-changed client $session session-name
     Another client's attached session was changed.
@@ -250,22 +854,22 @@ class ClientSessionChanged(Notification):
 
     header = b"%client-session-changed"
     client: str = attr.ib(converter=_to_str)
-    session: int = attr.ib(converter=_dollar_int)
+    session: int = attr.ib(converter=dollar_int)
     session_name: str = attr.ib(converter=_to_str)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class SessionRenamed(Notification):
     """%session-renamed $session new-name
     A session was renamed.
     """
 
     header = b"%session-renamed"
-    session: int = attr.ib(converter=_dollar_int)
+    session: int = attr.ib(converter=dollar_int)
     new_name: str = attr.ib(converter=_to_str)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class SessionsChanged(Notification):
     """%sessions-changed
     A session was created or destroyed.
@@ -274,18 +878,18 @@ class SessionsChanged(Notification):
     header = b"%sessions-changed"
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class SessionWindowChanged(Notification):
     """%session-window-changed $session @window
     A session's current window was changed.
     """
 
     header = b"%session-window-changed"
-    session: int = attr.ib(converter=_dollar_int)
-    window: int = attr.ib(converter=_at_int)
+    session: int = attr.ib(converter=dollar_int)
+    window: int = attr.ib(converter=at_int)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class ClientDetached(Notification):
     """%client-detached client
     The client has detached.
@@ -295,7 +899,7 @@ class ClientDetached(Notification):
     client: str = attr.ib(_to_str)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class Continue(Notification):
     """%continue pane-id
     The pane has been continued after being paused (if the pause-after flag is set, see refresh-client -A).
@@ -303,10 +907,10 @@ class Continue(Notification):
 
     header = b"%continue"
 
-    pane: int = attr.ib(converter=_percent_int)
+    pane: int = attr.ib(converter=percent_int)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class Exit(Notification):
     """%exit [reason]
     The tmux client is exiting immediately, either because it is not attached to any session or an error occurred.  If present, reason describes why the client exited.
@@ -316,65 +920,116 @@ class Exit(Notification):
     reason: T.Optional[bytes] = attr.ib(default=None)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class ExtendedOutput(Notification):
     """%extended-output pane-id age ... : value
     New form of %output sent when the pause-after flag is set.  age is the time in milliseconds for which tmux had buffered the output before it was sent.  Any subsequent arguments up until a single ‘:’ are for future use and should be ignored.
     """
 
     header = b"%extended-output"
-    pane: int = attr.ib(converter=_percent_int)
-    # TODO@haoliang
-    rest: bytes = attr.ib()
+    # fields are not separated by single spaces alone, see from_bytes
+    _positional = False
+
+    pane: int = attr.ib(converter=percent_int)
+    # milliseconds
+    age: int = attr.ib(converter=_to_int)
+    value: bytes = attr.ib()
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        assert data.startswith(cls.header)
+        assert data.endswith(b"\n")
 
+        try:
+            sep = data.index(b" : ", len(cls.header))
+            _, pane, age, *_ = data[:sep].split(b" ")
+        except ValueError as e:
+            raise ValueError(f"malformed {cls.__name__}: {data!r}") from e
+
+        return cls(pane, age, data[sep + 3 : -1])
+
+    @property
+    def decoded(self) -> bytes:
+        """the raw bytes the pane produced"""
+        return unescape(self.value)
 
-@attr.s
+
+@attr.s(slots=True, frozen=True)
 class Output(Notification):
     """%output pane-id value
     A window pane produced output.  value escapes non-printable characters and backslash as octal.
     """
 
     header = b"%output"
-    pane: int = attr.ib(converter=_percent_int)
+    pane: int = attr.ib(converter=percent_int)
     value: bytes = attr.ib()
 
+    @property
+    def decoded(self) -> bytes:
+        """the raw bytes the pane produced"""
+        return unescape(self.value)
+
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class LayoutChange(Notification):
     """%layout-change window-id window-layout window-visible-layout window-flags
     The layout of a window with ID window-id changed.  The new layout is window-layout.  The window's visible layout is window-visible-layout and the window flags are window-flags.
     """
 
-    # TODO@haoliang
     header = b"%layout-change"
 
-    window: int = attr.ib(converter=_at_int)
+    window: int = attr.ib(converter=at_int)
     window_layout: bytes = attr.ib()
     window_visible_layout: bytes = attr.ib()
     window_flags: bytes = attr.ib()
 
+    @property
+    def layout(self) -> _layout.Layout:
+        """window_layout parsed, repeated layouts come from a cache"""
+        return _layout.parse(self.window_layout)
 
-@attr.s
+    @property
+    def visible_layout(self) -> _layout.Layout:
+        return _layout.parse(self.window_visible_layout)
+
+
+@attr.s(slots=True, frozen=True)
 class Pause(Notification):
     """%pause pane-id
     The pane has been paused (if the pause-after flag is set).
     """
 
     header = b"%pause"
-    pane: int = attr.ib(converter=_percent_int)
+    pane: int = attr.ib(converter=percent_int)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class SubscriptionChanged(Notification):
     """%subscription-changed name session-id window-id window-index pane-id ... : value
     The value of the format associated with subscription name has changed to value.  See refresh-client -B.  Any arguments after pane-id up until a single ‘:’ are for future use and should be ignored.
     """
 
     header = b"%subscription-changed"
-    name: bytes = attr.ib()
-    session: int = attr.ib(converter=_dollar_int)
-    window: int = attr.ib(converter=_at_int)
-    window_idx: int = attr.ib(converter=_at_int)
-    pane: int = attr.ib(converter=_percent_int)
-    # TODO@haoliang
-    rest: bytes = attr.ib()
+    # fields are not separated by single spaces alone, see from_bytes
+    _positional = False
+
+    name: str = attr.ib(converter=_to_str)
+    session: int = attr.ib(converter=dollar_int)
+    # None for the ids the subscription is not about, tmux sends them as -
+    window: T.Optional[int] = attr.ib(converter=_at_int_or_dash)
+    window_idx: T.Optional[int] = attr.ib(converter=_int_or_dash)
+    pane: T.Optional[int] = attr.ib(converter=_percent_int_or_dash)
+    value: bytes = attr.ib()
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        assert data.startswith(cls.header)
+        assert data.endswith(b"\n")
+
+        try:
+            sep = data.index(b" : ", len(cls.header))
+            _, name, session, window, window_idx, pane, *_ = data[:sep].split(b" ")
+        except ValueError as e:
+            raise ValueError(f"malformed {cls.__name__}: {data!r}") from e
+
+        return cls(name, session, window, window_idx, pane, data[sep + 3 : -1])
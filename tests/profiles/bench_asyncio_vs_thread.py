@@ -0,0 +1,88 @@
+"""
+notifications per second through a pipe: the asyncio connection against the
+sync listener thread.
+
+usage: python -m tests.profiles.bench_asyncio_vs_thread
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from pytmux.async_ import aio
+from pytmux.sync.listener import Listener
+
+
+def events(count: int) -> bytes:
+    line = b"%output %1 " + b"x" * 60 + b"\\015\\012\n"
+    return line * count
+
+
+def writer(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+    os.close(fd)
+
+
+def run_asyncio(data: bytes) -> int:
+    async def main():
+        rfd, wfd = os.pipe()
+        conn = await aio.connect_pipes(os.fdopen(rfd, "rb", buffering=0))
+        thread = threading.Thread(target=writer, args=(wfd, data))
+        thread.start()
+
+        received = 0
+        while True:
+            try:
+                received += len(await conn.drain_notifications())
+            except aio.ConnectionClosed:
+                break
+
+        thread.join()
+        return received
+
+    return asyncio.run(main())
+
+
+def run_thread(data: bytes) -> int:
+    rfd, wfd = os.pipe()
+    # the notiq holds everything, a full one would coalesce the outputs
+    listener = Listener.from_args(rfd, 1024, len(data))
+    listener.listen_in_background()
+    thread = threading.Thread(target=writer, args=(wfd, data))
+    thread.start()
+
+    received = 0
+    while True:
+        try:
+            notis, _ = listener.drain()
+        except ValueError:
+            break
+        received += len(notis)
+
+    thread.join()
+    try:
+        listener.close()
+    except BrokenPipeError:
+        pass
+    os.close(rfd)
+    return received
+
+
+def main():
+    count = 500_000
+    data = events(count)
+
+    for name, run in (("asyncio", run_asyncio), ("thread", run_thread)):
+        start = time.perf_counter()
+        received = run(data)
+        elapsed = time.perf_counter() - start
+        assert received == count, (name, received)
+        print(f"{name:<8} {count / elapsed:12.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
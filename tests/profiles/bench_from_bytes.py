@@ -0,0 +1,36 @@
+"""
+per class cost of the generated Notification.from_bytes against the generic one.
+
+usage: python -m tests.profiles.bench_from_bytes
+"""
+
+import timeit
+
+from pytmux import types
+from tests.test_types import SAMPLE_LINES
+
+
+def main():
+    generic = types.Notification.from_bytes.__func__  # type: ignore
+    number = 100_000
+
+    print(f"{'class':<24} {'generic':>10} {'generated':>10} {'speedup':>8}")
+    for cls, line in SAMPLE_LINES.items():
+        # those with their own from_bytes split the line differently
+        if not cls._positional:
+            continue
+        assert cls.from_bytes(line) == generic(cls, line)
+
+        generic_cost = timeit.timeit(lambda: generic(cls, line), number=number)
+        generated_cost = timeit.timeit(lambda: cls.from_bytes(line), number=number)
+
+        print(
+            f"{cls.__name__:<24}"
+            f" {generic_cost / number * 1e9:>8.0f}ns"
+            f" {generated_cost / number * 1e9:>8.0f}ns"
+            f" {generic_cost / generated_cost:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
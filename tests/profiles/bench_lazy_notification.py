@@ -0,0 +1,58 @@
+"""
+per-event cost of eager vs lazy notifications, for a consumer which only
+looks at the type and the pane of %output and %layout-change.
+
+usage: python -m tests.profiles.bench_lazy_notification
+"""
+
+import time
+
+from pytmux import reader, types
+
+
+def make_stream(n: int) -> bytes:
+    lines = []
+    for i in range(n):
+        if i % 2:
+            lines.append(
+                b"%%output %%%d \\033[1m\\033[7m%%\\033[27m\\033[1m\\033[0m \\015\n"
+                % (i % 50)
+            )
+        else:
+            lines.append(
+                b"%layout-change @59 3369,232x48,0,0,119 3369,232x48,0,0,119 *\n"
+            )
+    return b"".join(lines)
+
+
+def consume(er: reader.EventReader, data: bytes) -> float:
+    sr = reader.StreamReader(er)
+    wanted = 0
+
+    began = time.perf_counter()
+    for event in sr.feed(data):
+        if isinstance(event, types.Output) and event.pane == 7:
+            wanted += 1
+    return time.perf_counter() - began
+
+
+def main():
+    n = 200_000
+    data = make_stream(n)
+
+    # the best of a few rounds each, interleaved so load hits both alike
+    best = {"eager": float("inf"), "lazy": float("inf")}
+    for _ in range(5):
+        for name, lazy in (("eager", False), ("lazy", True)):
+            elapsed = consume(reader.EventReader(lazy=lazy), data)
+            best[name] = min(best[name], elapsed)
+
+    for name, elapsed in best.items():
+        print(f"{name:<6} {elapsed / n * 1e6:6.2f} us/event")
+
+    # lazy only pays off when it beats decoding everything up front
+    assert best["lazy"] < best["eager"], best
+
+
+if __name__ == "__main__":
+    main()
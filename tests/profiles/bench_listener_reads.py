@@ -0,0 +1,83 @@
+"""
+syscalls per MB when a burst of %output goes through a pipe: one PIPE_BUF read
+per wakeup as the listener used to, draining with a fixed PIPE_BUF, and
+draining with an adaptive read size.
+
+usage: python -m tests.profiles.bench_listener_reads
+"""
+
+import os
+import select
+import threading
+
+from pytmux import reader
+from pytmux.sync.listener import AdaptiveBufsize, ReadStats, drain
+
+
+def burst(megabytes: int) -> bytes:
+    line = b"%output %1 " + b"x" * 100 + b"\\015\\012\n"
+    return line * (megabytes * (1 << 20) // len(line))
+
+
+def writer(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+    os.close(fd)
+
+
+def read_once(fd, sr, bufsize, stats):
+    """the listener before draining"""
+    data = os.read(fd, bufsize.size)
+    stats.reads += 1
+    stats.nbytes += len(data)
+    if not data:
+        raise BrokenPipeError("remote closed pipe")
+    yield from sr.feed(data)
+
+
+def run(read, bufsize: AdaptiveBufsize, data: bytes):
+    rfd, wfd = os.pipe()
+    os.set_blocking(rfd, False)
+    thread = threading.Thread(target=writer, args=(wfd, data))
+    thread.start()
+
+    sr = reader.StreamReader(reader.EventReader(lazy=True))
+    stats = ReadStats()
+    polls = 0
+
+    with select.epoll() as poller:
+        poller.register(rfd, select.EPOLLIN)
+        try:
+            while True:
+                poller.poll()
+                polls += 1
+                for _ in read(rfd, sr, bufsize, stats):
+                    pass
+        except BrokenPipeError:
+            pass
+
+    thread.join()
+    os.close(rfd)
+
+    mb = stats.nbytes / (1 << 20)
+    return stats.reads_per_mb, polls / mb
+
+
+def main():
+    data = burst(64)
+
+    fixed = AdaptiveBufsize(select.PIPE_BUF, select.PIPE_BUF)
+
+    for name, read, bufsize in (
+        ("read once", read_once, fixed),
+        ("drain, fixed", drain, fixed),
+        ("drain, adaptive", drain, AdaptiveBufsize()),
+    ):
+        reads, polls = run(read, bufsize, data)
+        print(f"{name:<16} {reads:8.1f} reads/MB {polls:8.1f} polls/MB")
+
+
+if __name__ == "__main__":
+    main()
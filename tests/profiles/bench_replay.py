@@ -0,0 +1,64 @@
+"""
+MB/s of replaying a recording as fast as possible, against feeding the same
+raw bytes from a plain file to a StreamReader.
+
+usage: python -m tests.profiles.bench_replay
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from pytmux import reader
+from pytmux.recording import Recorder, Replayer
+
+TESTDATA = Path(__file__).resolve().parent.parent.joinpath("testdata")
+COPIES = 2000
+CHUNK = 64 << 10
+
+
+def raw(path: Path) -> int:
+    stream = reader.StreamReader()
+    count = 0
+    with path.open("rb") as file:
+        while True:
+            chunk = file.read(CHUNK)
+            if not chunk:
+                break
+            for _ in stream.feed(chunk):
+                count += 1
+    return count
+
+
+def replayed(path: Path) -> int:
+    count = 0
+    with Replayer(str(path)) as replayer:
+        for _ in replayer.replay():
+            count += 1
+    return count
+
+
+def main():
+    data = TESTDATA.joinpath("multiline_events").read_bytes() * COPIES
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        plain = Path(tmpdir, "raw")
+        plain.write_bytes(data)
+
+        recording = Path(tmpdir, "rec")
+        with Recorder(str(recording)) as recorder:
+            for i in range(0, len(data), CHUNK):
+                recorder.record(data[i : i + CHUNK])
+
+        for name, bench, path in (
+            ("raw file", raw, plain),
+            ("replayed", replayed, recording),
+        ):
+            start = time.perf_counter()
+            count = bench(path)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10} {len(data) / elapsed / 1e6:7.1f}MB/s {count} events")
+
+
+if __name__ == "__main__":
+    main()
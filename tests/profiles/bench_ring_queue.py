@@ -0,0 +1,109 @@
+"""
+items per second from a producer thread to a consumer thread: ReplyQ on
+queue.Queue, NotiQ, and RingQueue one by one and in batches.
+
+usage: python -m tests.profiles.bench_ring_queue
+"""
+
+import threading
+import time
+from queue import Empty
+
+from pytmux.sync.listener import NotiQ, ReplyQ
+from pytmux.sync.ring import RingQueue
+
+COUNT = 2_000_000
+CAPACITY = 4096
+
+
+def produce(put):
+    for i in range(COUNT):
+        put(i)
+
+
+def run(put, consume) -> float:
+    producer = threading.Thread(target=produce, args=(put,))
+
+    start = time.perf_counter()
+    producer.start()
+    consume()
+    producer.join()
+
+    return COUNT / (time.perf_counter() - start)
+
+
+def replyq():
+    q = ReplyQ(CAPACITY)
+
+    def consume():
+        for _ in range(COUNT):
+            q.get()
+
+    return run(q.put, consume)
+
+
+def replyq_drain():
+    q = ReplyQ(CAPACITY)
+
+    def consume():
+        received = 0
+        while received < COUNT:
+            batch = q.drain()
+            if not batch:
+                batch = [q.get()]
+            received += len(batch)
+
+    return run(q.put, consume)
+
+
+def notiq():
+    # not bounded for this, it has no blocking put and would drop or coalesce
+    q = NotiQ(COUNT)
+
+    def consume():
+        received = 0
+        while received < COUNT:
+            try:
+                q.get()
+            except Empty:
+                time.sleep(0)
+                continue
+            received += 1
+
+    return run(q.put, consume)
+
+
+def ring():
+    q = RingQueue(CAPACITY)
+
+    def consume():
+        for _ in range(COUNT):
+            q.get()
+
+    return run(q.put, consume)
+
+
+def ring_batched():
+    q = RingQueue(CAPACITY)
+
+    def consume():
+        received = 0
+        while received < COUNT:
+            received += len(q.get_many())
+
+    return run(q.put, consume)
+
+
+def main():
+    for name, bench in (
+        ("ReplyQ get", replyq),
+        ("ReplyQ drain", replyq_drain),
+        ("NotiQ get", notiq),
+        ("RingQueue get", ring),
+        ("RingQueue get_many", ring_batched),
+    ):
+        print(f"{name:<20} {bench() / 1e6:6.2f}M items/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+lines/sec of StreamReader framing on the test fixtures, against the
+previous line-by-line implementation. the buffered reader copies every chunk
+into its buffer first here, its callers read into get_buffer() instead.
+
+usage: python -m tests.profiles.bench_stream_reader
+"""
+
+import time
+from pathlib import Path
+
+from pytmux import reader
+
+TESTDATA = Path(__file__).resolve().parent.parent.joinpath("testdata")
+
+
+class LineCounter(reader.EventReaderABC):
+    """measures framing only"""
+
+    def __init__(self):
+        self.lines = 0
+
+    def feed(self, line):
+        self.lines += 1
+        yield from ()
+
+    @property
+    def clean(self):
+        return True
+
+
+class LegacyStreamReader(reader.StreamReader):
+    """StreamReader.feed before the bulk framing"""
+
+    def feed(self, data: bytes):
+        start = 0
+        end = len(data) - 1
+
+        while True:
+            short = self._short
+            assert b"\n" not in short
+
+            eol = data.find(b"\n", start)
+            if eol < 0:
+                short.extend(data[start:])
+                assert b"\n" not in short
+                break
+
+            short.extend(data[start : eol + 1])
+            assert short.endswith(b"\n")
+            start = eol + 1
+
+            line = short
+            self._short = bytearray()
+
+            yield from self._er.feed(line)
+
+            if start > end:
+                break
+
+
+def bench(make_reader, data: bytes, chunk_size: int, rounds: int) -> float:
+    chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+    lines = data.count(b"\n") * rounds
+
+    began = time.perf_counter()
+    for _ in range(rounds):
+        sr = make_reader()
+        for chunk in chunks:
+            for _ in sr.feed(chunk):
+                pass
+    elapsed = time.perf_counter() - began
+
+    return lines / elapsed
+
+
+def main():
+    readers = {
+        "legacy": lambda: LegacyStreamReader(LineCounter()),
+        "bulk": lambda: reader.StreamReader(LineCounter()),
+        "buffered": lambda: reader.BufferedStreamReader(LineCounter()),
+        "legacy+events": lambda: LegacyStreamReader(),
+        "bulk+events": lambda: reader.StreamReader(),
+        "buffered+events": lambda: reader.BufferedStreamReader(),
+    }
+
+    for fixture in ("multiline_events_list_keys", "multiline_events"):
+        data = TESTDATA.joinpath(fixture).read_bytes()
+        for chunk_size in (4096, 65536):
+            print(f"{fixture}, {chunk_size} bytes per read")
+            for name, make_reader in readers.items():
+                rate = bench(make_reader, data, chunk_size, 300)
+                print(f"  {name:<16} {rate:>12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
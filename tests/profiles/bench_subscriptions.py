@@ -0,0 +1,46 @@
+"""
+reading a burst of %output of many panes while subscribed to one of them:
+decoding everything and filtering afterwards, against skipping undecoded.
+
+usage: python -m tests.profiles.bench_subscriptions
+"""
+
+import time
+
+from pytmux import reader, types
+from pytmux.subscriptions import Subscriptions
+
+
+def burst(panes: int, count: int) -> bytes:
+    lines = [b"%%output %%%d " % pane + b"x" * 60 + b"\\015\n" for pane in range(panes)]
+    return b"".join(lines) * (count // panes)
+
+
+def run(data: bytes, subs: Subscriptions, filtered: bool) -> float:
+    er = reader.EventReader(subscriptions=subs if filtered else None)
+    sr = reader.StreamReader(er)
+
+    start = time.perf_counter()
+    wanted = [e for e in sr.feed(data) if subs.matches(e)]
+    elapsed = time.perf_counter() - start
+
+    assert all(e.pane == 7 for e in wanted)
+    return elapsed
+
+
+def main():
+    data = burst(100, 500_000)
+
+    subs = Subscriptions()
+    subs.subscribe(types.Output, pane=7)
+    # many subscriptions do not slow down the lookup
+    for session in range(10_000):
+        subs.subscribe(types.SessionChanged, session=session)
+
+    for name, filtered in (("decode all", False), ("subscribed", True)):
+        elapsed = run(data, subs, filtered)
+        print(f"{name:<12} {elapsed:6.3f}s")
+
+
+if __name__ == "__main__":
+    main()
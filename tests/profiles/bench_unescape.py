@@ -0,0 +1,85 @@
+"""
+MB/s of decoding %output values, on binary-ish and on terminal-ish pane output.
+
+usage: python -m tests.profiles.bench_unescape
+"""
+
+import os
+import re
+import time
+
+from pytmux import types
+
+_ESCAPES = {b"\\%03o" % byte: bytes([byte]) for byte in (*range(0x20), 0x5C)}
+_OCTETS = {escape[1:]: byte for escape, byte in _ESCAPES.items()}
+_ESCAPE_RE = re.compile(rb"\\[0-7]{3}")
+
+
+def escape(raw: bytes) -> bytes:
+    return b"".join(
+        b"\\%03o" % byte if byte < 0x20 or byte == 0x5C else bytes([byte])
+        for byte in raw
+    )
+
+
+def per_byte(value: bytes) -> bytes:
+    """what a consumer writes by hand"""
+    out = bytearray()
+    i = 0
+    while i < len(value):
+        if value[i] == 0x5C:
+            out.append(int(value[i + 1 : i + 4], 8))
+            i += 4
+        else:
+            out.append(value[i])
+            i += 1
+    return bytes(out)
+
+
+def regex_table(value: bytes) -> bytes:
+    lookup = _ESCAPES.__getitem__
+    return _ESCAPE_RE.sub(lambda m: lookup(m[0]), value)
+
+
+def split_table(value: bytes) -> bytes:
+    parts = value.split(b"\\")
+    out = [parts[0]]
+    for part in parts[1:]:
+        out.append(_OCTETS[part[:3]])
+        out.append(part[3:])
+    return b"".join(out)
+
+
+def bench(decode, value: bytes, rounds: int) -> float:
+    began = time.perf_counter()
+    for _ in range(rounds):
+        decode(value)
+    elapsed = time.perf_counter() - began
+    return len(value) * rounds / elapsed / 1e6
+
+
+def main():
+    samples = {
+        "binary": os.urandom(1 << 20),
+        "terminal": b"\x1b[1m\x1b[34mdrwxr-xr-x\x1b[0m  2 root root 4096 src\r\n"
+        * (1 << 14),
+    }
+
+    decoders = {
+        "per-byte": per_byte,
+        "regex+table": regex_table,
+        "split+table": split_table,
+        "types.unescape": types.unescape,
+    }
+
+    for name, raw in samples.items():
+        value = escape(raw)
+        print(f"{name}, {len(value)} escaped bytes")
+        for dname, decode in decoders.items():
+            assert decode(value) == raw
+            rounds = 1 if dname == "per-byte" else 10
+            print(f"  {dname:<16} {bench(decode, value, rounds):>8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
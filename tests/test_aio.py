@@ -0,0 +1,150 @@
+import asyncio
+import os
+import threading
+
+import pytest
+from pytmux import types
+from pytmux.async_ import aio
+
+from .test_commands import fake_tmux, reply
+
+
+async def open_pipe(**kwargs):
+    rfd, wfd = os.pipe()
+    conn = await aio.connect_pipes(os.fdopen(rfd, "rb", buffering=0), **kwargs)
+    return conn, wfd
+
+
+def test_notifications_and_replies():
+    async def main():
+        conn, wfd = await open_pipe()
+        os.write(wfd, b"%sessions-changed\n" + reply(7, b"0: 1 windows\n", flags=0))
+        os.write(wfd, b"%window-add @1\n%window-add @2\n")
+
+        assert isinstance(await conn.next_notification(), types.SessionsChanged)
+        assert (await conn.next_reply()).body == [b"0: 1 windows\n"]
+        assert [n.window for n in await conn.drain_notifications()] == [1, 2]
+
+        os.close(wfd)
+        await conn.wait_closed()
+        with pytest.raises(aio.ConnectionClosed):
+            await conn.next_notification()
+
+    asyncio.run(main())
+
+
+def test_async_iteration_ends_on_eof():
+    async def main():
+        conn, wfd = await open_pipe()
+        os.write(wfd, b"%window-add @1\n%window-add @2\n")
+        os.close(wfd)
+
+        return [n.window async for n in conn.notifications()]
+
+    assert asyncio.run(main()) == [1, 2]
+
+
+def test_backpressure():
+    async def main():
+        conn, wfd = await open_pipe(high_water=4, low_water=1)
+        os.write(wfd, b"%window-add @1\n" * 10)
+
+        while not conn.paused:
+            await asyncio.sleep(0.01)
+
+        while conn.paused:
+            await conn.next_notification()
+        assert len(conn._notis) <= 1
+
+        os.close(wfd)
+        rest = [n async for n in conn.notifications()]
+        return rest
+
+    # whatever was read before pausing is still delivered
+    assert len(asyncio.run(main())) > 0
+
+
+def test_command_pipelining():
+    stdin_r, stdin_w = os.pipe()
+    stdout_r, stdout_w = os.pipe()
+
+    server = threading.Thread(target=fake_tmux, args=(stdin_r, stdout_w))
+    server.start()
+
+    async def main():
+        conn = await aio.connect_pipes(
+            os.fdopen(stdout_r, "rb", buffering=0),
+            os.fdopen(stdin_w, "wb", buffering=0),
+        )
+
+        futures = conn.send_many(f"display -p {i}" for i in range(20))
+        last = await conn.command("list-sessions")
+        replies = await asyncio.gather(*futures)
+
+        # the reply of the attach command was not ours
+        unmatched = await conn.next_reply()
+
+        conn.close()
+        return replies, last, unmatched
+
+    try:
+        replies, last, unmatched = asyncio.run(main())
+    finally:
+        server.join()
+        os.close(stdout_w)
+
+    assert [r.body[0] for r in replies] == [b"display -p %d\n" % i for i in range(20)]
+    assert last.body == [b"list-sessions\n"]
+    assert unmatched.head_wrap.number == 100
+
+
+def test_commands_fail_when_closed():
+    async def main():
+        rfd, wfd = os.pipe()
+        devnull = open(os.devnull, "wb", buffering=0)
+        conn = await aio.connect_pipes(os.fdopen(rfd, "rb", buffering=0), devnull)
+
+        future = conn.send_many(["list-sessions"])[0]
+        os.close(wfd)
+
+        with pytest.raises(aio.ConnectionClosed):
+            await future
+        with pytest.raises(aio.ConnectionClosed):
+            conn.send_many(["list-sessions"])
+        devnull.close()
+
+    asyncio.run(main())
+
+
+def test_concurrent_getters():
+    async def main():
+        conn, wfd = await open_pipe()
+        getters = [asyncio.create_task(conn.next_notification()) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        os.write(wfd, b"%window-add @1\n%window-add @2\n")
+        got = await asyncio.wait_for(asyncio.gather(*getters), 5)
+        assert sorted(n.window for n in got) == [1, 2]
+
+        os.close(wfd)
+        await conn.wait_closed()
+
+    asyncio.run(main())
+
+
+def test_process_exit_keeps_what_is_in_the_pipe():
+    async def main():
+        # sh takes -C as noclobber, it stands in for tmux writing and exiting
+        script = (
+            "i=0; while [ $i -lt 2000 ]; do echo '%window-add @1'; i=$((i+1)); done"
+        )
+        conn = await aio.spawn(["-c", script], tmux="sh", high_water=16, low_water=4)
+        # reading paused at high_water, sh exits with most of it in the pipe
+        await asyncio.sleep(0.2)
+
+        count = 0
+        async for _ in conn.notifications():
+            count += 1
+        assert count == 2000
+
+    asyncio.run(main())
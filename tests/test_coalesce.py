@@ -0,0 +1,74 @@
+from pytmux import coalesce, reader, types
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def outputs(*pairs):
+    return [types.Output(pane, value) for pane, value in pairs]
+
+
+def test_merge_until_other_event():
+    co = coalesce.OutputCoalescer(clock=Clock())
+
+    events = [
+        *outputs((1, b"a"), (2, b"x"), (1, b"b")),
+        types.WindowAdd(b"@3"),
+        *outputs((1, b"c")),
+    ]
+
+    merged = list(co.feed(events))
+    assert merged == [
+        *outputs((1, b"ab"), (2, b"x")),
+        types.WindowAdd(b"@3"),
+    ]
+    assert not co.clean
+
+    assert list(co.flush()) == outputs((1, b"c"))
+    assert co.clean
+
+
+def test_flush_on_size():
+    co = coalesce.OutputCoalescer(max_bytes=4, clock=Clock())
+
+    merged = list(co.feed(outputs((1, b"ab"), (1, b"cd"), (1, b"e"))))
+    assert merged == outputs((1, b"abcd"))
+    assert list(co.flush()) == outputs((1, b"e"))
+
+
+def test_flush_on_delay():
+    clock = Clock()
+    co = coalesce.OutputCoalescer(max_delay=0.01, clock=clock)
+
+    assert co.deadline is None
+    assert not list(co.feed(outputs((1, b"ab"))))
+    assert co.deadline == 0.01
+
+    clock.now = 0.005
+    assert not list(co.expire())
+
+    clock.now = 0.01
+    assert list(co.expire()) == outputs((1, b"ab"))
+    assert co.deadline is None
+
+
+def test_keeps_order_per_pane(multiline_events: bytes):
+    events = list(reader.StreamReader().feed(multiline_events))
+    co = coalesce.OutputCoalescer(max_bytes=100, clock=Clock())
+
+    merged = [*co.feed(events), *co.flush()]
+
+    def stream(evts, pane):
+        return b"".join(
+            e.value for e in evts if isinstance(e, types.Output) and e.pane == pane
+        )
+
+    assert stream(merged, 78) == stream(events, 78)
+    assert [e for e in merged if not isinstance(e, types.Output)] == [
+        e for e in events if not isinstance(e, types.Output)
+    ]
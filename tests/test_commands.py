@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+import pytest
+from pytmux import commands, reader, types
+from pytmux.sync.client import Client
+from pytmux.sync.listener import Listener
+
+
+def reply(number: int, body: bytes = b"", flags: int = 1) -> bytes:
+    return b"%%begin 1622538780 %d %d\n%s%%end 1622538780 %d %d\n" % (
+        number,
+        flags,
+        body,
+        number,
+        flags,
+    )
+
+
+def test_encode():
+    assert commands.encode("list-sessions") == b"list-sessions\n"
+    assert commands.encode(b"list-panes -a") == b"list-panes -a\n"
+
+    with pytest.raises(ValueError):
+        commands.encode("list-sessions\nkill-server")
+
+    # tmux would leave control mode on an empty line
+    for blank in ("", " \t", b""):
+        with pytest.raises(ValueError):
+            commands.encode(blank)
+
+
+def test_tracker_matches_in_order():
+    tracker = commands.CommandTracker()
+    tracker.sent("a")
+    tracker.sent("b")
+
+    events = list(reader.StreamReader().feed(reply(7, flags=0) + reply(10) + reply(11)))
+
+    assert tracker.match(events[0]) is None
+    assert tracker.match(events[1]) == "a"
+    assert tracker.match(events[2]) == "b"
+    assert len(tracker) == 0
+    assert tracker.match(events[2]) is None
+
+
+def test_tracker_streamed_replies():
+    tracker = commands.CommandTracker()
+    tracker.sent("a")
+    tracker.sent("b")
+
+    sr = reader.StreamReader(reader.EventReader(chunk_lines=1))
+    chunks = list(sr.feed(reply(10, b"1\n2\n") + reply(11, b"3\n")))
+
+    assert [tracker.match(chunk) for chunk in chunks] == ["a"] * 3 + ["b"] * 2
+    assert len(tracker) == 0
+
+
+def fake_tmux(rfd: int, wfd: int):
+    """replies every command line with its own text"""
+    number = 100
+    os.write(wfd, reply(number, flags=0))
+
+    with os.fdopen(rfd, "rb", buffering=0) as stdin:
+        buffered = b""
+        while True:
+            data = stdin.read(4096)
+            if not data:
+                break
+            buffered += data
+            *lines, buffered = buffered.split(b"\n")
+            for line in lines:
+                number += 1
+                os.write(wfd, reply(number, line + b"\n"))
+                time.sleep(0.001)
+
+
+def test_client_pipelines_commands():
+    stdin_r, stdin_w = os.pipe()
+    stdout_r, stdout_w = os.pipe()
+
+    server = threading.Thread(target=fake_tmux, args=(stdin_r, stdout_w))
+    server.start()
+
+    listener = Listener.from_args(stdout_r, 10, 10)
+    client = Client(stdin_w, listener)
+
+    try:
+        listener.listen_in_background()
+
+        futures = client.send_many(f"display -p {i}" for i in range(50))
+        futures.append(client.send("list-sessions"))
+
+        replies = [future.result(timeout=5) for future in futures]
+    finally:
+        os.close(stdin_w)
+        server.join()
+        os.close(stdout_w)
+        with pytest.raises(BrokenPipeError):
+            listener.close()
+        os.close(stdout_r)
+
+    assert [r.body[0] for r in replies[:-1]] == [
+        b"display -p %d\n" % i for i in range(50)
+    ]
+    assert replies[-1].body == [b"list-sessions\n"]
+    assert [r.head_wrap.number for r in replies] == list(range(101, 152))
+
+    # the reply of the attach command was not ours
+    notis, unmatched = listener.drain(timeout=1)
+    assert not notis
+    assert [r.head_wrap.number for r in unmatched] == [100]
+    assert isinstance(unmatched[0], types.Reply)
+
+
+def test_client_futures_fail_when_listener_stops():
+    stdout_r, stdout_w = os.pipe()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+
+    listener = Listener.from_args(stdout_r, 10, 10)
+    client = Client(devnull, listener)
+
+    try:
+        listener.listen_in_background()
+        future = client.send("list-sessions")
+        os.close(stdout_w)
+
+        with pytest.raises(BrokenPipeError):
+            future.result(timeout=5)
+    finally:
+        with pytest.raises(BrokenPipeError):
+            listener.close()
+        os.close(stdout_r)
+        os.close(devnull)
@@ -0,0 +1,139 @@
+import fcntl
+import os
+import sys
+import termios
+import time
+
+from pytmux import types
+from pytmux.flow import FlowControl
+from pytmux.subscriptions import Subscriptions
+from pytmux.sync.client import Client
+from pytmux.sync.listener import Listener
+
+
+def output(pane: int) -> types.Output:
+    return types.Output(pane, b"x")
+
+
+def test_backpressure():
+    flow = FlowControl(high_water=10, low_water=2)
+    assert flow.setup() == "refresh-client -f pause-after=1"
+
+    flow.feed([output(1), output(2)])
+    assert flow.update(5) == []
+    assert not flow.backpressure
+
+    assert flow.update(10) == []
+    assert flow.backpressure
+    assert flow.update(5) == []
+    assert flow.backpressure
+
+    # tmux paused them for lagging pause_after seconds
+    flow.feed([types.Pause(1), types.Pause(2)])
+    assert flow.paused == {1, 2}
+    assert flow.update(2) == [
+        "refresh-client -A '%1:continue'",
+        "refresh-client -A '%2:continue'",
+    ]
+    assert not flow.backpressure
+    assert not flow.throttled
+    assert flow.update(0) == []
+
+
+def test_continue_panes_tmux_paused():
+    flow = FlowControl(high_water=10, low_water=2)
+
+    flow.feed([types.Pause(4)])
+    assert flow.throttled
+    assert flow.update(5) == []
+    assert flow.update(1) == ["refresh-client -A '%4:continue'"]
+
+    flow.feed([types.Pause(5), types.Continue(5)])
+    assert flow.update(1) == []
+
+
+def test_never_pauses():
+    flow = FlowControl(high_water=10, low_water=2)
+
+    flow.feed([types.ExtendedOutput(1, 800, b"x"), output(2)])
+    assert flow.update(20) == []
+    assert flow.paused == set()
+
+
+def pending(fd: int) -> int:
+    buf = bytearray(4)
+    fcntl.ioctl(fd, termios.FIONREAD, buf)
+    return int.from_bytes(buf, sys.byteorder)
+
+
+def test_listener_flow_control():
+    rfd, wfd = os.pipe()
+    listener = Listener.from_args(rfd, 20, 100)
+    listener.flow = FlowControl(high_water=8, low_water=1)
+    sent: list = []
+    listener.flow_send = sent.extend
+
+    try:
+        listener.listen_in_background()
+
+        os.write(wfd, b"%output %1 x\n%output %2 y\n" * 5)
+        deadline = time.monotonic() + 5
+        while not listener.flow.backpressure and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert listener.flow.backpressure
+
+        # left to tmux while the consumer is behind
+        os.write(wfd, b"%pause %1\n")
+        time.sleep(0.1)
+        assert pending(rfd) == len(b"%pause %1\n")
+        assert len(listener.notiq) == 10
+        assert sent == []
+
+        notis, _ = listener.drain(timeout=5)
+        assert len(notis) == 10
+
+        notis, _ = listener.drain(timeout=5)
+        assert notis == [types.Pause(1)]
+        while not sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert sent == ["refresh-client -A '%1:continue'"]
+        assert not listener.flow.throttled
+    finally:
+        listener.close()
+        os.close(wfd)
+        os.close(rfd)
+
+
+def test_flow_control_with_subscriptions():
+    rfd, wfd = os.pipe()
+    in_rfd, in_wfd = os.pipe()
+    subs = Subscriptions()
+    subs.subscribe(types.Output, pane=2)
+    listener = Listener.from_args(rfd, 10, 100)
+    listener.subscriptions = subs
+
+    try:
+        client = Client(in_wfd, listener)
+        client.enable_flow_control(FlowControl(high_water=8, low_water=0))
+        listener.listen_in_background()
+
+        os.write(wfd, b"%pause %1\n" + b"%output %1 x\n%output %2 y\n" * 5)
+        notis: list = []
+        while len(notis) < 6:
+            got, _ = listener.drain(timeout=5)
+            assert got, "timed out"
+            notis.extend(got)
+
+        # pause passes without a subscription, outputs of %1 only went to flow
+        assert notis[0] == types.Pause(1)
+        assert [n.pane for n in notis[1:]] == [2] * 5
+
+        sent = b""
+        deadline = time.monotonic() + 5
+        while b"%1:continue" not in sent and time.monotonic() < deadline:
+            sent += os.read(in_rfd, 4096)
+        assert b"refresh-client -A '%1:continue'" in sent
+    finally:
+        listener.close()
+        for fd in (rfd, wfd, in_rfd, in_wfd):
+            os.close(fd)
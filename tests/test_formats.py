@@ -0,0 +1,64 @@
+import pytest
+from pytmux import reader
+from pytmux.formats import Formats, Update
+
+
+def events(*lines: bytes) -> list:
+    return list(reader.StreamReader().feed(b"".join(lines)))
+
+
+def test_subscribe_commands():
+    formats = Formats()
+
+    assert (
+        formats.subscribe("cwd", "#{pane_current_path}", "%*")
+        == "refresh-client -B 'cwd:%*:#{pane_current_path}'"
+    )
+    assert formats.subscribe("name", "#{session_name}") == (
+        "refresh-client -B 'name::#{session_name}'"
+    )
+    assert formats.commands() == [
+        "refresh-client -B 'cwd:%*:#{pane_current_path}'",
+        "refresh-client -B 'name::#{session_name}'",
+    ]
+    assert formats.unsubscribe("cwd") == "refresh-client -B 'cwd'"
+    assert "cwd" not in formats
+
+    for bad in (
+        ("a:b", "#{pane_id}", ""),
+        ("a", "#{pane_id}", "$1"),
+        ("a", "it's", ""),
+    ):
+        with pytest.raises(ValueError):
+            formats.subscribe(*bad)
+
+
+def test_updates_are_deduplicated():
+    formats = Formats()
+    called = []
+    formats.subscribe("width", "#{pane_width}", "%*", int, called.append)
+
+    updates = formats.feed(
+        events(
+            b"%subscription-changed width $1 @2 0 %3 : 80\n",
+            b"%subscription-changed width $1 @2 0 %4 : 80\n",
+            b"%subscription-changed width $1 @2 0 %3 : 80\n",
+            b"%output %3 x\n",
+            b"%subscription-changed other $1 @2 0 %3 : 1\n",
+            b"%subscription-changed width $1 @2 0 %3 : 120\n",
+        )
+    )
+
+    assert updates == [
+        Update("width", 1, 2, 0, 3, 80),
+        Update("width", 1, 2, 0, 4, 80),
+        Update("width", 1, 2, 0, 3, 120),
+    ]
+    assert called == updates
+
+    # subscribing again tells the current values again
+    formats.subscribe("width", "#{pane_width}", "%*", int)
+    assert (
+        len(formats.feed(events(b"%subscription-changed width $1 @2 0 %3 : 120\n")))
+        == 1
+    )
@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+
+import pytest
+from pytmux import types
+from pytmux.flow import FlowControl
+from pytmux.sync.client import Client
+from pytmux.sync.hub import Hub
+
+from .test_commands import fake_tmux, reply
+from .test_listener import eof_data
+
+
+def pipes(count: int):
+    return [os.pipe() for _ in range(count)]
+
+
+def close_all(fds):
+    for rfd, wfd in fds:
+        for fd in (rfd, wfd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def test_routes_to_connections():
+    fds = pipes(50)
+    threads = threading.active_count()
+
+    try:
+        with Hub() as hub:
+            conns = [hub.add(rfd, 10, 100) for rfd, _ in fds]
+            assert threading.active_count() == threads + 1
+
+            for i, (_, wfd) in enumerate(fds):
+                os.write(wfd, b"%%window-add @%d\n%%window-add @%d\n" % (i, i))
+
+            for i, conn in enumerate(conns):
+                received = []
+                while len(received) < 2:
+                    notis, _ = conn.drain(timeout=5)
+                    assert notis, "timed out"
+                    received.extend(notis)
+                assert [n.window for n in received] == [i, i]
+    finally:
+        close_all(fds)
+
+
+def test_eof_stops_one_connection():
+    fds = pipes(2)
+
+    try:
+        with Hub() as hub:
+            broken, alive = [hub.add(rfd, 10, 100) for rfd, _ in fds]
+
+            os.write(fds[0][1], b"%sessions-changed\n")
+            os.close(fds[0][1])
+            notis, _ = broken.drain(timeout=5)
+            assert isinstance(notis[0], types.SessionsChanged)
+            assert broken.term.wait(5)
+            with pytest.raises(ValueError):
+                broken.drain(timeout=5)
+            assert isinstance(broken.exc, BrokenPipeError)
+            assert len(hub) == 1
+
+            os.write(fds[1][1], b"%sessions-changed\n")
+            notis, _ = alive.drain(timeout=5)
+            assert len(notis) == 1
+            assert not alive.term.is_set()
+
+        assert alive.term.is_set()
+    finally:
+        close_all(fds)
+
+
+def test_events_before_eof_are_kept():
+    fds = pipes(1)
+    os.write(fds[0][1], eof_data())
+    os.close(fds[0][1])
+
+    try:
+        with Hub() as hub:
+            conn = hub.add(fds[0][0], 10, 1000)
+            received: list = []
+            with pytest.raises(ValueError):
+                while True:
+                    notis, _ = conn.drain(timeout=5)
+                    received.extend(notis)
+            assert len(received) == 227
+            assert isinstance(received[-1], types.Exit)
+            assert isinstance(conn.exc, BrokenPipeError)
+    finally:
+        close_all(fds)
+
+
+def test_remove():
+    fds = pipes(1)
+
+    try:
+        with Hub() as hub:
+            conn = hub.add(fds[0][0], 10, 100)
+            conn.close()
+            assert conn.term.is_set()
+            assert conn.exc is None
+            assert len(hub) == 0
+
+            os.write(fds[0][1], b"%sessions-changed\n")
+            time.sleep(0.05)
+            assert len(conn.notiq) == 0
+    finally:
+        close_all(fds)
+
+
+def test_reply_backpressure():
+    fds = pipes(2)
+
+    try:
+        with Hub() as hub:
+            slow, other = [hub.add(rfd, 1, 100) for rfd, _ in fds]
+
+            os.write(fds[0][1], b"".join(reply(i) for i in range(5)))
+            # the slow consumer does not hold back the other connection
+            os.write(fds[1][1], reply(0))
+            _, replies = other.drain(timeout=5)
+            assert len(replies) == 1
+
+            received = []
+            while len(received) < 5:
+                _, replies = slow.drain(timeout=5)
+                assert replies, "timed out"
+                received.extend(replies)
+
+            assert [r.head_wrap.number for r in received] == list(range(5))
+
+            # resumed after draining
+            os.write(fds[0][1], b"%sessions-changed\n")
+            notis, _ = slow.drain(timeout=5)
+            assert len(notis) == 1
+    finally:
+        close_all(fds)
+
+
+def test_client():
+    stdin_r, stdin_w = os.pipe()
+    stdout_r, stdout_w = os.pipe()
+
+    server = threading.Thread(target=fake_tmux, args=(stdin_r, stdout_w))
+    server.start()
+
+    try:
+        with Hub() as hub:
+            conn = hub.add(stdout_r, 10, 10)
+            client = Client(stdin_w, conn)
+
+            futures = client.send_many(f"display -p {i}" for i in range(10))
+            replies = [future.result(timeout=5) for future in futures]
+            assert [r.body[0] for r in replies] == [
+                b"display -p %d\n" % i for i in range(10)
+            ]
+
+            pending = client.send("list-sessions")
+            os.close(stdin_w)
+            server.join()
+            os.close(stdout_w)
+
+            # either replied before the eof or failed by it
+            try:
+                pending.result(timeout=5)
+            except BrokenPipeError:
+                pass
+            assert conn.term.wait(5)
+    finally:
+        os.close(stdout_r)
+
+
+def test_no_flow_control():
+    rfd, wfd = os.pipe()
+
+    try:
+        with Hub() as hub:
+            client = Client(wfd, hub.add(rfd, 10, 10))
+            flow = FlowControl(high_water=8, low_water=0)
+            with pytest.raises(TypeError):
+                client.enable_flow_control(flow)
+    finally:
+        os.close(rfd)
+        os.close(wfd)
+
+
+def test_drain_after_close():
+    fds = pipes(1)
+
+    try:
+        hub = Hub()
+        hub.start()
+        conn = hub.add(fds[0][0], 1, 100)
+        os.write(fds[0][1], b"".join(reply(i) for i in range(3)))
+        deadline = time.monotonic() + 5
+        while not conn._backlog and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert conn._backlog
+        hub.close()
+
+        # likely takes the fd of the closed waker
+        fds.append(os.pipe())
+        os.set_blocking(fds[-1][0], False)
+        _, replies = conn.drain(timeout=0)
+        with pytest.raises(BlockingIOError):
+            os.read(fds[-1][0], 8)
+        # the backlog went with the connection
+        assert len(replies) == 1
+    finally:
+        close_all(fds)
@@ -0,0 +1,61 @@
+import pytest
+from pytmux import layout, types
+from pytmux.layout import Cell, Split
+
+
+def test_parse():
+    parsed = layout.parse_uncached(b"3369,232x48,0,0,119")
+    assert parsed.checksum == 0x3369
+    assert parsed.root == Cell(232, 48, 0, 0, 119)
+    assert list(parsed.panes) == [119]
+
+    cells = b"159x48,0,0{79x48,0,0,1,79x48,80,0[79x24,80,0,2,79x23,80,25,3]}"
+    parsed = layout.parse_uncached(b"%04x,%s" % (layout.checksum(cells), cells))
+
+    assert parsed.root.split is Split.LEFT_RIGHT
+    left, right = parsed.root.children
+    assert left == Cell(79, 48, 0, 0, 1)
+    assert right.split is Split.TOP_BOTTOM
+    assert [cell.pane for cell in right.children] == [2, 3]
+    assert parsed.panes[3] == Cell(79, 23, 80, 25, 3)
+
+
+def test_parse_malformed():
+    for bad in (
+        b"",
+        b"80x24,0,0,1",
+        b"3369,232x48,0,0,118",
+        b"%04x,80x24,0,0" % layout.checksum(b"80x24,0,0"),
+        b"%04x,80x24,0,0{80x24,0,0,1" % layout.checksum(b"80x24,0,0{80x24,0,0,1"),
+        b"%04x,80x24,0,0,1x" % layout.checksum(b"80x24,0,0,1x"),
+    ):
+        with pytest.raises(ValueError):
+            layout.parse_uncached(bad)
+
+
+def test_cache():
+    cache = layout.LayoutCache(maxsize=2)
+    one = b"%04x,80x24,0,0,1" % layout.checksum(b"80x24,0,0,1")
+    two = b"%04x,80x24,0,0,2" % layout.checksum(b"80x24,0,0,2")
+    three = b"%04x,80x24,0,0,3" % layout.checksum(b"80x24,0,0,3")
+
+    first = cache.parse(one)
+    assert cache.parse(bytes(bytearray(one))) is first
+    cache.parse(two)
+    cache.parse(one)
+    # two was the least recently used
+    cache.parse(three)
+
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (2, 3)
+    assert cache.parse(one) is first
+    cache.parse(two)
+    assert cache.misses == 4
+
+
+def test_layout_change():
+    noti = types.LayoutChange.from_bytes(
+        b"%layout-change @59 3369,232x48,0,0,119 3369,232x48,0,0,119 *\n"
+    )
+    assert noti.layout is noti.visible_layout
+    assert list(noti.layout.panes) == [119]
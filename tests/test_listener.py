@@ -0,0 +1,256 @@
+import contextlib
+import os
+import threading
+import time
+
+import pytest
+from pytmux import reader, types
+from pytmux.sync.listener import (
+    AdaptiveBufsize,
+    Listener,
+    ReadStats,
+    Waker,
+    drain,
+)
+
+from .test_commands import reply
+
+
+@contextlib.contextmanager
+def listening(**kwargs):
+    rfd, wfd = os.pipe()
+    listener = Listener.from_args(rfd, 10, 100, **kwargs)
+
+    try:
+        listener.listen_in_background()
+        yield listener, wfd
+    finally:
+        listener.close()
+        os.close(wfd)
+        os.close(rfd)
+
+
+def collect(listener: Listener, until: int):
+    events: list = []
+    try:
+        while len(events) < until:
+            notis, replies = listener.drain(timeout=5)
+            assert notis or replies, "timed out"
+            events.extend(notis)
+            events.extend(replies)
+    except ValueError:
+        pass
+    return events
+
+
+def test_listen(multiline_events: bytes):
+    with listening() as (listener, wfd):
+        os.write(wfd, multiline_events)
+        events = collect(listener, 8)
+
+    assert len([e for e in events if isinstance(e, types.Reply)]) == 2
+    assert len([e for e in events if isinstance(e, types.Output)]) == 3
+
+
+def test_listen_coalesced(multiline_events: bytes):
+    with listening(coalesce_output=True) as (listener, wfd):
+        os.write(wfd, multiline_events)
+        events = collect(listener, 6)
+
+    outputs = [e for e in events if isinstance(e, types.Output)]
+    assert len(outputs) == 1
+    assert outputs[0].pane == 78
+
+
+def eof_data() -> bytes:
+    # exactly one read of the initial buffer size, and the last is %exit
+    lines = [b"%%window-add @%04d\n" % i for i in range(226)]
+    data = b"".join(lines)
+    data += b"%exit " + b"x" * (4096 - len(data) - 7) + b"\n"
+    assert len(data) == 4096
+    return data
+
+
+def test_events_before_eof_are_kept():
+    rfd, wfd = os.pipe()
+    os.write(wfd, eof_data())
+    os.close(wfd)
+
+    listener = Listener.from_args(rfd, 10, 1000)
+    try:
+        listener.listen_in_background()
+        events = collect(listener, 227)
+        with pytest.raises(BrokenPipeError):
+            listener.close()
+    finally:
+        os.close(rfd)
+
+    assert len(events) == 227
+    assert isinstance(events[-1], types.Exit)
+
+
+def test_drain_takes_a_whole_read(multiline_events: bytes):
+    with listening() as (listener, wfd):
+        os.write(wfd, multiline_events)
+        # let the listener publish everything
+        time.sleep(0.1)
+
+        notis, replies = listener.drain(timeout=5)
+        assert len(notis) == 6
+        assert len(replies) == 2
+
+        assert listener.drain(timeout=0.01) == ([], [])
+
+
+def test_reply_backpressure(multiline_events: bytes):
+    rfd, wfd = os.pipe()
+    listener = Listener.from_args(rfd, 1, 100)
+
+    try:
+        listener.listen_in_background()
+        for _ in range(10):
+            os.write(wfd, multiline_events)
+
+        events = collect(listener, 80)
+    finally:
+        listener.close()
+        os.close(wfd)
+        os.close(rfd)
+
+    assert len([e for e in events if isinstance(e, types.Reply)]) == 20
+
+
+def test_close_idle_listener():
+    with listening() as (listener, _):
+        # let the thread block in poll, which has no timeout
+        time.sleep(0.05)
+
+        closing = threading.Thread(target=listener.close, daemon=True)
+        closing.start()
+        closing.join(5)
+        assert not closing.is_alive()
+
+        # the closed waker is not written anymore, its fd may be reused
+        assert listener._waker is None
+        listener.wake()
+
+
+def test_close_with_full_replyq():
+    rfd, wfd = os.pipe()
+    listener = Listener.from_args(rfd, 1, 10)
+
+    try:
+        listener.listen_in_background()
+        os.write(wfd, b"".join(reply(i) for i in range(3)))
+        deadline = time.monotonic() + 5
+        while not listener.replyq and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(listener.replyq) == 1
+
+        # the listener thread waits for room for the second reply
+        closing = threading.Thread(target=listener.close, daemon=True)
+        closing.start()
+        closing.join(5)
+        assert not closing.is_alive()
+    finally:
+        os.close(wfd)
+        os.close(rfd)
+
+
+def test_waker():
+    waker = Waker()
+    try:
+        waker.wake()
+        waker.wake()
+        waker.drain()
+
+        with contextlib.suppress(BlockingIOError):
+            os.read(waker.fileno(), 8)
+            raise AssertionError("should have been drained")
+    finally:
+        waker.close()
+
+
+def test_waker_counts_wakes():
+    waker = Waker()
+    try:
+        waker.wake()
+        waker.wake()
+        if hasattr(os, "eventfd"):
+            assert os.eventfd_read(waker.fileno()) == 2
+    finally:
+        waker.close()
+
+
+@pytest.mark.parametrize("term", [None, threading.Event()])
+def test_term_stops_idle_listener(term):
+    rfd, wfd = os.pipe()
+    listener = Listener.from_args(rfd, 10, 100)
+    if term is not None:
+        listener.term = term
+
+    try:
+        listener.listen_in_background()
+        time.sleep(0.05)
+
+        listener.term.set()
+        # a Term wakes the thread blocking without a timeout, a plain Event is
+        # looked at now and then
+        listener._thread.join(5)
+        assert not listener._thread.is_alive()
+    finally:
+        listener.close()
+        os.close(wfd)
+        os.close(rfd)
+
+
+def test_adaptive_bufsize():
+    bufsize = AdaptiveBufsize(4096, 16384)
+
+    bufsize.update(4096)
+    assert bufsize.size == 8192
+    bufsize.update(8192)
+    bufsize.update(16384)
+    assert bufsize.size == 16384
+
+    bufsize.update(5000)
+    assert bufsize.size == 16384
+    bufsize.update(100)
+    bufsize.update(100)
+    bufsize.update(100)
+    assert bufsize.size == 4096
+
+
+def test_drain(multiline_events_list_keys: bytes):
+    rfd, wfd = os.pipe()
+    os.set_blocking(rfd, False)
+
+    sr = reader.StreamReader()
+    bufsize = AdaptiveBufsize()
+    stats = ReadStats()
+
+    try:
+        # within the pipe capacity, so the write does not block
+        data = multiline_events_list_keys * 2
+        os.write(wfd, data)
+
+        events = list(drain(rfd, sr, bufsize, stats))
+        assert len(events) == 6
+        assert sr.clean
+        assert stats.nbytes == len(data)
+        # 4K, 8K, 16K and the 29K left, which is a short read
+        assert stats.reads == 4
+        assert bufsize.size > 4096
+
+        # nothing to read
+        assert not list(drain(rfd, sr, bufsize, stats))
+        assert stats.reads == 5
+
+        os.close(wfd)
+        wfd = -1
+        with pytest.raises(BrokenPipeError):
+            list(drain(rfd, sr, bufsize, stats))
+    finally:
+        os.close(rfd)
+        if wfd >= 0:
+            os.close(wfd)
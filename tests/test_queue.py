@@ -1,7 +1,11 @@
+import threading
 from collections import deque
 from queue import Empty, Full, Queue
 
 import pytest
+from pytmux import types
+from pytmux.sync.listener import NotiQ, Overflow, ReplyQ
+from pytmux.sync.ring import RingQueue
 
 
 def test_fifo():
@@ -36,3 +40,181 @@ def test_deque():
 
     with pytest.raises(IndexError):
         dq.popleft()
+
+
+def output(pane: int, value: bytes = b"x") -> types.Output:
+    return types.Output(pane, value)
+
+
+def test_notiq_keeps_control_events():
+    q = NotiQ(3)
+
+    q.put(output(1))
+    q.put(types.SessionsChanged())
+    q.put(output(2))
+    q.put(types.Exit())
+    q.put(types.WindowClose(3))
+
+    assert q.drain() == [types.SessionsChanged(), types.Exit(), types.WindowClose(3)]
+    assert q.drops.by_type == {types.Output: 2}
+    assert q.drops.by_pane == {1: 1, 2: 1}
+
+    # nothing droppable, the queue grows
+    for _ in range(5):
+        q.put(types.SessionsChanged())
+    assert len(q) == 5
+
+
+def test_notiq_coalesces_outputs():
+    q = NotiQ(2)
+
+    q.put(output(1, b"a"))
+    q.put(output(2, b"b"))
+    q.put(output(1, b"c"))
+    q.put(output(2, b"d"))
+
+    assert q.drain() == [output(1, b"ac"), output(2, b"bd")]
+    assert q.drops.coalesced == 2
+    assert q.drops.total == 0
+
+    # never merged across a control event, the oldest output goes instead
+    q.put(output(1, b"a"))
+    q.put(types.Pause(1))
+    q.put(output(1, b"b"))
+
+    assert q.drain() == [types.Pause(1), output(1, b"b")]
+    assert q.drops.by_pane == {1: 1}
+
+
+def test_notiq_bounds_merged_outputs():
+    q = NotiQ(2)
+    chunk = b"x" * 4096
+
+    for _ in range(1000):
+        q.put(output(1, chunk))
+        q.put(output(2, chunk))
+
+    # merged up to the limit, then the oldest output went
+    outputs = q.drain()
+    assert len(outputs) == 2
+    assert all(0 < len(o.value) <= 64 << 10 for o in outputs)
+    kept = sum(len(o.value) for o in outputs) // len(chunk)
+    assert kept + q.drops.total == 2000
+    assert q.drops.total > 0
+
+
+def test_notiq_evicts_in_order():
+    q = NotiQ(3)
+
+    for i in range(100):
+        q.put(types.WindowAdd(i))
+        q.put(output(i))
+    # every window-add made the output before it go
+    assert len(q) == 100
+    assert q.drain() == [types.WindowAdd(i) for i in range(100)]
+    assert q.drops.by_type == {types.Output: 100}
+
+    q.put(output(1, b"a"))
+    q.put(output(1, b"b"))
+    q.put(output(2, b"c"))
+    q.put(output(1, b"d"))
+    q.put(output(3, b"e"))
+    # d merged into b, then e made a go
+    assert len(q) == 3
+    assert q.get() == output(1, b"bd")
+    assert q.get() == output(2, b"c")
+    assert q.drain() == [output(3, b"e")]
+
+
+def test_notiq_policies():
+    q = NotiQ(
+        2,
+        {
+            types.Output: Overflow.DROP_NEWEST,
+            types.WindowAdd: Overflow.DROP_OLDEST,
+        },
+    )
+
+    q.put(types.WindowAdd(1))
+    q.put(output(1))
+    q.put(output(2))
+    assert q.drain() == [types.WindowAdd(1), output(1)]
+
+    q.put(types.WindowAdd(1))
+    q.put(types.WindowAdd(2))
+    q.put(types.WindowAdd(3))
+    assert q.drain() == [types.WindowAdd(2), types.WindowAdd(3)]
+
+    assert q.drops.by_type == {types.Output: 1, types.WindowAdd: 1}
+
+
+def test_ring_fifo():
+    q = RingQueue(3)
+
+    q.put_nowait(1)
+    q.put_nowait(2)
+    q.put_nowait(3)
+
+    with pytest.raises(Full):
+        q.put_nowait(4)
+    with pytest.raises(Full):
+        q.put(4, timeout=0.01)
+
+    assert q.get() == 1
+    q.put_nowait(4)
+    assert len(q) == 3
+    # wraps around the end of the ring
+    assert q.drain() == [2, 3, 4]
+
+    with pytest.raises(Empty):
+        q.get_nowait()
+    with pytest.raises(Empty):
+        q.get(timeout=0.01)
+    assert q.get_many(timeout=0.01) == []
+
+
+def test_ring_batches():
+    q = RingQueue(4)
+
+    for i in range(3):
+        q.put(i)
+    assert q.get_many(limit=2) == [0, 1]
+
+    for i in range(3, 6):
+        q.put(i)
+    assert q.get_many() == [2, 3, 4, 5]
+    assert q._buf == [None] * 4
+
+
+def test_ring_threads():
+    q = RingQueue(16)
+    count = 100_000
+
+    def produce():
+        for i in range(count):
+            q.put(i)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+
+    received: list = []
+    while len(received) < count:
+        batch = q.get_many(timeout=5)
+        assert batch, "timed out"
+        received.extend(batch)
+    producer.join()
+
+    assert received == list(range(count))
+
+
+def test_replyq_single_consumer():
+    q = ReplyQ(2, single_consumer=True)
+
+    q.put(1)
+    q.put_nowait(2)
+    with pytest.raises(Full):
+        q.put_nowait(3)
+
+    assert len(q) == 2
+    assert q.get() == 1
+    assert q.drain() == [2]
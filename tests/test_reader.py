@@ -1,3 +1,5 @@
+import os
+
 import pytest
 from pytmux import reader, types
 
@@ -87,3 +89,145 @@ def test_eventreader(multiline_events: bytes):
         lines.append(line)
 
     assert b"".join(lines) == data  # type: ignore
+
+
+def test_buffered_reader_same_events_as_stream_reader(
+    multiline_events: bytes, multiline_events_list_keys: bytes
+):
+    data = multiline_events_list_keys + multiline_events
+
+    expected = list(reader.StreamReader().feed(data))
+
+    for chunk_size in (1, 7, 64, 4096):
+        # smaller than a line, forces both compaction and growth
+        sr = reader.BufferedStreamReader(bufsize=32)
+        events = []
+        for i in range(0, len(data), chunk_size):
+            events.extend(sr.feed(data[i : i + chunk_size]))
+        assert sr.clean
+        assert events == expected
+
+
+def test_buffered_reader_copies_lines_once(multiline_events: bytes):
+    class EventReader(reader.EventReaderABC):
+        def __init__(self):
+            self.lines = []
+
+        def feed(self, line):
+            # kept as is by the events, no view of the reused buffer
+            assert type(line) is bytes
+            self.lines.append(line)
+            yield from ()
+
+        @property
+        def clean(self):
+            return True
+
+    er = EventReader()
+    sr = reader.BufferedStreamReader(er, bufsize=128)
+
+    for i in range(0, len(multiline_events), 100):
+        for _ in sr.feed(multiline_events[i : i + 100]):
+            pass
+
+    assert sr.clean
+    assert b"".join(er.lines) == multiline_events
+
+
+def test_buffered_reader_readv(multiline_events: bytes):
+    rfd, wfd = os.pipe()
+    os.write(wfd, multiline_events)
+    os.close(wfd)
+
+    sr = reader.BufferedStreamReader(bufsize=256)
+    events = []
+
+    try:
+        while True:
+            readn = os.readv(rfd, [sr.get_buffer(100)])
+            if readn == 0:
+                break
+            sr.buffer_updated(readn)
+            events.extend(sr.events())
+    finally:
+        os.close(rfd)
+
+    assert sr.clean
+    assert events == list(reader.StreamReader().feed(multiline_events))
+
+
+def test_split_lines():
+    assert reader.split_lines(b"a b\n\nc\n") == [b"a b\n", b"\n", b"c\n"]
+    # a bare \r is not a line boundary of the protocol
+    assert reader.split_lines(b"a\rb\nc\r\n") == [b"a\rb\n", b"c\r\n"]
+
+
+def test_streamreader_any_chunking(multiline_events_list_keys: bytes):
+    data = multiline_events_list_keys
+    expected = list(reader.StreamReader().feed(data))
+
+    for chunk_size in (1, 3, 100, 4096):
+        sr = reader.StreamReader()
+        events = []
+        for i in range(0, len(data), chunk_size):
+            events.extend(sr.feed(data[i : i + chunk_size]))
+        assert sr.clean
+        assert events == expected
+
+
+def test_eventreader_protocol_errors():
+    with pytest.raises(reader.ProtocolError):
+        list(reader.EventReader().feed(b"%end 1622538780 64363 1\n"))
+
+    with pytest.raises(reader.ProtocolError):
+        list(reader.EventReader().feed(b"%no-such-event\n"))
+
+    with pytest.raises(reader.ProtocolError):
+        list(reader.EventReader().feed(b"not a head wrap\n"))
+
+
+def test_stream_reply_chunks(multiline_events_list_keys: bytes):
+    expected = [
+        e
+        for e in reader.StreamReader().feed(multiline_events_list_keys)
+        if isinstance(e, types.Reply)
+    ]
+
+    er = reader.EventReader(chunk_lines=50)
+    sr = reader.StreamReader(er)
+
+    chunks = []
+    for event in sr.feed(multiline_events_list_keys):
+        if isinstance(event, types.ReplyChunk):
+            assert len(event.body) <= 50
+            chunks.append(event)
+    assert sr.clean
+
+    replies = []
+    body: list = []
+    for chunk in chunks:
+        body.extend(chunk.body)
+        if chunk.last:
+            replies.append(types.Reply(chunk.head_wrap, body, chunk.end_wrap))
+            body = []
+
+    assert replies == expected
+    assert all(chunk.number == expected[0].head_wrap.number for chunk in chunks)
+    assert len(chunks) > len(expected)
+
+
+def test_reply_router(multiline_events: bytes):
+    received: dict = {}
+    unclaimed = []
+
+    router = reader.ReplyRouter(default=unclaimed.append)
+    router.register(64363, lambda chunk: received.setdefault(64363, []).append(chunk))
+
+    sr = reader.StreamReader(reader.EventReader(chunk_lines=2))
+    for event in sr.feed(multiline_events):
+        if isinstance(event, types.ReplyChunk):
+            assert router.feed(event)
+
+    assert [len(c.body) for c in received[64363]] == [2, 2, 0]
+    assert received[64363][-1].success
+    assert [c.number for c in unclaimed] == [70394]
@@ -0,0 +1,104 @@
+import os
+import time
+
+import pytest
+from pytmux import reader
+from pytmux.recording import Recorder, Replayer, index_path
+from pytmux.sync.listener import AdaptiveBufsize, ReadStats, drain
+
+
+def events_of(data: bytes) -> list:
+    return list(reader.StreamReader().feed(data))
+
+
+def test_replay(tmp_path, multiline_events: bytes):
+    path = str(tmp_path.joinpath("rec"))
+    chunks = [
+        multiline_events[i : i + 100] for i in range(0, len(multiline_events), 100)
+    ]
+
+    with Recorder(path, index_every=256) as recorder:
+        for chunk in chunks:
+            recorder.record(chunk)
+        recorder.record(b"")
+
+    with Replayer(path) as replayer:
+        recorded = list(replayer.chunks())
+        assert [chunk for _, chunk in recorded] == chunks
+        timestamps = [timestamp for timestamp, _ in recorded]
+        assert timestamps == sorted(timestamps)
+        assert replayer.duration == timestamps[-1]
+        assert abs(replayer.started - time.time_ns()) < 60e9
+
+        assert list(replayer.replay()) == events_of(multiline_events)
+
+        # found by the index
+        assert len(replayer._offsets) > 2
+        later = recorded[len(recorded) // 2][0]
+        assert [t for t, _ in replayer.chunks(later)] == [
+            t for t in timestamps if t >= later
+        ]
+
+
+def test_replay_pace(tmp_path):
+    path = str(tmp_path.joinpath("rec"))
+    lines = [b"%%window-add @%d\n" % i for i in range(3)]
+
+    with Recorder(path) as recorder:
+        for line in lines:
+            recorder.record(line)
+            time.sleep(0.05)
+
+    with Replayer(path) as replayer:
+        started = time.monotonic()
+        assert list(replayer.replay(speed=1)) == events_of(b"".join(lines))
+        assert time.monotonic() - started >= 0.09
+
+        started = time.monotonic()
+        list(replayer.replay(speed=10))
+        assert time.monotonic() - started < 0.09
+
+
+def test_cut_off(tmp_path):
+    path = str(tmp_path.joinpath("rec"))
+    with Recorder(path) as recorder:
+        recorder.record(b"%window-add @1\n")
+        recorder.record(b"%window-add @2\n")
+
+    # crashed in the middle of the last record, the index is gone
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 3)
+    os.unlink(index_path(path))
+
+    with Replayer(path) as replayer:
+        assert [chunk for _, chunk in replayer.chunks()] == [b"%window-add @1\n"]
+
+    with open(path, "wb") as file:
+        file.write(b"%window-add @1\n")
+    with pytest.raises(ValueError):
+        Replayer(path)
+
+
+def test_record_drain(tmp_path, multiline_events: bytes):
+    path = str(tmp_path.joinpath("rec"))
+    rfd, wfd = os.pipe()
+    os.set_blocking(rfd, False)
+
+    try:
+        os.write(wfd, multiline_events)
+        with Recorder(path) as recorder:
+            events = list(
+                drain(
+                    rfd,
+                    reader.StreamReader(),
+                    AdaptiveBufsize(),
+                    ReadStats(),
+                    recorder,
+                )
+            )
+    finally:
+        os.close(wfd)
+        os.close(rfd)
+
+    with Replayer(path) as replayer:
+        assert list(replayer.replay()) == events
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+from pytmux import reader
+from pytmux.scrollback import Scrollback
+
+
+def test_ring_and_spill(tmp_path):
+    with Scrollback(8, 64, 32, str(tmp_path)) as scrollback:
+        written = b""
+        for i in range(20):
+            chunk = b"%d," % i
+            scrollback.write(1, chunk)
+            written += chunk
+
+        start, end = scrollback.bounds(1)
+        assert end == len(written)
+        # the oldest bytes are dropped
+        assert end - start == 8 + 32
+        assert scrollback.read(1, start, end) == written[start:]
+        assert scrollback.read(1, start + 3, 10) == written[start + 3 : start + 13]
+        assert scrollback.tail(1, 5) == written[-5:]
+        assert scrollback.tail(1, 1000) == written[start:]
+        assert scrollback.read(1, 0, start) == b""
+
+        # larger than the ring
+        big = bytes(range(65, 65 + 26))
+        scrollback.write(1, big)
+        assert scrollback.tail(1, 26) == big
+
+        with pytest.raises(KeyError):
+            scrollback.tail(2, 1)
+
+
+def test_an_fd_per_pane(tmp_path):
+    fds = len(os.listdir("/proc/self/fd"))
+
+    with Scrollback(1024, 8 << 10, 1 << 20, str(tmp_path)) as scrollback:
+        for _ in range(64):
+            for pane in range(8):
+                scrollback.write(pane, b"x" * (64 << 10))
+        assert scrollback.bounds(0) == ((3 << 20) - 1024, 4 << 20)
+        assert len(os.listdir("/proc/self/fd")) <= fds + 8
+
+    assert len(os.listdir("/proc/self/fd")) == fds
+
+
+def test_memory_cap(tmp_path):
+    with Scrollback(8, 16, 32, str(tmp_path)) as scrollback:
+        for pane in range(4):
+            scrollback.write(pane, b"pane %d" % pane)
+        assert scrollback.resident == 16
+
+        # idle ones spilled their rings
+        for pane in range(4):
+            assert scrollback.tail(pane, 100) == b"pane %d" % pane
+
+        scrollback.write(0, b"!")
+        assert scrollback.tail(0, 100) == b"pane 0!"
+
+    without_spill = Scrollback(8, 8, max_spill=0)
+    without_spill.write(1, b"0123456789")
+    without_spill.write(2, b"x")
+    assert without_spill.bounds(1) == (10, 10)
+    assert without_spill.tail(1, 4) == b""
+    assert without_spill.tail(2, 4) == b"x"
+
+
+def test_feed():
+    scrollback = Scrollback(max_spill=0)
+    lines = (
+        b"%output %3 a\\015\\012\n"
+        b"%extended-output %3 12 : b\n"
+        b"%output %4 c\n"
+        b"%window-add @1\n"
+    )
+    for lazy in (False, True):
+        scrollback.feed(reader.StreamReader(reader.EventReader(lazy)).feed(lines))
+    assert scrollback.tail(3, 100) == b"a\r\nba\r\nb"
+    assert scrollback.tail(4, 100) == b"cc"
+    assert sorted(scrollback.panes) == [3, 4]
+
+    scrollback.drop(3)
+    assert 3 not in scrollback
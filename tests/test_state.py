@@ -0,0 +1,116 @@
+from pytmux import reader, types
+from pytmux.layout import checksum
+from pytmux.state import State
+
+
+def layout(cells: bytes) -> bytes:
+    return b"%04x,%s" % (checksum(cells), cells)
+
+
+def reply(*rows: bytes, success: bool = True) -> types.Reply:
+    end = b"%end" if success else b"%error"
+    data = b"%begin 1 10 1\n" + b"".join(rows) + end + b" 1 10 1\n"
+    [event] = reader.StreamReader().feed(data)
+    return event
+
+
+def noti(line: bytes) -> types.Notification:
+    [event] = reader.StreamReader().feed(line)
+    return event
+
+
+SPLIT = layout(b"80x24,0,0{40x24,0,0,2,39x24,41,0,3}")
+
+SEED = reply(
+    b"$1 @1 %1 1 1 " + layout(b"80x24,0,0,1") + b" main:vim\n",
+    b"$1 @2 %2 0 0 " + SPLIT + b" main:a b: c\n",
+    b"$1 @2 %3 0 1 " + SPLIT + b" main:a b: c\n",
+    b"$2 @3 %4 1 1 " + layout(b"80x24,0,0,4") + b" my work:sh\n",
+)
+
+
+def seeded() -> State:
+    state = State()
+    [command] = state.seed()
+    assert command.startswith("list-panes -a -F ")
+    state.load(SEED)
+    assert not state.syncing
+    return state
+
+
+def test_seed():
+    state = seeded()
+
+    assert state.sessions[1].windows == {1, 2}
+    assert state.sessions[1].active_window == 1
+    assert state.sessions[2].name == "my work"
+    assert state.windows[2].name == "a b: c"
+    assert state.windows[2].panes == {2, 3}
+    assert state.windows[2].active_pane == 3
+    assert state.panes[4].window == 3
+
+
+def test_incremental():
+    state = seeded()
+    stacked = layout(b"80x24,0,0[80x12,0,0,1,80x11,0,13,5]")
+
+    lines = [
+        b"%session-changed $1 main\n",
+        b"%window-renamed @1 editor\n",
+        b"%session-renamed $2 play\n",
+        b"%session-window-changed $1 @2\n",
+        b"%window-pane-changed @2 %2\n",
+        b"%%layout-change @1 %s %s *\n" % (stacked, stacked),
+        b"%window-close @3\n",
+        b"%output %1 hello\n",
+    ]
+    for line in lines:
+        assert state.apply(noti(line)) == []
+
+    assert state.attached == 1
+    assert state.windows[1].name == "editor"
+    assert state.sessions[2].name == "play"
+    assert state.sessions[2].windows == set()
+    assert state.sessions[2].active_window is None
+    assert state.sessions[1].active_window == 2
+    assert state.windows[2].active_pane == 2
+    assert state.windows[1].panes == {1, 5}
+    assert state.panes[5].window == 1
+    assert 3 not in state.windows
+    assert 4 not in state.panes
+
+    renamed = types.lazy(types.WindowRenamed, b"%window-renamed @2 lazy\n")
+    assert state.apply(renamed) == []
+    assert state.windows[2].name == "lazy"
+
+
+def test_unknown_window_is_queried():
+    state = seeded()
+    state.apply(noti(b"%session-changed $1 main\n"))
+
+    [command] = state.apply(noti(b"%window-add @9\n"))
+    assert command.startswith("list-panes -t '@9' -F ")
+    assert state.syncing
+    assert state.sessions[1].windows == {1, 2, 9}
+
+    state.load(reply(b"$1 @9 %12 1 1 " + layout(b"80x24,0,0,12") + b" main:new\n"))
+    assert state.windows[9].name == "new"
+    assert state.windows[9].panes == {12}
+    assert state.sessions[1].active_window == 9
+
+    # closed before the query ran
+    state.apply(noti(b"%unlinked-window-add @10\n"))
+    state.load(reply(success=False))
+    assert 10 not in state.windows
+
+
+def test_sessions_changed_resyncs():
+    state = seeded()
+
+    [command] = state.apply(noti(b"%sessions-changed\n"))
+    assert command.startswith("list-panes -a ")
+
+    state.load(reply(b"$3 @4 %6 1 1 " + layout(b"80x24,0,0,6") + b" other:sh\n"))
+    assert list(state.sessions) == [3]
+    assert list(state.windows) == [4]
+    assert list(state.panes) == [6]
@@ -0,0 +1,114 @@
+import pytest
+from pytmux import reader, types
+from pytmux.subscriptions import Subscription, Subscriptions
+
+FEED = b"".join(
+    [
+        b"%output %1 a\n",
+        b"%output %2 b\n",
+        b"%window-add @3\n",
+        b"%begin 1622538780 64363 1\n0: 1 windows\n%end 1622538780 64363 1\n",
+        b"%window-pane-changed @4 %2\n",
+        b"%session-changed $5 main\n",
+        b"%extended-output %2 10 : c\n",
+        b"%sessions-changed\n",
+    ]
+)
+
+
+def read(subs: Subscriptions, **kwargs) -> list:
+    er = reader.EventReader(subscriptions=subs, **kwargs)
+    return list(reader.BufferedStreamReader(er).feed(FEED))
+
+
+def test_nothing_subscribed():
+    events = read(Subscriptions())
+    # replies are for commands, never filtered
+    assert [type(e) for e in events] == [types.Reply]
+
+
+def test_by_class_and_id():
+    subs = Subscriptions()
+    subs.subscribe(types.SessionsChanged)
+    subs.subscribe(types.Output, pane=2)
+    subs.subscribe(types.ExtendedOutput, pane=2)
+    subs.subscribe(types.WindowPaneChanged, window=4)
+    subs.subscribe(types.SessionChanged, session=6)
+
+    events = read(subs)
+    assert [type(e) for e in events] == [
+        types.Output,
+        types.Reply,
+        types.WindowPaneChanged,
+        types.ExtendedOutput,
+        types.SessionsChanged,
+    ]
+    assert events[0].pane == 2
+    assert all(subs.matches(e) for e in events if isinstance(e, types.Notification))
+
+    assert len(read(subs, lazy=True)) == len(events)
+
+
+def test_base_class_and_unsubscribe():
+    subs = Subscriptions()
+    everything = subs.subscribe(types.Notification)
+    panes = subs.subscribe(types.Notification, pane=1)
+    assert Subscription(types.Output, "pane", 1) in panes
+    assert all(sub.cls is not types.WindowAdd for sub in panes)
+
+    assert len(read(subs)) == 8
+
+    subs.unsubscribe(everything)
+    assert [type(e) for e in read(subs)] == [types.Output, types.Reply]
+
+    # counted, the second subscriber keeps it
+    again = subs.subscribe(types.Output, pane=1)
+    subs.unsubscribe(panes)
+    assert [type(e) for e in read(subs)] == [types.Output, types.Reply]
+    subs.unsubscribe(again)
+    assert len(subs) == 0
+
+
+def test_invalid_subscriptions():
+    subs = Subscriptions()
+
+    with pytest.raises(ValueError):
+        subs.subscribe(types.Output, pane=1, window=2)
+    with pytest.raises(ValueError):
+        subs.subscribe(types.WindowAdd, pane=1)
+    with pytest.raises(ValueError):
+        subs.subscribe(types.Reply)
+
+
+def test_many_subscriptions_are_indexed():
+    subs = Subscriptions()
+    for pane in range(10_000):
+        subs.subscribe(types.Output, pane=pane)
+
+    fields = subs._index[types.Output]
+    assert len(fields) == 1
+    assert subs.wants(types.Output, b"%output %9999 x\n")
+    assert not subs.wants(types.Output, b"%output %10000 x\n")
+
+
+def test_always_and_held():
+    subs = Subscriptions()
+    assert subs.wants(types.Exit, b"%exit\n")
+    assert subs.wants(types.Pause, b"%pause %1\n")
+    assert not subs.wants(types.Output, b"%output %1 a\n")
+
+    subs.hold(types.Output)
+    subs.hold(types.Output)
+    output = types.Output(1, b"a")
+    assert subs.wants(types.Output, b"%output %1 a\n")
+    assert not subs.matches(output)
+
+    subs.subscribe(types.Output, pane=1)
+    assert subs.matches(output)
+    assert not subs.matches(types.Output(2, b"b"))
+
+    subs.release(types.Output)
+    assert subs.wants(types.Output, b"%output %2 b\n")
+    subs.release(types.Output)
+    assert not subs.wants(types.Output, b"%output %2 b\n")
+    assert subs.wants(types.Output, b"%output %1 a\n")
@@ -1,3 +1,7 @@
+import tracemalloc
+
+import attr
+import pytest
 from pytmux import reader, types
 
 
@@ -15,6 +19,7 @@ def test_noti_from_bytes():
         b"%exit\n",
         b"%window-add @35\n",
         b"%layout-change @59 3369,232x48,0,0,119 3369,232x48,0,0,119 *\n",
+        b"%extended-output %78 20 : a : b\n",
     ]
 
     headers = {noti.header: noti for noti in types.ALL_NOTI}
@@ -43,3 +48,343 @@ scratchpad: 2 windows (created Mon May 31 17:40:20 2021) (attached)
     assert reply.end_wrap.header == b"%end"
     assert reply.body[0].startswith(b"26")
     assert reply.body[-1].endswith(b"attached)\n")
+    assert isinstance(reply.body, list)
+
+    compact = types.Reply.from_bytes(data, compact=True)
+    assert isinstance(compact.body, types.CompactLines)
+    assert compact == reply
+
+
+def test_lazy_notification():
+    feed = [
+        b"%window-pane-changed @3 %68\n",
+        b"%unlinked-window-add @32\n",
+        b"%client-session-changed /dev/pts/9 $24 24\n",
+        b"%session-renamed $3 a new name\n",
+        b"%sessions-changed\n",
+        b"%exit\n",
+        b"%exit server exited\n",
+        b"%output %78 \\033[1m \\015\n",
+        b"%extended-output %78 120 : \\033[1m \\015\n",
+        b"%layout-change @59 3369,232x48,0,0,119 3369,232x48,0,0,119 *\n",
+    ]
+
+    headers = {noti.header: noti for noti in types.ALL_NOTI}
+
+    for line in feed:
+        cls = headers[reader.header_in_line(line)]
+        eager = cls.from_bytes(line)
+        lazy = types.lazy(cls, line)
+
+        assert isinstance(lazy, cls)
+        assert isinstance(lazy, types.Notification)
+        assert isinstance(lazy, types.LazyNotification)
+        assert type(lazy) is lazy.__class__
+        assert lazy.event_class is cls
+        assert lazy.header == cls.header
+        for field in attr.fields(cls):
+            assert getattr(lazy, field.name) == getattr(eager, field.name)
+        assert lazy.decode() == eager
+
+
+def test_lazy_notification_decodes_once():
+    lazy = types.lazy(types.Output, b"%output %78 abc\n")
+
+    assert lazy.pane == 78
+    assert lazy._decoded == 0b01
+    assert lazy.value is lazy.value
+    assert lazy._decoded == 0b11
+
+    with pytest.raises(AttributeError):
+        lazy.window  # pylint: disable=pointless-statement
+    with pytest.raises(attr.exceptions.FrozenInstanceError):
+        lazy.pane = 1  # type: ignore
+
+    missing = types.lazy(types.WindowPaneChanged, b"%window-pane-changed @3\n")
+    assert missing.window == 3
+    with pytest.raises(ValueError):
+        missing.pane  # pylint: disable=pointless-statement
+
+
+def test_lazy_event_reader(multiline_events: bytes):
+    eager = list(reader.StreamReader().feed(multiline_events))
+    lazy = list(
+        reader.StreamReader(reader.EventReader(lazy=True)).feed(multiline_events)
+    )
+
+    assert len(lazy) == len(eager)
+    for le, ee in zip(lazy, eager):
+        if isinstance(ee, types.Notification):
+            assert isinstance(le, types.LazyNotification)
+            assert le.decode() == ee
+        else:
+            assert le == ee
+
+
+def test_dispatch_classify():
+    classify = types.DISPATCH.classify
+
+    assert classify(b"%begin 1622538780 64363 1\n") == (
+        types.LineKind.BEGIN,
+        types.Reply,
+    )
+    assert classify(b"%end 1622538780 64363 1\n")[0] is types.LineKind.END
+    assert classify(b"%error 1622538780 64363 1\n")[0] is types.LineKind.END
+    assert classify(b"%sessions-changed\n") == (
+        types.LineKind.NOTIFICATION,
+        types.SessionsChanged,
+    )
+
+    line = b"%output %78 abc\n"
+    expected = (types.LineKind.NOTIFICATION, types.Output)
+    assert classify(line) == expected
+    assert classify(bytearray(line)) == expected
+    assert classify(memoryview(bytearray(line))) == expected
+
+    # body lines
+    assert classify(b"bind-key -T copy-mode C-a send-keys\n") is None
+    assert classify(b"%endless\n") is None
+    assert classify(b"%" + b"x" * 100 + b"\n") is None
+
+
+def _escape(raw: bytes) -> bytes:
+    return b"".join(
+        b"\\%03o" % byte if byte < 0x20 or byte == 0x5C else bytes([byte])
+        for byte in raw
+    )
+
+
+def test_extended_output():
+    noti = types.ExtendedOutput.from_bytes(b"%extended-output %7 1500 : a : b\\015\n")
+    assert (noti.pane, noti.age, noti.value) == (7, 1500, b"a : b\\015")
+    assert noti.decoded == b"a : b\r"
+
+    # arguments up to the single ':' are for future use
+    noti = types.ExtendedOutput.from_bytes(b"%extended-output %7 0 x y : \n")
+    assert (noti.pane, noti.age, noti.value) == (7, 0, b"")
+
+    with pytest.raises(ValueError):
+        types.ExtendedOutput.from_bytes(b"%extended-output %7 0\n")
+
+
+def test_subscription_changed():
+    noti = types.SubscriptionChanged.from_bytes(
+        b"%subscription-changed cwd $1 @2 0 %3 x : /home/a : b\n"
+    )
+    assert (noti.name, noti.session, noti.window, noti.window_idx, noti.pane) == (
+        "cwd",
+        1,
+        2,
+        0,
+        3,
+    )
+    assert noti.value == b"/home/a : b"
+
+    # a session subscription
+    noti = types.SubscriptionChanged.from_bytes(
+        b"%subscription-changed name $1 - - - : \n"
+    )
+    assert (noti.window, noti.window_idx, noti.pane, noti.value) == (
+        None,
+        None,
+        None,
+        b"",
+    )
+
+
+def test_unescape():
+    raw = bytes(range(256)) * 3 + b"\\015 \\\\ plain text \xe4\xbd\xa0\xe5\xa5\xbd"
+
+    assert types.unescape(_escape(raw)) == raw
+    assert types.unescape(b"no escapes") == b"no escapes"
+    assert types.unescape(b"\\033[1m\\015") == b"\x1b[1m\r"
+
+    output = types.Output.from_bytes(b"%output %78 \\033[1m\\134\\015\n")
+    assert output.decoded == b"\x1b[1m\\\r"
+
+
+def test_output_decoder():
+    raw = bytes(range(256)) * 3
+    escaped = _escape(raw)
+
+    for step in (1, 2, 3, 4, 5, 64):
+        decoder = types.OutputDecoder()
+        decoded = b"".join(
+            decoder.feed(escaped[i : i + step]) for i in range(0, len(escaped), step)
+        )
+        assert decoder.clean
+        assert decoded == raw
+
+
+def test_compact_lines():
+    lines = [b"a b\n", b"\n", b"ccc\n", b"dd\n"]
+    compact = types.CompactLines.from_bytes(b"".join(lines))
+
+    assert len(compact) == 4
+    assert list(compact) == lines
+    assert compact == lines
+    assert compact[0] == b"a b\n"
+    assert compact[-1] == b"dd\n"
+    assert compact[1:3] == lines[1:3]
+    assert compact[1:3][1] == b"ccc\n"
+    assert compact[3:1] == []
+    assert compact[::2] == lines[::2]
+    assert compact.nbytes == len(b"".join(lines))
+    assert b"ccc\n" in compact
+
+    with pytest.raises(IndexError):
+        compact[4]  # pylint: disable=pointless-statement
+
+    assert types.CompactLines.from_bytes(b"") == []
+    assert types.CompactLines.from_bytes(b"\n\n") == [b"\n", b"\n"]
+
+
+def test_compact_reply_memory(multiline_events_list_keys: bytes):
+    def measure(compact: bool):
+        sr = reader.StreamReader(reader.EventReader(compact=compact))
+        data = bytes(multiline_events_list_keys)
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            events = list(sr.feed(data))
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        replies = [e for e in events if isinstance(e, types.Reply)]
+        return after - before, replies
+
+    listed_size, listed = measure(False)
+    compact_size, compact = measure(True)
+
+    assert [r.body for r in compact] == [r.body for r in listed]
+    assert all(isinstance(r.body, types.CompactLines) for r in compact)
+
+    payload = sum(r.body.nbytes for r in compact)
+    # every line as its own bytes object costs 33 bytes plus a list slot
+    assert compact_size < listed_size
+    assert compact_size - payload < (listed_size - payload) / 2
+
+
+SAMPLE_LINES = {
+    types.PaneModeChanged: b"%pane-mode-changed %312\n",
+    types.WindowPaneChanged: b"%window-pane-changed @313 %468\n",
+    types.WindowClose: b"%window-close @332\n",
+    types.UnlinkedWindowClose: b"%unlinked-window-close @332\n",
+    types.WindowAdd: b"%window-add @335\n",
+    types.UnlinkedWindowAdd: b"%unlinked-window-add @332\n",
+    types.WindowRenamed: b"%window-renamed @335 zsh\n",
+    types.UnlinkedWindowRenamed: b"%unlinked-window-renamed @335 zsh\n",
+    types.SessionChanged: b"%session-changed $327 main\n",
+    types.ClientSessionChanged: b"%client-session-changed /dev/pts/9 $324 main\n",
+    types.SessionRenamed: b"%session-renamed $323 main\n",
+    types.SessionsChanged: b"%sessions-changed\n",
+    types.SessionWindowChanged: b"%session-window-changed $323 @330\n",
+    types.ClientDetached: b"%client-detached /dev/pts/9\n",
+    types.Continue: b"%continue %378\n",
+    types.Exit: b"%exit\n",
+    types.ExtendedOutput: b"%extended-output %378 1024 : \\033[1mhello\\015\n",
+    types.Output: b"%output %378 \\033[1mhello\\015\n",
+    types.LayoutChange: b"%layout-change @359 3369,232x48,0,0,1119 3369,232x48,0,0,1119 *\n",
+    types.Pause: b"%pause %378\n",
+    types.SubscriptionChanged: b"%subscription-changed name $321 @322 1 %323 : value\n",
+}
+
+# upper bound of bytes per event, including its field values
+MEMORY_BUDGETS = {
+    types.PaneModeChanged: 96,
+    types.WindowPaneChanged: 128,
+    types.WindowClose: 96,
+    types.UnlinkedWindowClose: 96,
+    types.WindowAdd: 96,
+    types.UnlinkedWindowAdd: 96,
+    types.WindowRenamed: 152,
+    types.UnlinkedWindowRenamed: 152,
+    types.SessionChanged: 152,
+    types.ClientSessionChanged: 224,
+    types.SessionRenamed: 152,
+    types.SessionsChanged: 56,
+    types.SessionWindowChanged: 128,
+    types.ClientDetached: 112,
+    types.Continue: 96,
+    types.Exit: 64,
+    types.ExtendedOutput: 176,
+    types.Output: 152,
+    types.LayoutChange: 224,
+    types.Pause: 96,
+    types.SubscriptionChanged: 288,
+    types.Reply: 512,
+}
+
+
+def _bytes_per_event(make, n=1000) -> float:
+    tracemalloc.start()
+    try:
+        events = [None] * n
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(n):
+            events[i] = make()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    return (after - before) / n
+
+
+def test_event_memory_budget():
+    assert set(SAMPLE_LINES) == set(types.ALL_NOTI)
+
+    for cls, line in SAMPLE_LINES.items():
+        event = cls.from_bytes(line)
+        assert not hasattr(event, "__dict__"), cls
+
+        # copies, so the fields do not share the sample
+        size = _bytes_per_event(lambda: cls.from_bytes(bytes(bytearray(line))))
+        assert size <= MEMORY_BUDGETS[cls], cls
+
+    reply = b"%begin 1622538780 64363 1\n%end 1622538780 64363 1\n"
+    event = types.Reply.from_bytes(reply)
+    assert not hasattr(event, "__dict__")
+    assert event.head_wrap.header is types.Reply.from_bytes(reply).head_wrap.header
+
+    size = _bytes_per_event(lambda: types.Reply.from_bytes(bytes(bytearray(reply))))
+    assert size <= MEMORY_BUDGETS[types.Reply]
+
+
+def test_events_are_frozen():
+    event = types.Output.from_bytes(b"%output %1 abc\n")
+
+    with pytest.raises(attr.exceptions.FrozenInstanceError):
+        event.pane = 2
+
+
+def test_specialized_from_bytes():
+    generic = types.Notification.from_bytes.__func__  # type: ignore
+
+    lines = [
+        *SAMPLE_LINES.values(),
+        b"%exit server exited\n",
+        b"%session-renamed $3 a new name\n",
+        b"%output %78 \n",
+    ]
+
+    for line in lines:
+        cls = types.DISPATCH.classify(line)[1]
+        assert cls.from_bytes.__func__ is not generic, cls
+        # those with their own from_bytes split the line differently
+        if cls._positional:
+            assert cls.from_bytes(line) == generic(cls, line)
+
+    with pytest.raises(TypeError):
+        types.Output.from_bytes(b"%output\n")
+
+    # ids are checked for their sigils as the converters do
+    swapped = b"%window-pane-changed %3 @68\n"
+    with pytest.raises(AssertionError):
+        generic(types.WindowPaneChanged, swapped)
+    with pytest.raises(AssertionError):
+        types.WindowPaneChanged.from_bytes(swapped)
+    lazy = types.lazy(types.WindowPaneChanged, swapped)
+    with pytest.raises(AssertionError):
+        lazy.pane  # pylint: disable=pointless-statement